@@ -6,13 +6,22 @@ v3.0 - Smart Detection Engine
 
 import streamlit as st
 import cv2
-import numpy as np
+import pandas as pd
 import tempfile
 import time
 import os
 from ultralytics import YOLO
-from underwater_augment import apply_full_underwater_simulation
-from report_gen import generate_report
+from underwater_augment import apply_full_underwater_simulation, MarineSnowField
+from report_jobs import ReportJobRunner
+from video_engine import VideoInferenceEngine
+from detection_log import log_detection, format_timestamp, FLOOR_CONF
+from backends import load_model as load_backend, GRAPH_OPTS
+from snapshot_store import SnapshotStore, resolve_rendition
+from inference_cache import InferenceCache
+from prediction_store import PredictionStore
+from tracker import IoUTracker, log_tracks
+from mission_state import MissionState
+from taxonomy import SEVERITIES, severity_of, get_taxonomy
 
 # Guard against SessionInfo not initialized error on cold start
 import streamlit.runtime.scriptrunner as _sr
@@ -115,15 +124,18 @@ section[data-testid="stSidebar"] label { color: #5A7A90 !important; font-size: 0
 """, unsafe_allow_html=True)
 
 # ── Constants ─────────────────────────────────────────────────────────────────
-SEVERITY = {
-    'corrosion':     ('CRITICAL', 'c', 'b-c'),
-    'damage':        ('CRITICAL', 'c', 'b-c'),
-    'free_span':     ('CRITICAL', 'c', 'b-c'),
-    'marine_growth': ('WARNING',  'w', 'b-w'),
-    'debris':        ('WARNING',  'w', 'b-w'),
-    'healthy':       ('NORMAL',   'n', 'b-n'),
-    'anode':         ('NORMAL',   'n', 'b-n'),
+# Severity → (card class, badge class); class severities come from taxonomy.py
+SEVERITY_CSS = {
+    'CRITICAL': ('c', 'b-c'),
+    'WARNING':  ('w', 'b-w'),
+    'NORMAL':   ('n', 'b-n'),
 }
+
+def severity_style(cn):
+    """(severity, card class, badge class) of a class name"""
+    sev = severity_of(cn)
+    return (sev,) + SEVERITY_CSS[sev]
+
 ICONS = {
     'corrosion':     '⚠️',
     'damage':        '🔧',
@@ -134,63 +146,71 @@ ICONS = {
     'anode':         '🔋',
 }
 
-# If same class found again with 30%+ different confidence = different instance, log it
-DIFF_THRESHOLD = 0.50
+SNAPSHOT_PAGE_SIZES = [12, 24, 48, 96]
 
 BASE_DIR   = os.path.dirname(os.path.abspath(__file__))
 model_path = os.path.join(BASE_DIR, "weights", "best.pt")
 
+# Inference backend → (backend key, exported weights produced by train.py --mode export)
+BACKEND_WEIGHTS = {
+    'PyTorch':      ('torch',    model_path),
+    'ONNX Runtime': ('onnx',     os.path.join(BASE_DIR, "weights", "best.onnx")),
+    'OpenVINO':     ('openvino', os.path.join(BASE_DIR, "weights", "best_openvino_model")),
+}
+
 @st.cache_resource
-def load_model(p):
+def load_model(p, backend='torch', threads=None, graph_opt='all'):
+    if backend != 'torch':
+        return load_backend(p, backend=backend, threads=threads, graph_opt=graph_opt)
     return YOLO(p) if os.path.exists(p) else YOLO('yolov8n.pt')
 
+# Annotated frames live in a shared on-disk store; the log only keeps references
+@st.cache_resource
+def get_snapshot_store():
+    return SnapshotStore()
+
+snapshots = get_snapshot_store()
+
+# PDF reports are built on a background thread shared by all sessions (finished PDFs are cached)
+@st.cache_resource
+def get_report_jobs():
+    return ReportJobRunner()
+
+report_jobs = get_report_jobs()
+
+# Image-tab results keyed by (upload hash, model, simulation) so reruns skip decode + predict
+@st.cache_resource
+def get_inference_cache():
+    return InferenceCache()
+
+inference_cache = get_inference_cache()
+
 # ── Session state ─────────────────────────────────────────────────────────────
 try:
-    for k, v in [('anomaly_log', []), ('det_counts', {}), ('last_img_id', None), ('pdf_bytes', None)]:
+    for k, v in [('last_img_id', None), ('report_job', None), ('log_conf', None),
+                 ('preview_idx', None)]:
         if k not in st.session_state:
             st.session_state[k] = v
+    # The anomaly log keeps its own class / severity counters, histogram and top-K
+    if 'anomaly_log' not in st.session_state:
+        st.session_state.anomaly_log = MissionState()
+    # Raw boxes at FLOOR_CONF for everything analysed this session
+    if 'predictions' not in st.session_state:
+        st.session_state.predictions = PredictionStore()
 except Exception:
     st.error("App is initializing, please wait a moment and refresh the page.")
     st.stop()
 
-model   = load_model(model_path)
-m_label = "Custom YOLOv8s" if os.path.exists(model_path) else "YOLOv8n Baseline"
-
-
 # ── Smart log function ────────────────────────────────────────────────────────
 def smart_log(cn, cf, ts, frame_bytes, class_tracker):
-    """
-    Log detection only if:
-    - Brand new class never seen before → always log
-    - Same class but confidence differs by 30%+ → different instance, log it
-    - Same class, similar confidence → SKIP (same thing seen again)
-    """
-    if cn not in class_tracker:
-        # Brand new class
-        st.session_state.anomaly_log.append({
-            'class_name':  cn,
-            'confidence':  cf,
-            'timestamp':   ts,
-            'frame_bytes': frame_bytes,
-        })
-        st.session_state.det_counts[cn] = st.session_state.det_counts.get(cn, 0) + 1
-        class_tracker[cn] = [cf]
-        return True
-    else:
-        # Already seen — check if this is a different instance
-        logged_confs = class_tracker[cn]
-        is_different = all(abs(cf - prev) >= DIFF_THRESHOLD for prev in logged_confs)
-        if is_different:
-            st.session_state.anomaly_log.append({
-                'class_name':  cn,
-                'confidence':  cf,
-                'timestamp':   ts,
-                'frame_bytes': frame_bytes,
-            })
-            st.session_state.det_counts[cn] = st.session_state.det_counts.get(cn, 0) + 1
-            class_tracker[cn].append(cf)
-            return True
-        return False
+    """Log into the session anomaly log using the shared detection_log policy"""
+    return log_detection(st.session_state.anomaly_log, None,
+                         cn, cf, ts, frame_bytes, class_tracker, store=snapshots)
+
+
+def select_preview(idx):
+    """Snapshot grid callback: log index whose full-size preview is shown (None hides it)"""
+    st.session_state.preview_idx = idx
 
 
 # ── SIDEBAR ───────────────────────────────────────────────────────────────────
@@ -204,7 +224,26 @@ with st.sidebar:
     """, unsafe_allow_html=True)
 
     st.markdown('<div class="sidebar-section">Detection</div>', unsafe_allow_html=True)
-    conf = st.slider("Confidence Threshold", 0.10, 1.0, 0.25, 0.05)
+    conf = st.slider("Confidence Threshold", FLOOR_CONF, 1.0, 0.25, 0.05)
+
+    # Threshold moved: rebuild the log from stored raw boxes instead of re-running the model
+    if st.session_state.log_conf != conf:
+        if len(st.session_state.predictions):
+            st.session_state.anomaly_log = st.session_state.predictions.rebuild(conf, snapshots)
+            st.session_state.report_job = None
+            st.session_state.preview_idx = None
+        st.session_state.log_conf = conf
+    backend_lbl = st.selectbox("Inference Backend", list(BACKEND_WEIGHTS), 0,
+                               help="ONNX Runtime / OpenVINO run the exported model on CPU-only stations")
+    if backend_lbl != 'PyTorch':
+        n_cpu   = max(2, os.cpu_count() or 2)
+        threads = st.slider("CPU Threads", 1, n_cpu, min(4, n_cpu))
+    else:
+        threads = None
+    graph_opt = 'all'
+    if backend_lbl == 'ONNX Runtime':
+        graph_opt = st.selectbox("Graph Optimization", GRAPH_OPTS, GRAPH_OPTS.index('all'),
+                                 help="ONNX Runtime graph optimization level for the session")
 
     st.markdown('<div class="sidebar-section">Environment</div>', unsafe_allow_html=True)
     sim_on = st.toggle("Underwater Simulation", False)
@@ -223,23 +262,35 @@ with st.sidebar:
     st.divider()
     c1, c2 = st.columns(2)
     total_n    = len(st.session_state.anomaly_log)
-    critical_n = sum(1 for x in st.session_state.anomaly_log
-                     if x['class_name'] in ['corrosion', 'damage', 'free_span'])
+    critical_n = st.session_state.anomaly_log.critical
     c1.metric("Detections", total_n)
     c2.metric("Critical",   critical_n)
 
     if st.button("Reset Session"):
-        st.session_state.anomaly_log = []
-        st.session_state.det_counts  = {}
+        st.session_state.anomaly_log = MissionState()
         st.session_state.last_img_id = None
-        st.session_state.pdf_bytes   = None
+        st.session_state.report_job  = None
+        st.session_state.preview_idx = None
+        st.session_state.predictions = PredictionStore()
         st.rerun()
 
+    backend, weights_path = BACKEND_WEIGHTS[backend_lbl]
+    if backend != 'torch' and not os.path.exists(weights_path):
+        st.warning(backend_lbl + " model not found — run train.py --mode export. Using PyTorch.")
+        backend_lbl, (backend, weights_path) = 'PyTorch', BACKEND_WEIGHTS['PyTorch']
+
     if os.path.exists(model_path):
-        st.success("Custom YOLOv8s loaded")
+        st.success("Custom YOLOv8s loaded · " + backend_lbl)
     else:
         st.warning("Using YOLOv8n baseline")
 
+model   = load_model(weights_path, backend, threads, graph_opt)
+if not get_taxonomy(model.names).matches_dataset:
+    st.sidebar.caption("Model classes differ from data.yaml — severities are matched by class name.")
+m_label = "Custom YOLOv8s" if os.path.exists(model_path) else "YOLOv8n Baseline"
+if backend != 'torch':
+    m_label += " · " + backend_lbl
+
 
 # ── HERO ──────────────────────────────────────────────────────────────────────
 st.markdown(
@@ -268,9 +319,13 @@ with tab1:
 
     if img_file:
         is_new = (img_file.file_id != st.session_state.last_img_id)
-        raw    = np.asarray(bytearray(img_file.read()), dtype=np.uint8)
-        img    = cv2.imdecode(raw, cv2.IMREAD_COLOR)
-        proc   = apply_full_underwater_simulation(img, turb, snow) if sim_on else img.copy()
+        with st.spinner("Running YOLOv8 inference..."):
+            # Raw boxes are cached at the slider floor; the threshold only filters them
+            cached = inference_cache.infer(img_file.getvalue(), model, (weights_path, backend),
+                                           sim=(turb, snow) if sim_on else None)
+        img   = cached.img
+        ann   = cached.annotated(conf)
+        boxes = cached.filtered(conf)
 
         col1, col2 = st.columns(2, gap="large")
         with col1:
@@ -279,29 +334,21 @@ with tab1:
             st.image(cv2.cvtColor(img, cv2.COLOR_BGR2RGB), use_container_width=True)
             st.markdown('</div>', unsafe_allow_html=True)
 
-        with st.spinner("Running YOLOv8 inference..."):
-            res = model.predict(proc, conf=conf, verbose=False)
-            ann = res[0].plot()
-
         with col2:
             st.markdown('<div class="sec-label">AI Detection Output</div>', unsafe_allow_html=True)
             st.markdown('<div class="img-wrap">', unsafe_allow_html=True)
             st.image(cv2.cvtColor(ann, cv2.COLOR_BGR2RGB), use_container_width=True)
             st.markdown('</div>', unsafe_allow_html=True)
 
-        boxes = res[0].boxes
-        if boxes is not None and len(boxes) > 0:
+        if len(boxes) > 0:
             st.markdown('<br><div class="sec-label">Detections</div>', unsafe_allow_html=True)
 
-            ann_rgb     = cv2.cvtColor(ann, cv2.COLOR_BGR2RGB)
-            _, buf      = cv2.imencode('.jpg', ann_rgb)
-            frame_bytes = buf.tobytes()
-
+            # Names and severities for all boxes in one gather each
+            tax = get_taxonomy(model.names)
             cards_html = '<div class="det-grid">'
-            for box in boxes:
-                cn   = model.names[int(box.cls[0])]
-                cf   = float(box.conf[0])
-                sev, card_cls, badge_cls = SEVERITY.get(cn, ('WARNING', 'w', 'b-w'))
+            for cn, sev_id, cf in zip(tax.names_of(boxes.cls), tax.severity_ids(boxes.cls), boxes.conf):
+                sev  = SEVERITIES[sev_id]
+                card_cls, badge_cls = SEVERITY_CSS[sev]
                 icon = ICONS.get(cn, '🔍')
                 cards_html += (
                     '<div class="det-card ' + card_cls + '">'
@@ -317,17 +364,26 @@ with tab1:
 
             # Smart log for image
             if is_new:
+                ann_rgb     = cv2.cvtColor(ann, cv2.COLOR_BGR2RGB)
+                _, buf      = cv2.imencode('.jpg', ann_rgb)
+                frame_bytes = buf.tobytes()
                 img_tracker = {}
                 ts = time.strftime('%H:%M:%S')
-                for box in boxes:
-                    cn = model.names[int(box.cls[0])]
-                    cf = float(box.conf[0])
+                for cn, cf in zip(tax.names_of(boxes.cls), boxes.conf.tolist()):
                     smart_log(cn, cf, ts, frame_bytes, img_tracker)
-                st.session_state.last_img_id = img_file.file_id
-                st.session_state.pdf_bytes   = None
+                st.session_state.report_job  = None
         else:
             st.success("No anomalies detected — surface appears healthy.")
 
+        # Keep the raw boxes (even those below the current threshold) for re-filtering
+        if is_new:
+            if len(cached.boxes) > 0:
+                _, raw_buf = cv2.imencode('.jpg', cached.proc)
+                sid = st.session_state.predictions.begin_source(img_file.name, model.names, mode='box')
+                st.session_state.predictions.add(sid, 0, time.strftime('%H:%M:%S'), cached.boxes,
+                                                 snapshots.put(raw_buf.tobytes()))
+            st.session_state.last_img_id = img_file.file_id
+
 
 # ── TAB 2: VIDEO ─────────────────────────────────────────────────────────────
 with tab2:
@@ -361,16 +417,32 @@ with tab2:
         recommended_skip = max(1, int(fps))            # 1 frame per second
         recommended_max  = min(150, int(dur))           # one check per second max
 
-        ca, cb = st.columns(2)
+        ca, cb, cc = st.columns(3)
         with ca:
-            skip = st.slider("Process every N frames", 1, 30, recommended_skip,
-                             help="Higher = faster. Auto-set for 2 checks/sec")
+            stride_mode = st.radio("Sampling", ["Frame stride", "Checks per second"],
+                                   horizontal=True,
+                                   help="Skipped frames are never fully decoded")
+            if stride_mode == "Frame stride":
+                skip = st.slider("Process every N frames", 1, 30, recommended_skip,
+                                 help="Higher = faster. Auto-set for 2 checks/sec")
+                cps  = None
+            else:
+                cps  = st.slider("Checks per second", 0.25, 10.0, 1.0, 0.25,
+                                 help="Time-based stride — independent of the video frame rate")
+                skip = max(1, int(round(fps / cps)))
         with cb:
             maxf = st.slider("Max frames to scan", 10, 300, recommended_max,
                              help="Auto-set to cover full video duration")
+        with cc:
+            batch = st.slider("Inference batch size", 1, 16, 4,
+                              help="Frames per model call — decode, inference and annotation run in parallel")
 
-        st.info("Will scan " + str(recommended_max) + " frames, every " +
-                str(recommended_skip) + " frames — covers full " + str(int(dur)) + "s video")
+        gap     = (1.0 / cps) if cps else skip / fps
+        covered = min(dur, maxf * gap)
+        st.info("Will scan up to " + str(maxf) + " frames, every " +
+                (f"{gap:.2g}s ({cps:g} checks/sec)" if cps else str(skip) + " frames") +
+                (" — covers full " + str(int(dur)) + "s video" if covered >= dur
+                 else " — covers first " + str(int(covered)) + "s of " + str(int(dur)) + "s video"))
 
         if st.button("Start Video Analysis"):
             placeholder = st.empty()
@@ -378,95 +450,75 @@ with tab2:
             status_box  = st.empty()
             live_log    = st.empty()
 
-            fc            = 0
-            pc            = 0
-            class_tracker = {}   # {class_name: [list of logged confidences]}
-
-            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-
-            while cap.isOpened() and pc < maxf:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                fc += 1
-                if fc % skip != 0:
-                    continue
-
-                if sim_on:
-                    frame = apply_full_underwater_simulation(frame, turb, snow)
-
-                res         = model.predict(frame, conf=conf, verbose=False)
-                ann         = res[0].plot()
-                current_sec = fc / fps
-
-                placeholder.image(cv2.cvtColor(ann, cv2.COLOR_BGR2RGB),
-                                  use_container_width=True)
-
-                if res[0].boxes and len(res[0].boxes) > 0:
-                    ann_rgb     = cv2.cvtColor(ann, cv2.COLOR_BGR2RGB)
-                    _, buf      = cv2.imencode('.jpg', ann_rgb)
-                    frame_bytes = buf.tobytes()
-                    mm          = int(current_sec // 60)
-                    ss          = int(current_sec % 60)
-                    ts          = str(mm).zfill(2) + ":" + str(ss).zfill(2)
-
-                    # Pick best confidence box per class in this frame first
-                    # so multiple boxes of same class in one frame don't create duplicates
-                    best_per_class = {}
-                    for box in res[0].boxes:
-                        cn = model.names[int(box.cls[0])]
-                        cf = float(box.conf[0])
-                        if cn not in best_per_class or cf > best_per_class[cn]:
-                            best_per_class[cn] = cf
-
-                    for cn, cf in best_per_class.items():
-                        smart_log(cn, cf, ts, frame_bytes, class_tracker)
+            pc      = 0
+            tracker = IoUTracker()   # one log entry per tracked anomaly, with its best frame
+
+            cap.release()
+            snow_field = MarineSnowField()   # particles drift coherently across frames
+            preprocess = (lambda f: apply_full_underwater_simulation(f, turb, snow, snow_field=snow_field)) if sim_on else None
+            # Predict at the floor threshold and keep raw boxes so the slider can re-filter later
+            engine      = VideoInferenceEngine(model, conf=FLOOR_CONF, batch_size=batch,
+                                               preprocess=preprocess, display_conf=conf, keep_raw=True)
+            predictions = st.session_state.predictions
+            sid         = predictions.begin_source(vid_file.name, model.names, mode='track')
+
+            for out in engine.run(tfile.name, skip=skip, max_frames=maxf, checks_per_sec=cps):
+                current_sec = out['time_sec']
+                ts          = format_timestamp(current_sec)
+
+                placeholder.image(out['annotated_rgb'], use_container_width=True)
+
+                if out['raw_bytes'] is not None:
+                    predictions.add(sid, out['frame_idx'], ts, out['raw_boxes'],
+                                    snapshots.put(out['raw_bytes']), time_sec=current_sec)
+
+                # Tracks closed by this frame are logged once with their best snapshot
+                closed = tracker.update(out['boxes'], current_sec, out['frame_idx'], out['frame_bytes'])
+                log_tracks(st.session_state.anomaly_log, None, closed, model.names, store=snapshots)
 
                 pc += 1
                 prog.progress(min(pc / maxf, 1.0))
 
                 # Live status
-                total_logged = len(st.session_state.anomaly_log)
                 mm_live = int(current_sec // 60)
                 ss_live = int(current_sec % 60)
                 status_box.markdown(
                     "<small style='color:#2A4A60;letter-spacing:1px'>SCANNING "
                     + str(pc) + "/" + str(maxf) + " FRAMES  |  "
-                    + "DETECTIONS LOGGED: " + str(total_logged) + "  |  "
+                    + "ANOMALIES TRACKED: " + str(sum(tracker.class_counts().values())) + "  |  "
                     + "TIME: " + str(mm_live).zfill(2) + ":" + str(ss_live).zfill(2)
                     + "</small>",
                     unsafe_allow_html=True
                 )
 
                 # Live badges
-                if class_tracker:
+                track_counts = tracker.class_counts()
+                if track_counts:
                     log_html = "<div style='display:flex;flex-wrap:wrap;gap:8px;margin-top:8px;'>"
-                    for cls, confs in class_tracker.items():
-                        sev, _, badge = SEVERITY.get(cls, ('WARNING', 'w', 'b-w'))
+                    for cls_id, n_tracks in track_counts.items():
+                        cls      = model.names[cls_id]
+                        sev, _, badge = severity_style(cls)
                         icon     = ICONS.get(cls, '🔍')
                         cls_disp = cls.replace('_', ' ').title()
                         log_html += ("<span class='det-badge " + badge + "'>"
                                      + icon + " " + cls_disp
-                                     + " x" + str(len(confs)) + "</span>")
+                                     + " x" + str(n_tracks) + "</span>")
                     log_html += "</div>"
                     live_log.markdown(log_html, unsafe_allow_html=True)
 
-            cap.release()
+            log_tracks(st.session_state.anomaly_log, None, tracker.flush(), model.names, store=snapshots)
+
             try:
                 os.unlink(tfile.name)
             except Exception:
                 pass
 
-            st.session_state.pdf_bytes = None
+            st.session_state.report_job = None
 
             # Final summary
-            total_logged = len(st.session_state.anomaly_log)
-            crit = sum(1 for x in st.session_state.anomaly_log
-                       if x['class_name'] in ['corrosion', 'damage', 'free_span'])
-            warn = sum(1 for x in st.session_state.anomaly_log
-                       if x['class_name'] in ['marine_growth', 'debris'])
-            norm = sum(1 for x in st.session_state.anomaly_log
-                       if x['class_name'] in ['healthy', 'anode'])
+            mission      = st.session_state.anomaly_log
+            total_logged = len(mission)
+            crit, warn, norm = mission.critical, mission.warnings, mission.normal
 
             if total_logged == 0:
                 st.success("Scan complete — No anomalies detected. Structure appears healthy.")
@@ -483,9 +535,9 @@ with tab2:
 with tab3:
     log      = st.session_state.anomaly_log
     total    = len(log)
-    critical = sum(1 for x in log if x['class_name'] in ['corrosion', 'damage', 'free_span'])
-    warnings = sum(1 for x in log if x['class_name'] in ['marine_growth', 'debris'])
-    normal   = sum(1 for x in log if x['class_name'] in ['healthy', 'anode'])
+    critical = log.critical
+    warnings = log.warnings
+    normal   = log.normal
 
     st.markdown(
         '<div class="metric-strip">'
@@ -497,13 +549,13 @@ with tab3:
         unsafe_allow_html=True
     )
 
-    if st.session_state.det_counts:
+    if log.class_counts:
         col_a, col_b = st.columns([1, 1], gap="large")
 
         with col_a:
             st.markdown('<div class="sec-label">Breakdown by Class</div>', unsafe_allow_html=True)
-            for cls, cnt in sorted(st.session_state.det_counts.items(), key=lambda x: -x[1]):
-                sev, _, badge = SEVERITY.get(cls, ('WARNING', 'w', 'b-w'))
+            for cls, cnt in sorted(log.class_counts.items(), key=lambda x: -x[1]):
+                sev, _, badge = severity_style(cls)
                 icon     = ICONS.get(cls, '🔍')
                 pct      = (cnt / max(total, 1)) * 100
                 cls_disp = cls.replace('_', ' ').title()
@@ -518,9 +570,17 @@ with tab3:
 
         with col_b:
             st.markdown('<div class="sec-label">Detection Timeline</div>', unsafe_allow_html=True)
-            for item in log:
+            if len(log.histogram) > 1:
+                buckets = sorted(log.histogram)
+                st.bar_chart(
+                    pd.DataFrame([log.histogram[b] for b in buckets],
+                                 index=[format_timestamp(b) for b in buckets]),
+                    color=['#E63946', '#F4A261', '#00D4B4'], height=160
+                )
+            # Highest-confidence detections (kept incrementally, no full-log pass)
+            for item in log.top():
                 cn       = item['class_name']
-                sev, card_cls, badge = SEVERITY.get(cn, ('WARNING', 'w', 'b-w'))
+                sev, card_cls, badge = severity_style(cn)
                 icon     = ICONS.get(cn, '🔍')
                 cn_disp  = cn.replace('_', ' ').title()
                 conf_pct = str(int(item['confidence'] * 100)) + "%"
@@ -541,16 +601,34 @@ with tab3:
     # Snapshots
     if log:
         st.markdown('<br><div class="sec-label">Anomaly Snapshots</div>', unsafe_allow_html=True)
+
+        # Paginated grid of pre-computed thumbnails (no decode / resize on rerun)
+        pg_a, pg_b = st.columns([1, 1])
+        with pg_b:
+            page_size = st.select_slider("Snapshots per page", SNAPSHOT_PAGE_SIZES, SNAPSHOT_PAGE_SIZES[0])
+        n_pages = max(1, -(-len(log) // page_size))
+        with pg_a:
+            page = st.number_input("Page (of " + str(n_pages) + ")", 1, n_pages, 1) if n_pages > 1 else 1
+        start = (page - 1) * page_size
+
+        # Only the selected snapshot's preview is loaded and sent, not one per grid item
+        sel = st.session_state.preview_idx
+        if sel is not None and sel < len(log):
+            item = log[sel]
+            st.image(resolve_rendition(item, 'preview', snapshots), use_container_width=True,
+                     caption=item['class_name'].replace('_', ' ').title() + " · " + item['timestamp'])
+            st.button("Close Preview", on_click=select_preview, args=(None,))
+
         cols = st.columns(3)
-        for i, item in enumerate(log):
+        for i, item in enumerate(log[start:start + page_size]):
             with cols[i % 3]:
-                if item.get('frame_bytes'):
-                    frame_arr = np.frombuffer(item['frame_bytes'], dtype=np.uint8)
-                    frame_img = cv2.imdecode(frame_arr, cv2.IMREAD_COLOR)
+                thumb = resolve_rendition(item, 'thumb', snapshots)
+                if thumb:
                     st.markdown('<div class="img-wrap">', unsafe_allow_html=True)
-                    st.image(cv2.cvtColor(frame_img, cv2.COLOR_BGR2RGB),
-                             use_container_width=True)
+                    st.image(thumb, use_container_width=True)
                     st.markdown('</div>', unsafe_allow_html=True)
+                    st.button("Preview", key='preview_' + str(start + i), use_container_width=True,
+                              on_click=select_preview, args=(start + i,))
                 icon     = ICONS.get(item['class_name'], '🔍')
                 cn_disp  = item['class_name'].replace('_', ' ').title()
                 conf_pct = str(int(item['confidence'] * 100)) + "%"
@@ -569,23 +647,50 @@ with tab3:
         if not log:
             st.warning("Run detection on an image or video first.")
         else:
-            with st.spinner("Compiling inspection report..."):
-                st.session_state.pdf_bytes = generate_report(
-                    anomaly_log=log,
+            job = report_jobs.submit(
+                log,
+                meta=dict(
                     mission_name=m_name,
                     operator_name=m_op,
                     vessel_id=m_rov,
-                    location=m_loc
+                    location=m_loc,
+                ),
+                class_counts=log.class_counts,
+                snapshot_store=snapshots,
+                workers=os.cpu_count()
+            )
+            st.session_state.report_job = job.id
+
+    # Poll the background job without re-running the whole script
+    job = report_jobs.get(st.session_state.get('report_job'))
+
+    @st.fragment(run_every=1.0 if job is not None and job.active else None)
+    def report_status(was_active):
+        job = report_jobs.get(st.session_state.get('report_job'))
+        if job is None:
+            return
+        if job.active:
+            st.progress(job.fraction,
+                        text="Compiling inspection report... " + str(job.done) + "/" + str(job.total) + " detections")
+            if st.button("Cancel Report"):
+                job.cancel()
+        elif was_active:
+            st.rerun()   # stop polling and render the final state
+        elif job.status == 'done' and os.path.exists(job.path):
+            with open(job.path, 'rb') as pdf_file:
+                st.download_button(
+                    "Download PDF Report",
+                    pdf_file,
+                    "nauticai_" + time.strftime('%Y%m%d_%H%M%S') + ".pdf",
+                    "application/pdf"
                 )
+            st.success("Report ready!")
+        elif job.status == 'failed':
+            st.error("Report generation failed: " + str(job.error))
+        elif job.status == 'cancelled':
+            st.info("Report generation cancelled.")
 
-    if st.session_state.get('pdf_bytes'):
-        st.download_button(
-            "Download PDF Report",
-            st.session_state.pdf_bytes,
-            "nauticai_" + time.strftime('%Y%m%d_%H%M%S') + ".pdf",
-            "application/pdf"
-        )
-        st.success("Report ready!")
+    report_status(job is not None and job.active)
 
 
 # ── FOOTER ────────────────────────────────────────────────────────────────────
@@ -0,0 +1,213 @@
+"""
+NautiCAI - Offline Underwater Augmentation Cache
+Pre-renders K underwater variants per training image so augmentation is not recomputed every epoch
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+import yaml
+
+from underwater_augment import apply_augmentation_for_training
+
+BASE_DIR    = os.path.dirname(os.path.abspath(__file__))
+IMAGE_EXTS  = ('.jpg', '.jpeg', '.png')
+AUG_VERSION = 1          # bump when apply_augmentation_for_training changes
+AUG_SPLIT   = 'train_aug'
+
+
+def dataset_root(data):
+    """Dataset root from data.yaml, falling back to ./dataset next to this repo"""
+    root = data.get('path', '')
+    return root if os.path.isdir(root) else os.path.join(BASE_DIR, 'dataset')
+
+
+def file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _render_variants(src_img, src_lbl, out_img_dir, out_lbl_dir, stem, variants, seed, digest):
+    """Worker: write `variants` augmented copies of one image plus its label file"""
+    img = cv2.imread(src_img)
+    if img is None:
+        return stem, [], 'unreadable image'
+
+    outputs = []
+    for k in range(variants):
+        # Seed from (run seed, content hash, variant) → identical output on re-runs
+        rng  = np.random.default_rng([seed, int(digest[:12], 16), k])
+        aug  = apply_augmentation_for_training(img.copy(), rng=rng)
+        name = f'{stem}_uw{k}'
+        cv2.imwrite(os.path.join(out_img_dir, name + '.jpg'), aug)
+        if src_lbl and os.path.exists(src_lbl):
+            shutil.copyfile(src_lbl, os.path.join(out_lbl_dir, name + '.txt'))
+        outputs.append(name)
+    return stem, outputs, None
+
+
+def _remove_outputs(names, out_img_dir, out_lbl_dir):
+    for name in names:
+        for path in (os.path.join(out_img_dir, name + '.jpg'),
+                     os.path.join(out_lbl_dir, name + '.txt')):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def aug_variants(root):
+    """{source image: [augmented variant images]} from the manifest, as paths relative to root"""
+    path = os.path.join(root, 'images', AUG_SPLIT, 'manifest.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        files = json.load(f).get('files', {})
+    return {entry.get('source', f'images/train/{fname}'):
+            [f'images/{AUG_SPLIT}/{name}.jpg' for name in entry['outputs']]
+            for fname, entry in files.items()}
+
+
+def register_split(data_yaml, split=AUG_SPLIT):
+    """Add images/<split> as an extra train source in data.yaml (no-op if present)"""
+    with open(data_yaml, 'r') as f:
+        data = yaml.safe_load(f)
+    entry  = f'images/{split}'
+    trains = data['train'] if isinstance(data['train'], list) else [data['train']]
+    if entry in trains:
+        return False
+    data['train'] = trains + [entry]
+    with open(data_yaml, 'w') as f:
+        yaml.safe_dump(data, f, sort_keys=False)
+    return True
+
+
+def build_augmentation_cache(data_yaml='data.yaml', variants=2, workers=4, seed=0, register=True):
+    """
+    Render `variants` underwater variants of every image in the train split into
+    images/train_aug (labels copied to labels/train_aug) using worker processes.
+
+    A content-hashed manifest (images/train_aug/manifest.json) records what was
+    rendered, so re-runs only process new or changed images and drop outputs of
+    deleted ones. Changing variants, seed or AUG_VERSION re-renders everything.
+    """
+    print("=" * 60)
+    print("  NautiCAI - Offline Augmentation Cache")
+    print("=" * 60)
+
+    with open(data_yaml, 'r') as f:
+        data = yaml.safe_load(f)
+    root        = dataset_root(data)
+    train_dir   = os.path.join(root, 'images', 'train')
+    label_dir   = os.path.join(root, 'labels', 'train')
+    out_img_dir = os.path.join(root, 'images', AUG_SPLIT)
+    out_lbl_dir = os.path.join(root, 'labels', AUG_SPLIT)
+    os.makedirs(out_img_dir, exist_ok=True)
+    os.makedirs(out_lbl_dir, exist_ok=True)
+
+    manifest_path = os.path.join(out_img_dir, 'manifest.json')
+    manifest      = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    params = {'version': AUG_VERSION, 'variants': variants, 'seed': seed}
+    files  = manifest.get('files', {}) if manifest.get('params') == params else {}
+    if manifest and not files:
+        print("Augmentation parameters changed — re-rendering all images")
+        for entry in manifest.get('files', {}).values():
+            _remove_outputs(entry['outputs'], out_img_dir, out_lbl_dir)
+
+    sources = sorted(f for f in os.listdir(train_dir) if f.lower().endswith(IMAGE_EXTS))
+    todo    = []
+    for fname in sources:
+        src_img = os.path.join(train_dir, fname)
+        stem    = os.path.splitext(fname)[0]
+        src_lbl = os.path.join(label_dir, stem + '.txt')
+        st_img  = os.stat(src_img)
+        lbl_sig = os.stat(src_lbl).st_mtime if os.path.exists(src_lbl) else None
+
+        prev = files.get(fname)
+        if prev and prev['size'] == st_img.st_size and prev['mtime'] == st_img.st_mtime \
+                and prev['label_mtime'] == lbl_sig:
+            continue   # unchanged since last run (cheap stat check)
+        digest = file_sha1(src_img)
+        label_digest = file_sha1(src_lbl) if lbl_sig is not None else None
+        if prev and prev['sha1'] == digest and prev['label_sha1'] == label_digest:
+            prev.update(size=st_img.st_size, mtime=st_img.st_mtime, label_mtime=lbl_sig)
+            continue   # touched but identical content
+        if prev:
+            _remove_outputs(prev['outputs'], out_img_dir, out_lbl_dir)
+        files[fname] = {
+            'source': f'images/train/{fname}',
+            'sha1': digest, 'label_sha1': label_digest, 'size': st_img.st_size,
+            'mtime': st_img.st_mtime, 'label_mtime': lbl_sig, 'outputs': [],
+        }
+        todo.append((src_img, src_lbl, stem, digest, fname))
+
+    present = set(sources)
+    removed = [f for f in files if f not in present]
+    for fname in removed:
+        _remove_outputs(files.pop(fname)['outputs'], out_img_dir, out_lbl_dir)
+
+    print(f"Source images: {len(sources)}  ·  to render: {len(todo)}  ·  removed: {len(removed)}")
+
+    failed = 0
+    if todo:
+        by_stem = {stem: fname for _, _, stem, _, fname in todo}
+        with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = [
+                pool.submit(_render_variants, src_img, src_lbl, out_img_dir, out_lbl_dir,
+                            stem, variants, seed, digest)
+                for src_img, src_lbl, stem, digest, _ in todo
+            ]
+            for n, fut in enumerate(as_completed(futures), 1):
+                stem, outputs, err = fut.result()
+                fname = by_stem[stem]
+                if err:
+                    failed += 1
+                    files.pop(fname, None)
+                    print(f"  ⚠️  {fname}: {err}")
+                else:
+                    files[fname]['outputs'] = outputs
+                if n % 500 == 0 or n == len(futures):
+                    print(f"  [{n}/{len(futures)}] rendered")
+
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump({'params': params, 'files': files}, f)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    total = sum(len(e['outputs']) for e in files.values())
+    print(f"\n✅ {total} augmented images in {out_img_dir}")
+    if failed:
+        print(f"⚠️  {failed} images failed")
+    if register and register_split(data_yaml):
+        print(f"Added images/{AUG_SPLIT} to the train split in {data_yaml}")
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='NautiCAI Offline Augmentation Cache')
+    parser.add_argument('--data', type=str, default='data.yaml')
+    parser.add_argument('--variants', type=int, default=2,
+                        help='Underwater variants rendered per training image')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-register', action='store_true',
+                        help='Do not add the augmented split to data.yaml')
+
+    args = parser.parse_args()
+
+    build_augmentation_cache(
+        data_yaml = args.data,
+        variants  = args.variants,
+        workers   = args.workers,
+        seed      = args.seed,
+        register  = not args.no_register,
+    )
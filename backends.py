@@ -0,0 +1,265 @@
+"""
+NautiCAI - Inference Backends
+Loads the detector as PyTorch (Ultralytics), ONNX Runtime or OpenVINO behind one predict() interface
+"""
+
+import os
+import ast
+import cv2
+import numpy as np
+import yaml
+
+from taxonomy import class_names
+
+BACKENDS   = ('torch', 'onnx', 'openvino')
+GRAPH_OPTS = ('disable', 'basic', 'extended', 'all')
+
+# BGR colours cycled per class id for the lightweight plotter
+PALETTE = [
+    (56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255),
+    (49, 210, 207), (10, 249, 72), (23, 204, 146), (134, 219, 61),
+]
+
+
+# ── Lightweight results (mirror the parts of Ultralytics Results we use) ──────
+class Boxes:
+    """Detections of one image as NumPy arrays: cls (N,), conf (N,), xyxy (N, 4)"""
+
+    def __init__(self, cls, conf, xyxy):
+        self.cls  = np.asarray(cls,  dtype=np.float32).reshape(-1)
+        self.conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+        self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+
+    def __len__(self):
+        return len(self.cls)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, (int, np.integer)):
+            idx = slice(idx, idx + 1)
+        return Boxes(self.cls[idx], self.conf[idx], self.xyxy[idx])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class Detections:
+    """Result of one image from an exported-model backend"""
+
+    def __init__(self, orig_img, boxes, names):
+        self.orig_img = orig_img
+        self.boxes    = boxes
+        self.names    = names
+
+    def plot(self):
+        """Annotated copy of the input frame (BGR)"""
+        return draw_boxes(self.orig_img, self.boxes, self.names)
+
+
+def as_boxes(boxes):
+    """Ultralytics (torch) or backend boxes → NumPy Boxes"""
+    if boxes is None:
+        return Boxes([], [], np.zeros((0, 4)))
+    cls, cf, xyxy = boxes.cls, boxes.conf, boxes.xyxy
+    if hasattr(cls, 'cpu'):
+        cls, cf, xyxy = cls.cpu().numpy(), cf.cpu().numpy(), xyxy.cpu().numpy()
+    return Boxes(cls, cf, xyxy)
+
+
+def draw_boxes(image, boxes, names, line_width=2):
+    """Draw class-coloured boxes with 'name conf' labels on a copy of a BGR image"""
+    out = image.copy()
+    for c, cf, (x1, y1, x2, y2) in zip(boxes.cls, boxes.conf, boxes.xyxy):
+        color = PALETTE[int(c) % len(PALETTE)]
+        p1, p2 = (int(x1), int(y1)), (int(x2), int(y2))
+        cv2.rectangle(out, p1, p2, color, line_width, cv2.LINE_AA)
+        label = f'{names.get(int(c), int(c))} {cf:.2f}'
+        (tw, th), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+        top = max(p1[1] - th - 6, 0)
+        cv2.rectangle(out, (p1[0], top), (p1[0] + tw + 4, top + th + 6), color, -1)
+        cv2.putText(out, label, (p1[0] + 2, top + th + 2), cv2.FONT_HERSHEY_SIMPLEX,
+                    0.5, (255, 255, 255), 1, cv2.LINE_AA)
+    return out
+
+
+# ── Pre / post-processing shared by exported backends ─────────────────────────
+def letterbox(image, size):
+    """Resize keeping aspect ratio and pad to size×size (Ultralytics grey 114)"""
+    h, w  = image.shape[:2]
+    gain  = min(size / h, size / w)
+    nh, nw = int(round(h * gain)), int(round(w * gain))
+    top   = (size - nh) // 2
+    left  = (size - nw) // 2
+    out   = np.full((size, size, 3), 114, dtype=np.uint8)
+    out[top:top + nh, left:left + nw] = cv2.resize(image, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    return out, gain, (left, top)
+
+
+def to_blob(padded):
+    """HWC BGR uint8 → NCHW RGB float32 in [0, 1]"""
+    return np.ascontiguousarray(padded[:, :, ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+def postprocess(pred, gain, pad, shape, conf=0.25, iou=0.7, max_det=300):
+    """
+    Decode one YOLOv8 head output (4 + nc, anchors) into Boxes in original
+    image coordinates, with class-aware NMS.
+    """
+    pred   = pred.T
+    scores = pred[:, 4:]
+    cls    = scores.argmax(1)
+    cf     = scores[np.arange(len(cls)), cls]
+    keep   = cf >= conf
+    if not keep.any():
+        return Boxes([], [], np.zeros((0, 4)))
+    xywh, cls, cf = pred[keep, :4], cls[keep], cf[keep]
+
+    xyxy = np.empty_like(xywh)
+    xyxy[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+    xyxy[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+
+    tlwh = np.concatenate([xyxy[:, :2], xywh[:, 2:]], axis=1)
+    idx  = cv2.dnn.NMSBoxesBatched(tlwh.tolist(), cf.tolist(), cls.tolist(), conf, iou)
+    idx  = np.asarray(idx, dtype=np.int64).reshape(-1)[:max_det]
+    xyxy, cls, cf = xyxy[idx], cls[idx], cf[idx]
+
+    xyxy[:, [0, 2]] = ((xyxy[:, [0, 2]] - pad[0]) / gain).clip(0, shape[1])
+    xyxy[:, [1, 3]] = ((xyxy[:, [1, 3]] - pad[1]) / gain).clip(0, shape[0])
+    return Boxes(cls, cf, xyxy)
+
+
+# ── Exported-model backends ──────────────────────────────────────────────────
+class _ExportedBackend:
+    """Common predict() loop; subclasses implement _infer(blob) → (B, 4 + nc, anchors)"""
+
+    backend     = None
+    batch_fixed = True
+
+    def __init__(self, weights, imgsz=640, names=None):
+        self.weights = weights
+        self.imgsz   = imgsz
+        self.names   = names or class_names()
+
+    def _infer(self, blob):
+        raise NotImplementedError
+
+    def predict(self, source, conf=0.25, iou=0.7, verbose=False, **kwargs):
+        images = source if isinstance(source, (list, tuple)) else [source]
+        prepped = [letterbox(im, self.imgsz) for im in images]
+        blobs   = [to_blob(p) for p, _, _ in prepped]
+
+        if self.batch_fixed:
+            preds = [self._infer(b)[0] for b in blobs]
+        else:
+            preds = list(self._infer(np.concatenate(blobs, axis=0)))
+
+        return [
+            Detections(im, postprocess(pred, gain, pad, im.shape[:2], conf, iou), self.names)
+            for im, pred, (_, gain, pad) in zip(images, preds, prepped)
+        ]
+
+    def __call__(self, source, **kwargs):
+        return self.predict(source, **kwargs)
+
+
+class OnnxRuntimeBackend(_ExportedBackend):
+    """best.onnx through ONNX Runtime on CPU"""
+
+    backend = 'onnx'
+
+    def __init__(self, weights, threads=None, graph_opt='all', providers=None):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        if threads:
+            opts.intra_op_num_threads = int(threads)
+            opts.inter_op_num_threads = 1
+        opts.graph_optimization_level = {
+            'disable':  ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+            'basic':    ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+            'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+            'all':      ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+        }[graph_opt]
+
+        self.session = ort.InferenceSession(
+            weights, sess_options=opts,
+            providers=providers or ['CPUExecutionProvider'])
+        inp             = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        self.batch_fixed = isinstance(inp.shape[0], int)
+
+        meta  = self.session.get_modelmeta().custom_metadata_map
+        names = ast.literal_eval(meta['names']) if 'names' in meta else None
+        imgsz = ast.literal_eval(meta['imgsz'])[0] if 'imgsz' in meta else inp.shape[2]
+        super().__init__(weights, imgsz=imgsz if isinstance(imgsz, int) else 640, names=names)
+
+    def _infer(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVINOBackend(_ExportedBackend):
+    """OpenVINO IR (best_openvino_model/ or best.xml) on CPU"""
+
+    backend = 'openvino'
+
+    def __init__(self, weights, threads=None, hint='LATENCY'):
+        import openvino as ov
+
+        xml = weights
+        if os.path.isdir(weights):
+            xml = next(os.path.join(weights, f) for f in os.listdir(weights) if f.endswith('.xml'))
+
+        config = {'PERFORMANCE_HINT': hint}
+        if threads:
+            config['INFERENCE_NUM_THREADS'] = int(threads)
+
+        core          = ov.Core()
+        model         = core.read_model(xml)
+        self.compiled = core.compile_model(model, 'CPU', config)
+        self.output   = self.compiled.output(0)
+        self.batch_fixed = not model.input(0).get_partial_shape()[0].is_dynamic
+
+        names, imgsz = None, 640
+        meta_path = os.path.join(os.path.dirname(xml), 'metadata.yaml')
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r') as f:
+                meta = yaml.safe_load(f) or {}
+            names = meta.get('names')
+            imgsz = (meta.get('imgsz') or [640])[0]
+        super().__init__(xml, imgsz=imgsz, names=names)
+
+    def _infer(self, blob):
+        return self.compiled(blob)[self.output]
+
+
+# ── Loader ───────────────────────────────────────────────────────────────────
+def detect_backend(weights):
+    """Guess the backend from the weights path"""
+    if weights.endswith('.onnx'):
+        return 'onnx'
+    if weights.endswith('.xml') or weights.endswith('_openvino_model') or os.path.isdir(weights):
+        return 'openvino'
+    return 'torch'
+
+
+def load_model(weights, backend='auto', threads=None, graph_opt='all'):
+    """
+    Load the detector with the requested backend:
+        torch    → Ultralytics YOLO on the .pt weights
+        onnx     → ONNX Runtime CPU session (threads / graph_opt apply)
+        openvino → OpenVINO CPU compiled model (threads apply)
+    All three return objects with .predict(frames, conf=...) and .names,
+    whose results expose .boxes (cls/conf/xyxy) and .plot().
+    """
+    if backend == 'auto':
+        backend = detect_backend(weights)
+    if backend == 'onnx':
+        return OnnxRuntimeBackend(weights, threads=threads, graph_opt=graph_opt)
+    if backend == 'openvino':
+        return OpenVINOBackend(weights, threads=threads)
+
+    from ultralytics import YOLO
+    if threads:
+        import torch
+        torch.set_num_threads(int(threads))
+    return YOLO(weights)
@@ -0,0 +1,261 @@
+"""
+NautiCAI - Dataset Label Index
+Parses every YOLO label once into columnar NumPy arrays, refreshed incrementally by label mtime
+"""
+
+import os
+import argparse
+
+import numpy as np
+import yaml
+
+from augment_cache import dataset_root, IMAGE_EXTS
+from remap_labels import load_ledger
+from taxonomy import class_names
+
+INDEX_VERSION  = 1
+UNKNOWN_SOURCE = 'unknown'
+
+
+def index_path(root):
+    return os.path.join(root, 'cache', 'label_index.npz')
+
+
+def parse_label(path):
+    """(cls int16 (N,), xywh float32 (N, 4)) of a YOLO label file; malformed lines are skipped"""
+    with open(path, 'r') as f:
+        rows = [line.split() for line in f]
+    rows = [r for r in rows if len(r) >= 5]
+    if not rows:
+        return np.zeros(0, np.int16), np.zeros((0, 4), np.float32)
+    cls  = np.array([int(float(r[0])) for r in rows], dtype=np.int16)
+    xywh = np.array([r[1:5] for r in rows], dtype=np.float32)
+    return cls, xywh
+
+
+class DatasetIndex:
+    """
+    All labels of a dataset root as two tables:
+        images: path (relative to root), split, source, label size / mtime, box range
+        boxes:  image row, class id, xywh
+    split / source are small-int codes into self.splits / self.sources. Image
+    ids are row numbers. Queries are NumPy reductions, no file access.
+    """
+
+    COLUMNS = ('paths', 'split', 'source', 'label_size', 'label_mtime', 'start', 'count',
+               'box_image', 'cls', 'xywh')
+
+    def __init__(self, root, splits, sources, **cols):
+        self.root    = root
+        self.splits  = list(splits)
+        self.sources = list(sources)
+        for name in self.COLUMNS:
+            setattr(self, name, cols[name])
+
+    def __len__(self):
+        return len(self.paths)
+
+    # ── Persistence ──────────────────────────────────────────────────────────
+    @classmethod
+    def load(cls, root):
+        """Saved index of a dataset root, or None if missing / another INDEX_VERSION"""
+        path = index_path(root)
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as z:
+            if int(z['version']) != INDEX_VERSION:
+                return None
+            cols = {name: z[name] for name in cls.COLUMNS}
+            return cls(root, z['splits'].tolist(), z['sources'].tolist(), **cols)
+
+    def save(self):
+        path = index_path(self.root)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, version=INDEX_VERSION, splits=np.array(self.splits, dtype=str),
+                     sources=np.array(self.sources, dtype=str),
+                     **{name: getattr(self, name) for name in self.COLUMNS})
+        os.replace(path + '.tmp', path)
+
+    # ── Queries ──────────────────────────────────────────────────────────────
+    def image_mask(self, split=None, source=None):
+        """Images in a split and/or from a source (names, not codes)"""
+        mask = np.ones(len(self), dtype=bool)
+        if split is not None:
+            mask &= self.split == (self.splits.index(split) if split in self.splits else -1)
+        if source is not None:
+            mask &= self.source == (self.sources.index(source) if source in self.sources else -1)
+        return mask
+
+    def _box_mask(self, split=None, source=None):
+        if split is None and source is None:
+            return slice(None)
+        return self.image_mask(split, source)[self.box_image]
+
+    def class_histogram(self, split=None, source=None, nc=None):
+        """Boxes per class id"""
+        nc = nc or len(class_names())
+        return np.bincount(self.cls[self._box_mask(split, source)], minlength=nc)
+
+    def split_stats(self):
+        """{split: {'images', 'boxes', 'empty', 'missing', 'classes'}}"""
+        stats = {}
+        for code, split in enumerate(self.splits):
+            mask = self.split == code
+            stats[split] = {
+                'images':  int(mask.sum()),
+                'boxes':   int(self.count[mask].sum()),
+                'empty':   int((mask & (self.count == 0) & (self.label_size >= 0)).sum()),
+                'missing': int((mask & (self.label_size < 0)).sum()),
+                'classes': self.class_histogram(split),
+            }
+        return stats
+
+    def empty_labels(self, split=None):
+        """Paths of images whose label file is missing or has no boxes"""
+        mask = self.image_mask(split) & (self.count == 0)
+        return self.paths[mask].tolist()
+
+    def presence(self, nc=None):
+        """(images, classes) bool matrix: image contains at least one box of the class"""
+        nc  = nc or len(class_names())
+        out = np.zeros((len(self), nc), dtype=bool)
+        ok  = self.cls < nc
+        out[self.box_image[ok], self.cls[ok]] = True
+        return out
+
+    def remap_preview(self, class_map, split=None, source=None, nc=None):
+        """(before, after) class histograms if class_map were applied to the selected labels"""
+        before = self.class_histogram(split, source, nc=max(nc or 0, int(self.cls.max(initial=0)) + 1))
+        lut    = np.arange(len(before))
+        for old, new in class_map.items():
+            if old < len(lut):
+                lut[old] = new
+        after = np.bincount(lut[self.cls[self._box_mask(split, source)]],
+                            minlength=max(len(before), int(lut.max(initial=0)) + 1))
+        return before, after
+
+
+def _empty_tables():
+    return {'paths': np.zeros(0, dtype=str), 'split': np.zeros(0, np.int8),
+            'source': np.zeros(0, np.int16), 'label_size': np.zeros(0, np.int64),
+            'label_mtime': np.zeros(0, np.int64), 'start': np.zeros(0, np.int64),
+            'count': np.zeros(0, np.int32), 'box_image': np.zeros(0, np.int32),
+            'cls': np.zeros(0, np.int16), 'xywh': np.zeros((0, 4), np.float32)}
+
+
+def build_index(data_yaml='data.yaml', rebuild=False, save=True, verbose=True):
+    """
+    DatasetIndex of every images/<split>/ directory under the dataset root.
+    Label files whose size and mtime match the saved index are not re-read;
+    new, changed and deleted ones are picked up. Sources come from the
+    remap ledger of each labels/<split>/ directory (see remap_labels.py).
+    """
+    with open(data_yaml, 'r') as f:
+        root = dataset_root(yaml.safe_load(f))
+    old = None if rebuild else DatasetIndex.load(root)
+    old_rows = {p: i for i, p in enumerate(old.paths.tolist())} if old is not None else {}
+
+    img_root = os.path.join(root, 'images')
+    splits   = sorted(d for d in os.listdir(img_root)
+                      if os.path.isdir(os.path.join(img_root, d))) if os.path.isdir(img_root) else []
+    sources  = [UNKNOWN_SOURCE]
+    cols     = {k: [] for k in ('paths', 'split', 'source', 'label_size', 'label_mtime', 'count')}
+    cls_parts, xywh_parts = [], []
+    parsed = reused = 0
+
+    for code, split in enumerate(splits):
+        lbl_dir = os.path.join(root, 'labels', split)
+        ledger  = load_ledger(lbl_dir) if os.path.isdir(lbl_dir) else {}
+        for fname in sorted(os.listdir(os.path.join(img_root, split))):
+            if not fname.lower().endswith(IMAGE_EXTS):
+                continue
+            rel   = f'images/{split}/{fname}'
+            lbl   = os.path.splitext(fname)[0] + '.txt'
+            lpath = os.path.join(lbl_dir, lbl)
+            try:
+                st = os.stat(lpath)
+                size, mtime = st.st_size, st.st_mtime_ns
+            except FileNotFoundError:
+                size, mtime = -1, -1
+
+            i = old_rows.get(rel)
+            if i is not None and old.label_size[i] == size and old.label_mtime[i] == mtime:
+                s, n = old.start[i], old.count[i]
+                c, b = old.cls[s:s + n], old.xywh[s:s + n]
+                reused += 1
+            elif size >= 0:
+                c, b = parse_label(lpath)
+                parsed += 1
+            else:
+                c, b = np.zeros(0, np.int16), np.zeros((0, 4), np.float32)
+
+            source = ledger.get(lbl, {}).get('source', UNKNOWN_SOURCE)
+            if source not in sources:
+                sources.append(source)
+            cols['paths'].append(rel)
+            cols['split'].append(code)
+            cols['source'].append(sources.index(source))
+            cols['label_size'].append(size)
+            cols['label_mtime'].append(mtime)
+            cols['count'].append(len(c))
+            cls_parts.append(c)
+            xywh_parts.append(b)
+
+    tables = _empty_tables()
+    if cols['paths']:
+        count  = np.array(cols['count'], dtype=np.int32)
+        tables = {
+            'paths':       np.array(cols['paths'], dtype=str),
+            'split':       np.array(cols['split'], dtype=np.int8),
+            'source':      np.array(cols['source'], dtype=np.int16),
+            'label_size':  np.array(cols['label_size'], dtype=np.int64),
+            'label_mtime': np.array(cols['label_mtime'], dtype=np.int64),
+            'start':       np.concatenate([[0], np.cumsum(count)[:-1]]).astype(np.int64),
+            'count':       count,
+            'box_image':   np.repeat(np.arange(len(count), dtype=np.int32), count),
+            'cls':         np.concatenate(cls_parts).astype(np.int16),
+            'xywh':        np.concatenate(xywh_parts).astype(np.float32).reshape(-1, 4),
+        }
+    index = DatasetIndex(root, splits, sources, **tables)
+
+    changed = (old is None or reused != len(old) or reused != len(index)
+               or old.sources != index.sources or not np.array_equal(old.source, index.source))
+    if save and changed:
+        index.save()
+    if verbose:
+        print(f"Label index: {len(index)} images · {len(index.cls)} boxes · "
+              f"{parsed} parsed · {reused} reused ({index_path(root)})")
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='NautiCAI Dataset Label Index')
+    parser.add_argument('--data', type=str, default='data.yaml')
+    parser.add_argument('--rebuild', action='store_true', help='Re-parse every label file')
+    parser.add_argument('--empty', action='store_true', help='List images with missing / empty labels')
+
+    args = parser.parse_args()
+
+    index = build_index(args.data, rebuild=args.rebuild)
+    names = class_names()
+
+    print("\n" + "=" * 60)
+    print(f"  {'split':<12}{'images':>8}{'boxes':>9}{'empty':>8}{'missing':>9}")
+    print("=" * 60)
+    stats = index.split_stats()
+    for split, s in stats.items():
+        print(f"  {split:<12}{s['images']:>8}{s['boxes']:>9}{s['empty']:>8}{s['missing']:>9}")
+
+    print(f"\n  {'class':<16}" + ''.join(f'{split:>10}' for split in stats))
+    for cid, name in names.items():
+        print(f"  {name:<16}" + ''.join(f"{s['classes'][cid]:>10}" for s in stats.values()))
+
+    if len(index.sources) > 1:
+        print("\n  Sources: " + ', '.join(
+            f"{src} {int(index.image_mask(source=src).sum())}" for src in index.sources))
+
+    if args.empty:
+        print("\nImages with missing / empty labels:")
+        for path in index.empty_labels():
+            print(f"  {path}")
@@ -0,0 +1,478 @@
+"""
+NautiCAI - Near-Duplicate Detection
+Perceptual hashes + BK-tree search for redundant frames and train/val leakage, with optional quarantine
+"""
+
+import os
+import csv
+import json
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import yaml
+
+from augment_cache import AUG_SPLIT, aug_variants, dataset_root
+from dataset_index import build_index
+from image_cache import list_images, train_image_dirs
+
+HASH_VERSION   = 1
+HASH_CHUNK     = 128      # images hashed per worker task
+DEFAULT_RADIUS = 6        # Hamming distance (of 64 bits) still counted as a near-duplicate
+REPORT_DIR     = 'runs/dedup'
+QUARANTINE     = 'quarantine'
+SPLITS_DIR     = 'splits'   # split_dataset.py outputs under the dataset root
+
+
+# ── Hashing ──────────────────────────────────────────────────────────────────
+def phash(path):
+    """64-bit DCT perceptual hash of an image file (None if unreadable)"""
+    # Reduced decode: JPEG is scaled down in the DCT domain, much cheaper than a full decode
+    im = cv2.imread(path, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if im is None:
+        return None
+    small = cv2.resize(im, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    dct   = cv2.dct(small)[:8, :8].reshape(-1)
+    bits  = dct > np.median(dct[1:])
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def _hash_chunk(paths):
+    return [phash(p) for p in paths]
+
+
+def hash_images(root, rel_paths, workers=None):
+    """
+    Hashes of root/rel_paths as uint64 plus a validity mask. Results are kept in
+    root/cache/phash.npz keyed by path, size and mtime, so only new or changed
+    images are decoded; those are hashed in a process pool.
+    """
+    cache_path = os.path.join(root, 'cache', 'phash.npz')
+    cached     = {}
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as z:
+            if int(z['version']) == HASH_VERSION:
+                cached = {p: (s, m, h) for p, s, m, h in
+                          zip(z['paths'].tolist(), z['sizes'], z['mtimes'], z['hashes'])}
+
+    stats  = [os.stat(os.path.join(root, p)) for p in rel_paths]
+    hashes = np.zeros(len(rel_paths), dtype=np.uint64)
+    valid  = np.zeros(len(rel_paths), dtype=bool)
+    todo   = []
+    for i, (p, st) in enumerate(zip(rel_paths, stats)):
+        hit = cached.get(p)
+        if hit is not None and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+            hashes[i], valid[i] = hit[2], True
+        else:
+            todo.append(i)
+
+    print(f"Hashing {len(todo)} images ({len(rel_paths) - len(todo)} cached)...")
+    if todo:
+        chunks = [todo[s:s + HASH_CHUNK] for s in range(0, len(todo), HASH_CHUNK)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(_hash_chunk, [[os.path.join(root, rel_paths[i]) for i in c]
+                                             for c in chunks])
+            for n, (chunk, out) in enumerate(zip(chunks, results), 1):
+                for i, h in zip(chunk, out):
+                    if h is not None:
+                        hashes[i], valid[i] = h, True
+                if n % 20 == 0 or n == len(chunks):
+                    print(f"  [{min(n * HASH_CHUNK, len(todo))}/{len(todo)}] hashed")
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    with open(cache_path + '.tmp', 'wb') as f:
+        np.savez(f, version=HASH_VERSION, paths=np.array(rel_paths, dtype=str)[valid],
+                 sizes=np.array([s.st_size for s in stats], dtype=np.int64)[valid],
+                 mtimes=np.array([s.st_mtime_ns for s in stats], dtype=np.int64)[valid],
+                 hashes=hashes[valid])
+    os.replace(cache_path + '.tmp', cache_path)
+    return hashes, valid
+
+
+# ── Search ───────────────────────────────────────────────────────────────────
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over Hamming distance. A radius query only descends
+    into children whose edge distance lies in [d - r, d + r], so finding
+    near-duplicates is far from a full pairwise comparison.
+    """
+
+    def __init__(self):
+        self.root = None          # node: [hash, item, {distance: child}]
+
+    def add(self, h, item):
+        if self.root is None:
+            self.root = [h, item, {}]
+            return
+        node = self.root
+        while True:
+            d     = hamming(h, node[0])
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [h, item, {}]
+                return
+            node = child
+
+    def query(self, h, radius):
+        """[(item, distance)] of every stored hash within radius of h"""
+        out, stack = [], [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= radius:
+                out.append((node[1], d))
+            for edge, child in node[2].items():
+                if d - radius <= edge <= d + radius:
+                    stack.append(child)
+        return out
+
+
+def find_groups(hashes, radius=DEFAULT_RADIUS, order=None):
+    """
+    Greedy leader clustering: walking `order` (default: position order), each
+    hash not yet grouped becomes a leader and takes every ungrouped hash within
+    radius of it. Members are always within radius of their leader, so chains
+    of near-duplicates cannot merge into one group.
+    Returns [(leader, [(member, distance to leader)])] for groups of size >= 2.
+    """
+    tree = BKTree()
+    for i, h in enumerate(hashes):
+        tree.add(int(h), i)
+    taken  = np.zeros(len(hashes), dtype=bool)
+    groups = []
+    for i in (range(len(hashes)) if order is None else order):
+        if taken[i]:
+            continue
+        taken[i] = True
+        members  = sorted((j, d) for j, d in tree.query(int(hashes[i]), radius) if not taken[j])
+        taken[[j for j, _ in members]] = True
+        if members:
+            groups.append((i, members))
+    return groups
+
+
+def connected_groups(hashes, radius=DEFAULT_RADIUS):
+    """
+    Groups (lists of positions, size >= 2) of hashes connected by any chain
+    of pairs within radius. Too coarse for choosing what to delete, but the
+    right unit for splitting: no pair within radius ends up on both sides.
+    """
+    parent = list(range(len(hashes)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    tree = BKTree()
+    for i, h in enumerate(int(h) for h in hashes):
+        for j, _ in tree.query(h, radius):
+            parent[find(i)] = find(j)
+        tree.add(h, i)
+
+    groups = {}
+    for i in range(len(hashes)):
+        groups.setdefault(find(i), []).append(i)
+    return [g for g in groups.values() if len(g) > 1]
+
+
+# ── Quarantine ───────────────────────────────────────────────────────────────
+def _label_of(rel):
+    split, fname = rel.split('/')[1:3]
+    return os.path.join('labels', split, os.path.splitext(fname)[0] + '.txt')
+
+
+def _drop_from_aug_manifest(root, rel_paths, qdir):
+    """
+    Remove quarantined sources / variants from the augment_cache.py manifest.
+    The original entries are saved in qdir so restore() can put them back.
+    """
+    path = os.path.join(root, 'images', AUG_SPLIT, 'manifest.json')
+    if not os.path.exists(path):
+        return
+    with open(path, 'r') as f:
+        manifest = json.load(f)
+    gone  = set(rel_paths)
+    saved = {}
+    for fname, entry in list(manifest.get('files', {}).items()):
+        outputs = [n for n in entry['outputs'] if f'images/{AUG_SPLIT}/{n}.jpg' not in gone]
+        if entry.get('source', f'images/train/{fname}') in gone:
+            saved[fname] = manifest['files'].pop(fname)
+        elif len(outputs) != len(entry['outputs']):
+            saved[fname] = dict(entry)
+            entry['outputs'] = outputs
+    if not saved:
+        return
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f)
+    os.replace(path + '.tmp', path)
+
+    backup = os.path.join(qdir, 'aug_manifest.json')
+    if os.path.exists(backup):
+        with open(backup, 'r') as f:
+            saved = dict(json.load(f)['files'], **saved)
+    with open(backup, 'w') as f:
+        json.dump({'params': manifest.get('params'), 'files': saved}, f)
+
+
+def _drop_from_splits(root, rel_paths):
+    """
+    Remove quarantined images from split_dataset.py outputs under root/splits:
+    lines of the image lists, and links (symlink or hardlink) in link trees.
+    Returns the number of list lines and links removed. Must run before the
+    files are moved, while links still resolve to them.
+    """
+    split_root = os.path.join(root, SPLITS_DIR)
+    if not os.path.isdir(split_root):
+        return 0
+    abs_root = os.path.abspath(root)
+    paths    = {os.path.join(abs_root, rel) for rel in rel_paths}
+    inodes   = set()
+    for p in paths:
+        if os.path.exists(p):
+            st = os.stat(p)
+            inodes.add((st.st_dev, st.st_ino))
+
+    dropped = 0
+    for dirpath, _, names in os.walk(split_root):
+        is_split_dir = 'data.yaml' in names
+        for name in names:
+            path = os.path.join(dirpath, name)
+            if is_split_dir and name.endswith('.txt'):            # <part>.txt image list
+                with open(path, 'r') as f:
+                    lines = f.read().splitlines()
+                kept = [line for line in lines if line not in paths]
+                if len(kept) != len(lines):
+                    with open(path, 'w') as f:
+                        f.write('\n'.join(kept) + '\n')
+                    dropped += len(lines) - len(kept)
+            elif not is_split_dir:                                # images/<part>/, labels/<part>/
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if (st.st_dev, st.st_ino) in inodes:
+                    os.remove(path)
+                    dropped += 1
+    return dropped
+
+
+def quarantine(root, rel_paths):
+    """
+    Move images (and their labels) to root/quarantine/, recorded in its
+    manifest. They are also dropped from the train_aug manifest and from
+    split_dataset.py outputs under root/splits, so nothing points at them.
+    """
+    qdir     = os.path.join(root, QUARANTINE)
+    manifest = os.path.join(qdir, 'manifest.json')
+    moved    = []
+    if os.path.exists(manifest):
+        with open(manifest, 'r') as f:
+            moved = json.load(f)
+    os.makedirs(qdir, exist_ok=True)
+    files = [src for rel in rel_paths for src in (rel, _label_of(rel))]
+    dropped = _drop_from_splits(root, files)
+    if dropped:
+        print(f"  {dropped} list entries / links removed from {os.path.join(root, SPLITS_DIR)}")
+    _drop_from_aug_manifest(root, rel_paths, qdir)
+    for src in files:
+        if os.path.exists(os.path.join(root, src)):
+            dst = os.path.join(qdir, src)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            shutil.move(os.path.join(root, src), dst)
+            moved.append(src)
+    with open(manifest, 'w') as f:
+        json.dump(moved, f, indent=1)
+    return len(rel_paths)
+
+
+def restore(root):
+    """
+    Move everything in root/quarantine/ back to where it came from and put
+    back its train_aug manifest entries. Split lists are not re-extended:
+    re-run split_dataset.py (same seed) to include the restored images.
+    """
+    qdir     = os.path.join(root, QUARANTINE)
+    manifest = os.path.join(qdir, 'manifest.json')
+    if not os.path.exists(manifest):
+        return 0
+    with open(manifest, 'r') as f:
+        moved = json.load(f)
+    for rel in moved:
+        src = os.path.join(qdir, rel)
+        if os.path.exists(src):
+            os.makedirs(os.path.dirname(os.path.join(root, rel)), exist_ok=True)
+            shutil.move(src, os.path.join(root, rel))
+
+    backup   = os.path.join(qdir, 'aug_manifest.json')
+    aug_path = os.path.join(root, 'images', AUG_SPLIT, 'manifest.json')
+    if os.path.exists(backup):
+        with open(backup, 'r') as f:
+            saved = json.load(f)
+        if os.path.exists(aug_path):
+            with open(aug_path, 'r') as f:
+                current = json.load(f)
+            # Entries from other augmentation parameters would be stale: augment_cache re-renders
+            if current.get('params') == saved['params']:
+                current['files'].update(saved['files'])
+                with open(aug_path + '.tmp', 'w') as f:
+                    json.dump(current, f)
+                os.replace(aug_path + '.tmp', aug_path)
+        os.remove(backup)
+    os.remove(manifest)
+    return len(moved)
+
+
+# ── Report ───────────────────────────────────────────────────────────────────
+def split_sides(index, rows, split_data=None):
+    """
+    (sides, keep) for index rows: the split each image is used in. By default
+    that is its images/<split> directory. With a split data.yaml (written by
+    split_dataset.py) it is 'train' / 'val' from that yaml's image lists or
+    link trees, matched by inode so links count as their originals; rows in
+    neither are not kept.
+    """
+    sides = np.array(index.splits, dtype=object)[index.split[rows]]
+    if split_data is None:
+        return sides, np.ones(len(rows), dtype=bool)
+    by_inode = {}
+    for k, r in enumerate(rows):
+        st = os.stat(os.path.join(index.root, index.paths[r]))
+        by_inode[(st.st_dev, st.st_ino)] = k
+    keep = np.zeros(len(rows), dtype=bool)
+    for side in ('train', 'val'):
+        for path in list_images(train_image_dirs(split_data, side)):
+            st = os.stat(path)
+            k  = by_inode.get((st.st_dev, st.st_ino))
+            if k is not None:
+                sides[k], keep[k] = side, True
+    return sides, keep
+
+
+def find_duplicates(data_yaml='data.yaml', radius=DEFAULT_RADIUS, workers=None,
+                    report_dir=REPORT_DIR, move=False, split_data=None):
+    """
+    Hash every image under images/* (except the derived train_aug split), group
+    near-duplicates and write report_dir/duplicates.csv. Within a split the
+    image with the most boxes is kept and every image within radius of it is
+    a 'duplicate'. Train images within radius of a val image are 'leak', so
+    val stays fixed and evaluate_model is not scored on images seen in training.
+    split_data: data.yaml of a split_dataset.py split, whose train / val
+    lists then define the splits instead of the images/ directories.
+    move=True quarantines every duplicate / leak image, plus the train_aug
+    variants of leaked images (undo with restore()).
+    """
+    print("=" * 60)
+    print("  NautiCAI - Near-Duplicate Detection")
+    print("=" * 60)
+
+    index = build_index(data_yaml)
+    rows  = np.flatnonzero(~index.image_mask(split=AUG_SPLIT))
+    paths = index.paths[rows].tolist()
+    hashes, valid = hash_images(index.root, paths, workers)
+    rows, hashes = rows[valid], hashes[valid]
+
+    split_of, used = split_sides(index, rows, split_data)
+    rows, hashes, split_of = rows[used], hashes[used], split_of[used]
+    if split_data:
+        print(f"Splits from {split_data}: {int((split_of == 'train').sum())} train · "
+              f"{int((split_of == 'val').sum())} val")
+    priority = lambda m: (-index.count[rows[m]], index.paths[rows[m]])    # most boxes is kept
+    records, group_of = [], {}
+
+    def record(gid, m, distance, action):
+        group_of[m] = gid
+        records.append((gid, split_of[m], index.paths[rows[m]], int(index.count[rows[m]]),
+                        distance, action))
+
+    # Leaks: train images within radius of a held-out image, grouped with their nearest one
+    held_out = np.flatnonzero(split_of != 'train')
+    train    = np.flatnonzero(split_of == 'train')
+    leaked   = []
+    if len(held_out):
+        tree = BKTree()
+        for m in held_out:
+            tree.add(int(hashes[m]), int(m))
+        for m in train:
+            hits = tree.query(int(hashes[m]), radius)
+            if hits:
+                leaked.append((m,) + min(hits, key=lambda hit: (hit[1], priority(hit[0]))))
+
+    # Duplicates: leader clustering within each split; leaked train images are not kept
+    gid = 0
+    leak_set = {m for m, _, _ in leaked}
+    for split in sorted(set(split_of)):
+        pos = np.array([m for m in np.flatnonzero(split_of == split) if m not in leak_set], dtype=int)
+        for leader, members in find_groups(hashes[pos], radius, sorted(range(len(pos)),
+                                                                         key=lambda k: priority(pos[k]))):
+            record(gid, pos[leader], 0, 'keep')
+            for k, d in members:
+                record(gid, pos[k], d, 'duplicate')
+            gid += 1
+    for m, v, d in leaked:
+        if v not in group_of:
+            record(gid, v, 0, 'keep')
+            gid += 1
+        record(group_of[v], m, d, 'leak')
+    records.sort(key=lambda r: (r[0], r[5] != 'keep', r[1], r[2]))
+
+    os.makedirs(report_dir, exist_ok=True)
+    with open(os.path.join(report_dir, 'duplicates.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['group', 'split', 'image', 'boxes', 'distance_to_kept', 'action'])
+        writer.writerows(records)
+
+    dupes = [r[2] for r in records if r[5] == 'duplicate']
+    leaks = [r[2] for r in records if r[5] == 'leak']
+    print(f"\n{len(paths)} images · {gid} near-duplicate groups (radius {radius})")
+    print(f"  Redundant within a split: {len(dupes)}")
+    print(f"  Train images leaking into val: {len(leaks)}")
+    print(f"Report saved to {report_dir}/duplicates.csv")
+
+    if move and (dupes or leaks):
+        # Augmented copies of a leaked image leak just the same
+        variants = aug_variants(index.root)
+        n = quarantine(index.root, dupes + leaks + [v for p in leaks for v in variants.get(p, [])])
+        print(f"\n✅ {n} images quarantined to {os.path.join(index.root, QUARANTINE)} "
+              f"(undo with --restore)")
+    elif leaks:
+        print("\n⚠️  Train/val leakage inflates evaluate_model scores — re-run with --quarantine")
+    return records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='NautiCAI Near-Duplicate Detection')
+    parser.add_argument('--data', type=str, default='data.yaml')
+    parser.add_argument('--split-data', type=str, default=None,
+                        help='data.yaml of a split_dataset.py split: check leaks between its train / val lists')
+    parser.add_argument('--radius', type=int, default=DEFAULT_RADIUS,
+                        help='Max Hamming distance between 64-bit hashes of near-duplicates')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--report-dir', type=str, default=REPORT_DIR)
+    parser.add_argument('--quarantine', action='store_true',
+                        help='Move duplicates and leaked train images (with labels) to <dataset>/quarantine/')
+    parser.add_argument('--restore', action='store_true',
+                        help='Move quarantined images back and exit')
+
+    args = parser.parse_args()
+
+    if args.restore:
+        with open(args.data, 'r') as f:
+            root = dataset_root(yaml.safe_load(f))
+        print(f"✅ Restored {restore(root)} files from {os.path.join(root, QUARANTINE)}")
+    else:
+        find_duplicates(
+            data_yaml  = args.data,
+            radius     = args.radius,
+            workers    = args.workers,
+            report_dir = args.report_dir,
+            move       = args.quarantine,
+            split_data = args.split_data,
+        )
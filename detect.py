@@ -0,0 +1,277 @@
+"""
+NautiCAI - Headless Batch Detection
+Runs the detector and the smart_log dedup policy over whole mission archives, no UI required
+"""
+
+import os
+import json
+import time
+import argparse
+import importlib.util
+from multiprocessing import Pool
+
+import cv2
+
+from detection_log import log_detection, best_per_class, format_timestamp
+from video_engine import iter_sampled_frames
+from backends import load_model, as_boxes, BACKENDS, GRAPH_OPTS
+from tracker import IoUTracker, log_tracks
+from taxonomy import get_taxonomy
+
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.bmp')
+VIDEO_EXTS = ('.mp4', '.avi', '.mov', '.mkv')
+
+_MODEL = None   # per-worker model, set by _init_worker
+_OPTS  = None
+_ERROR = None   # model load failure in this worker, reported per file instead of raised
+
+PARQUET_ENGINES = ('pyarrow', 'fastparquet')
+LOAD_ERROR      = 'model failed to load'
+
+
+def find_media(source_dir):
+    """Recursively list image and video files under source_dir (sorted for stable output)"""
+    media = []
+    for root, _, files in os.walk(source_dir):
+        for fname in files:
+            ext = os.path.splitext(fname)[1].lower()
+            if ext in IMAGE_EXTS or ext in VIDEO_EXTS:
+                media.append(os.path.join(root, fname))
+    return sorted(media)
+
+
+def _init_worker(weights, opts):
+    """Load one model per worker process and split CPU threads between workers"""
+    global _MODEL, _OPTS, _ERROR
+    _OPTS   = opts
+    threads = opts['threads'] or max(1, (os.cpu_count() or 1) // max(1, opts['workers']))
+    try:
+        _MODEL = load_model(weights, backend=opts['backend'], threads=threads,
+                            graph_opt=opts['graph_opt'])
+    except Exception as e:
+        # An exception escaping an initializer makes Pool respawn the worker forever
+        _ERROR = f'{LOAD_ERROR}: {e}'
+
+
+def _save_snapshot(frame_bytes, source, frame_idx):
+    if not _OPTS['snapshot_dir'] or frame_bytes is None:
+        return None
+    stem = os.path.splitext(source)[0].replace(os.sep, '__')
+    path = os.path.join(_OPTS['snapshot_dir'], f'{stem}_{frame_idx:06d}.jpg')
+    if not os.path.exists(path):
+        with open(path, 'wb') as f:
+            f.write(frame_bytes)
+    return path
+
+
+def _encode(res):
+    """Annotated frame as JPEG bytes, same colour convention as the app log"""
+    if not _OPTS['snapshot_dir']:
+        return None
+    ann_rgb = cv2.cvtColor(res.plot(), cv2.COLOR_BGR2RGB)
+    _, buf  = cv2.imencode('.jpg', ann_rgb)
+    return buf.tobytes()
+
+
+def _detect_image(path, rel):
+    log, counts, tracker = [], {}, {}
+    img = cv2.imread(path)
+    if img is None:
+        return log
+    res = _MODEL.predict(img, conf=_OPTS['conf'], verbose=False)[0]
+    if res.boxes is None or len(res.boxes) == 0:
+        return log
+    frame_bytes = _encode(res)
+    ts          = time.strftime('%H:%M:%S')
+    boxes       = as_boxes(res.boxes)
+    names       = get_taxonomy(_MODEL.names).names_of(boxes.cls)
+    for cn, cf, xyxy in zip(names, boxes.conf.tolist(), boxes.xyxy.tolist()):
+        log_detection(log, counts, cn, cf, ts, frame_bytes, tracker,
+                      source=rel, media='image', frame_idx=0, xyxy=xyxy)
+    return log
+
+
+def _detect_video(path, rel):
+    log, counts, tracker = [], {}, {}
+    cap = cv2.VideoCapture(path)
+    fps = max(cap.get(cv2.CAP_PROP_FPS), 1)
+    if _OPTS['track']:
+        tracker = IoUTracker()
+    try:
+        for fc, frame in iter_sampled_frames(cap, stride=_OPTS['skip'],
+                                             checks_per_sec=_OPTS['checks_per_sec'],
+                                             max_frames=_OPTS['max_frames']):
+            res = _MODEL.predict(frame, conf=_OPTS['conf'], verbose=False)[0]
+            if _OPTS['track']:
+                # Snapshot encoded lazily: only for frames that end up as a track's best
+                closed = tracker.update(as_boxes(res.boxes), fc / fps, fc, lambda res=res: _encode(res))
+                log_tracks(log, counts, closed, _MODEL.names, source=rel, media='video')
+                continue
+            if res.boxes is None or len(res.boxes) == 0:
+                continue
+            frame_bytes = _encode(res)
+            ts          = format_timestamp(fc / fps)
+            for cn, (cf, xyxy) in best_per_class(res.boxes, _MODEL.names).items():
+                log_detection(log, counts, cn, cf, ts, frame_bytes, tracker, source=rel,
+                              media='video', frame_idx=fc, time_sec=fc / fps, xyxy=xyxy)
+        if _OPTS['track']:
+            log_tracks(log, counts, tracker.flush(), _MODEL.names, source=rel, media='video')
+    finally:
+        cap.release()
+    return log
+
+
+def _process(args):
+    """Worker entry point: returns (relative path, detection records, error)"""
+    path, rel = args
+    if _ERROR:
+        return rel, [], _ERROR
+    try:
+        ext = os.path.splitext(path)[1].lower()
+        log = _detect_video(path, rel) if ext in VIDEO_EXTS else _detect_image(path, rel)
+    except Exception as e:
+        return rel, [], str(e)
+
+    records = []
+    for entry in log:
+        entry['snapshot'] = _save_snapshot(entry.pop('frame_bytes'), rel, entry['frame_idx'])
+        records.append(entry)
+    return rel, records, None
+
+
+def run_detection(
+    source_dir,
+    output_path   = 'detections.jsonl',
+    weights       = 'weights/best.pt',
+    conf          = 0.25,
+    workers       = 4,
+    skip          = 30,
+    checks_per_sec= None,
+    max_frames    = None,
+    snapshot_dir  = None,
+    backend       = 'auto',
+    threads       = None,
+    graph_opt     = 'all',
+    track         = False,
+):
+    """
+    Run the detector over every image/video under source_dir using a pool of
+    worker processes. Detections are written to output_path as JSONL (streamed
+    as files finish) or Parquet (when the path ends with .parquet).
+    With track=True videos are logged once per IoU track instead of by the
+    confidence-difference policy.
+    """
+    as_parquet = output_path.endswith('.parquet')
+    if not os.path.exists(weights):
+        raise FileNotFoundError(f"Weights not found: {weights}")
+    if as_parquet and not any(importlib.util.find_spec(e) for e in PARQUET_ENGINES):
+        # Checked up front: rows are only written to Parquet once the whole batch is done
+        raise ImportError(f"Parquet output needs one of {', '.join(PARQUET_ENGINES)} "
+                          f"(pip install pyarrow), or use a .jsonl output")
+
+    media = find_media(source_dir)
+    print(f"Found {len(media)} media files in {source_dir}")
+    if not media:
+        return 0
+
+    # Load once here so a missing backend package or corrupt weights fails before the pool starts
+    load_model(weights, backend=backend, threads=1, graph_opt=graph_opt)
+
+    if snapshot_dir:
+        os.makedirs(snapshot_dir, exist_ok=True)
+    out_dir = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(out_dir, exist_ok=True)
+
+    opts = {
+        'conf':           conf,
+        'workers':        workers,
+        'skip':           skip,
+        'checks_per_sec': checks_per_sec,
+        'max_frames':     max_frames,
+        'snapshot_dir':   snapshot_dir,
+        'backend':        backend,
+        'threads':        threads,
+        'graph_opt':      graph_opt,
+        'track':          track,
+    }
+    rows, total, failed = [], 0, 0
+    tasks = [(p, os.path.relpath(p, source_dir)) for p in media]
+
+    jsonl = None if as_parquet else open(output_path, 'w', encoding='utf-8')
+    try:
+        with Pool(processes=max(1, workers), initializer=_init_worker,
+                  initargs=(weights, opts)) as pool:
+            for n, (rel, records, err) in enumerate(pool.imap_unordered(_process, tasks), 1):
+                if err and err.startswith(LOAD_ERROR):
+                    pool.terminate()
+                    raise RuntimeError(err)
+                if err:
+                    failed += 1
+                    print(f"  ⚠️  {rel}: {err}")
+                total += len(records)
+                if as_parquet:
+                    rows.extend(records)
+                else:
+                    for rec in records:
+                        jsonl.write(json.dumps(rec) + '\n')
+                    jsonl.flush()
+                if n % 50 == 0 or n == len(tasks):
+                    print(f"  [{n}/{len(tasks)}] detections logged: {total}")
+    finally:
+        if jsonl:
+            jsonl.close()
+
+    if as_parquet:
+        import pandas as pd
+        pd.DataFrame(rows).to_parquet(output_path, index=False)
+
+    print(f"\n✅ {total} detections from {len(tasks) - failed} files written to {output_path}")
+    if failed:
+        print(f"⚠️  {failed} files failed")
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='NautiCAI Batch Detection')
+    parser.add_argument('--source', type=str, required=True,
+                        help='Directory of images and videos (searched recursively)')
+    parser.add_argument('--output', type=str, default='detections.jsonl',
+                        help='Output file (.jsonl or .parquet)')
+    parser.add_argument('--weights', type=str, default='weights/best.pt')
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--backend', type=str, default='auto',
+                        choices=('auto',) + BACKENDS,
+                        help='auto picks from the weights path (.pt / .onnx / _openvino_model)')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='CPU threads per worker (default: cores / workers)')
+    parser.add_argument('--graph-opt', type=str, default='all', choices=GRAPH_OPTS,
+                        help='ONNX Runtime graph optimization level')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--skip', type=int, default=30,
+                        help='Video: process every N frames')
+    parser.add_argument('--cps', type=float, default=None,
+                        help='Video: checks per second (overrides --skip)')
+    parser.add_argument('--max-frames', type=int, default=None,
+                        help='Video: max frames to scan per clip')
+    parser.add_argument('--snapshots', type=str, default=None,
+                        help='Directory to save annotated snapshots of logged detections')
+    parser.add_argument('--track', action='store_true',
+                        help='Video: log each tracked anomaly once with its best frame')
+
+    args = parser.parse_args()
+
+    run_detection(
+        source_dir     = args.source,
+        output_path    = args.output,
+        weights        = args.weights,
+        conf           = args.conf,
+        workers        = args.workers,
+        skip           = args.skip,
+        checks_per_sec = args.cps,
+        max_frames     = args.max_frames,
+        snapshot_dir   = args.snapshots,
+        backend        = args.backend,
+        threads        = args.threads,
+        graph_opt      = args.graph_opt,
+        track          = args.track,
+    )
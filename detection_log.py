@@ -0,0 +1,88 @@
+"""
+NautiCAI - Detection Logging Policy
+Decides which detections enter the anomaly log; shared by the Streamlit app and the batch CLI
+"""
+
+import numpy as np
+
+from backends import as_boxes
+from taxonomy import get_taxonomy
+
+# If same class found again with 50%+ different confidence = different instance, log it
+DIFF_THRESHOLD = 0.50
+
+# Raw predictions are kept from this confidence up (the sidebar slider minimum)
+# so any display threshold can be served by filtering instead of re-inference
+FLOOR_CONF = 0.10
+
+
+def log_detection(log, counts, cn, cf, ts, frame_bytes, class_tracker, store=None, **extra):
+    """
+    Append a detection to `log` (and bump `counts[cn]`, unless counts is None
+    because `log` is a MissionState that counts itself) only if:
+    - Brand new class never seen before → always log
+    - Same class but confidence differs by DIFF_THRESHOLD+ → different instance, log it
+    - Same class, similar confidence → SKIP (same thing seen again)
+    With a SnapshotStore the frame is written there and the entry only keeps
+    its `frame_ref` plus thumbnail / preview refs. Extra keyword fields (e.g. source, frame_idx, xyxy) are
+    stored on the entry. frame_bytes may be a callable, evaluated only when
+    the detection is actually logged, or (with a store) a PendingFrame that
+    is kept as `frame_pending` and drawn on first use. class_tracker=None skips the policy
+    (tracked detections are already one entry per physical anomaly).
+    """
+    if class_tracker is not None and cn in class_tracker:
+        logged_confs = class_tracker[cn]
+        if not all(abs(cf - prev) >= DIFF_THRESHOLD for prev in logged_confs):
+            return False
+
+    pending = store is not None and hasattr(frame_bytes, 'render')
+    if callable(frame_bytes):
+        frame_bytes = frame_bytes()
+
+    entry = {
+        'class_name':  cn,
+        'confidence':  cf,
+        'timestamp':   ts,
+    }
+    if pending:
+        entry['frame_ref']     = None
+        entry['frame_pending'] = frame_bytes
+    elif store is not None:
+        entry['frame_ref'] = store.put(frame_bytes) if frame_bytes else None
+        if entry['frame_ref']:
+            for name, ref in store.put_pyramid(entry['frame_ref']).items():
+                entry[name + '_ref'] = ref
+    else:
+        entry['frame_bytes'] = frame_bytes
+    entry.update(extra)
+    log.append(entry)
+    if counts is not None:
+        counts[cn] = counts.get(cn, 0) + 1
+    if class_tracker is not None:
+        class_tracker.setdefault(cn, []).append(cf)
+    return True
+
+
+def best_per_class(boxes, names):
+    """
+    Pick the best confidence box per class in one frame so multiple boxes
+    of the same class don't create duplicates. Returns {class_name: (conf, xyxy)}.
+    """
+    boxes = as_boxes(boxes)
+    if not len(boxes):
+        return {}
+    # Highest confidence first (stable, so ties keep the earlier box), then
+    # the first occurrence of each class
+    order    = np.argsort(-boxes.conf, kind='stable')
+    _, first = np.unique(boxes.cls[order], return_index=True)
+    order    = order[np.sort(first)]
+    classes  = get_taxonomy(names).names_of(boxes.cls[order])
+    return {cn: (float(boxes.conf[i]), boxes.xyxy[i].tolist())
+            for cn, i in zip(classes, order)}
+
+
+def format_timestamp(seconds):
+    """Video position as MM:SS"""
+    mm = int(seconds // 60)
+    ss = int(seconds % 60)
+    return str(mm).zfill(2) + ":" + str(ss).zfill(2)
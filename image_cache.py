@@ -0,0 +1,259 @@
+"""
+NautiCAI - Decoded Image Cache
+Pre-decodes and resizes training images into one memory-mapped uint8 file so epochs skip JPEG decode
+"""
+
+import os
+import math
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import yaml
+
+from augment_cache import dataset_root, IMAGE_EXTS
+
+CACHE_VERSION = 1          # bump when decode_resize changes
+CACHE_CHUNK   = 256        # images decoded per batch of worker tasks
+RAM_FRACTION  = 0.5        # load the cache into RAM when it uses at most this share of free memory
+
+
+def decode_resize(path, imgsz):
+    """
+    BGR image resized so its long side is imgsz, as Ultralytics' load_image
+    does in rect mode. Returns (image, (h0, w0)) or (None, None).
+    """
+    im = cv2.imread(path)
+    if im is None:
+        return None, None
+    h0, w0 = im.shape[:2]
+    r = imgsz / max(h0, w0)
+    if r != 1:
+        w, h = min(math.ceil(w0 * r), imgsz), min(math.ceil(h0 * r), imgsz)
+        im = cv2.resize(im, (w, h), interpolation=cv2.INTER_LINEAR)
+    return np.ascontiguousarray(im), (h0, w0)
+
+
+def read_image_list(path):
+    """Image paths in a YOLO .txt list (one per line; relative lines are relative to the list)"""
+    with open(path, 'r') as f:
+        lines = [line.strip() for line in f]
+    base = os.path.dirname(os.path.abspath(path))
+    return [l if os.path.isabs(l) else os.path.normpath(os.path.join(base, l)) for l in lines if l]
+
+
+def list_images(img_dirs):
+    """Sorted real paths of all images under img_dirs (recursive) or listed in .txt image lists"""
+    files = []
+    for d in img_dirs:
+        if os.path.isfile(d) and d.endswith('.txt'):
+            files += [f for f in read_image_list(d) if f.lower().endswith(IMAGE_EXTS)]
+            continue
+        for dirpath, _, names in os.walk(d):
+            files += [os.path.join(dirpath, n) for n in names if n.lower().endswith(IMAGE_EXTS)]
+    return sorted(os.path.realpath(f) for f in files)
+
+
+def train_image_dirs(data_yaml='data.yaml', split='train'):
+    """
+    Image sources of a split in data.yaml (a single entry or a list): image
+    directories or .txt image lists such as those written by split_dataset.py
+    """
+    with open(data_yaml, 'r') as f:
+        data = yaml.safe_load(f)
+    root    = dataset_root(data)
+    entries = data[split] if isinstance(data[split], list) else [data[split]]
+    return [os.path.join(root, e) for e in entries]
+
+
+def default_cache_dir(data_yaml='data.yaml', split='train', imgsz=640):
+    with open(data_yaml, 'r') as f:
+        root = dataset_root(yaml.safe_load(f))
+    return os.path.join(root, 'cache', f'{split}_{imgsz}')
+
+
+def build_image_cache(img_dirs, cache_dir, imgsz=640, workers=None):
+    """
+    Decode + resize every image under img_dirs into cache_dir/images.u8 (a flat
+    uint8 file read back with np.memmap) with an index in cache_dir/index.npz.
+    Images whose size and mtime are unchanged are copied from the previous
+    cache instead of being decoded again; the new cache replaces the old one
+    atomically. cv2 releases the GIL, so decoding runs on a thread pool.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    files = list_images(img_dirs)
+    stats = [os.stat(f) for f in files]
+
+    old = ImageCache.open(cache_dir, in_ram=False)
+    if old is not None and old.imgsz != imgsz:
+        old = None
+    if old is not None and len(old) == len(files) and \
+            all(old.row(f, st) is not None for f, st in zip(files, stats)):
+        print(f"✅ Image cache up to date: {len(files)} images in {cache_dir}")
+        return old.nbytes
+
+    data_path = os.path.join(cache_dir, 'images.u8')
+    offsets   = np.zeros(len(files), dtype=np.int64)
+    shapes    = np.zeros((len(files), 3), dtype=np.int32)    # h, w, c of the cached image
+    hw0       = np.zeros((len(files), 2), dtype=np.int32)
+    valid     = np.zeros(len(files), dtype=bool)
+    reused = decoded = 0
+    print(f"Caching {len(files)} images at {imgsz}px → {cache_dir}")
+
+    pos = 0
+    with open(data_path + '.tmp', 'wb') as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(files), CACHE_CHUNK):
+            chunk = range(start, min(start + CACHE_CHUNK, len(files)))
+            hits, todo = {}, []
+            for i in chunk:
+                hit = old.lookup(files[i], stats[i]) if old is not None else None
+                if hit is not None:
+                    hits[i] = hit
+                else:
+                    todo.append(i)
+            fresh = dict(zip(todo, pool.map(lambda i: decode_resize(files[i], imgsz), todo)))
+
+            for i in chunk:
+                if i in hits:
+                    im, size0 = hits[i]
+                    reused += 1
+                else:
+                    im, size0 = fresh[i]
+                    decoded += 1
+                if im is None:
+                    print(f"  ⚠️  unreadable: {files[i]}")
+                    continue
+                out.write(im.tobytes())
+                offsets[i], shapes[i], hw0[i], valid[i] = pos, im.shape, size0, True
+                pos += im.nbytes
+            print(f"  [{chunk.stop}/{len(files)}] cached")
+
+    del old                                     # release the old memmap before replacing it
+    os.replace(data_path + '.tmp', data_path)
+    np.savez(os.path.join(cache_dir, 'index.npz'),
+             version=CACHE_VERSION, imgsz=imgsz, files=np.array(files)[valid],
+             sizes=np.array([s.st_size for s in stats], dtype=np.int64)[valid],
+             mtimes=np.array([s.st_mtime_ns for s in stats], dtype=np.int64)[valid],
+             offsets=offsets[valid], shapes=shapes[valid], hw0=hw0[valid])
+
+    print(f"\n✅ {int(valid.sum())} images cached ({pos / 1e9:.2f} GB) · "
+          f"{decoded} decoded · {reused} reused")
+    return pos
+
+
+class ImageCache:
+    """
+    Read side of a cache built by build_image_cache. lookup(path) returns the
+    resized image (a view into the memmap, or into RAM when it fits) and its
+    original (h, w); stale entries (file changed since caching) are skipped.
+    """
+
+    def __init__(self, cache_dir, index, in_ram=None):
+        self.cache_dir = cache_dir
+        self.imgsz     = int(index['imgsz'])
+        self.files     = [str(f) for f in index['files']]
+        self.sizes     = index['sizes']
+        self.mtimes    = index['mtimes']
+        self.offsets   = index['offsets']
+        self.shapes    = index['shapes']
+        self.hw0       = index['hw0']
+        self.rows      = {f: i for i, f in enumerate(self.files)}
+
+        path = os.path.join(cache_dir, 'images.u8')
+        if in_ram is None:
+            in_ram = os.path.getsize(path) <= RAM_FRACTION * available_memory()
+        self.in_ram = in_ram
+        self.data   = self._load(in_ram)
+
+    def _load(self, in_ram):
+        path = os.path.join(self.cache_dir, 'images.u8')
+        if not os.path.getsize(path):
+            return np.zeros(0, dtype=np.uint8)
+        if in_ram:
+            return np.fromfile(path, dtype=np.uint8)
+        return np.memmap(path, dtype=np.uint8, mode='r')
+
+    def __getstate__(self):
+        # Spawned dataloader workers reopen the file as a memmap (shared page
+        # cache) instead of receiving a pickled copy of the whole cache
+        return dict(self.__dict__, data=None, in_ram=False)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.data = self._load(False)
+
+    @classmethod
+    def open(cls, cache_dir, in_ram=None):
+        """ImageCache for cache_dir, or None if missing / built by another CACHE_VERSION"""
+        index_path = os.path.join(cache_dir, 'index.npz')
+        if not os.path.exists(index_path):
+            return None
+        with np.load(index_path) as index:
+            if int(index['version']) != CACHE_VERSION:
+                return None
+            return cls(cache_dir, dict(index), in_ram=in_ram)
+
+    def __len__(self):
+        return len(self.files)
+
+    @property
+    def nbytes(self):
+        return int(self.data.nbytes)
+
+    def row(self, path, stat=None):
+        """Cache row of an image path, or None if not cached or changed since"""
+        i = self.rows.get(os.path.realpath(path))
+        if i is None:
+            return None
+        st = stat or os.stat(path)
+        if st.st_size != self.sizes[i] or st.st_mtime_ns != self.mtimes[i]:
+            return None
+        return i
+
+    def image(self, i):
+        """(resized image, (h0, w0)) of a cache row"""
+        h, w, c = self.shapes[i]
+        start   = self.offsets[i]
+        im      = self.data[start:start + h * w * c].reshape(h, w, c)
+        return im, (int(self.hw0[i][0]), int(self.hw0[i][1]))
+
+    def lookup(self, path, stat=None):
+        i = self.row(path, stat)
+        return None if i is None else self.image(i)
+
+
+def available_memory():
+    """Free RAM in bytes (psutil when installed, else /proc/meminfo, else 0)"""
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='NautiCAI Decoded Image Cache')
+    parser.add_argument('--data', type=str, default='data.yaml')
+    parser.add_argument('--split', type=str, default='train')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--cache-dir', type=str, default=None,
+                        help='Default: <dataset>/cache/<split>_<imgsz>')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+
+    args = parser.parse_args()
+
+    build_image_cache(
+        img_dirs  = train_image_dirs(args.data, args.split),
+        cache_dir = args.cache_dir or default_cache_dir(args.data, args.split, args.imgsz),
+        imgsz     = args.imgsz,
+        workers   = args.workers,
+    )
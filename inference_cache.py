@@ -0,0 +1,99 @@
+"""
+NautiCAI - Image Inference Cache
+Memoizes image-tab inference across Streamlit reruns, keyed by content hash, model and simulation settings
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from backends import as_boxes, draw_boxes
+from detection_log import FLOOR_CONF
+from underwater_augment import apply_full_underwater_simulation
+
+DEFAULT_MEM_BUDGET = 256 * 1024 * 1024    # bytes of decoded / annotated frames kept in RAM
+
+
+class CachedInference:
+    """
+    Decoded image, simulated input and raw predictions at FLOOR_CONF for one
+    upload. Any threshold at or above the floor is served by filtering.
+    """
+
+    def __init__(self, img, proc, boxes, names):
+        self.img    = img
+        self.proc   = proc
+        self.boxes  = boxes
+        self.names  = names
+        self._ann   = None        # (conf, annotated BGR) of the last threshold drawn
+
+    def filtered(self, conf):
+        """Boxes with confidence >= conf"""
+        return self.boxes[self.boxes.conf >= conf]
+
+    def annotated(self, conf):
+        """Annotated BGR frame for a threshold (last one memoized)"""
+        if self._ann is None or self._ann[0] != conf:
+            self._ann = (conf, draw_boxes(self.proc, self.filtered(conf), self.names))
+        return self._ann[1]
+
+    @property
+    def nbytes(self):
+        n = self.img.nbytes + (self.proc.nbytes if self.proc is not self.img else 0)
+        return n + 2 * self.proc.nbytes   # room for the memoized annotation
+
+
+class InferenceCache:
+    """Byte-bounded LRU of CachedInference entries; safe to share between sessions"""
+
+    def __init__(self, mem_budget=DEFAULT_MEM_BUDGET):
+        self.mem_budget = mem_budget
+        self._lru       = OrderedDict()
+        self._mem_bytes = 0
+        self._lock      = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                self._lru.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            if key in self._lru:
+                self._mem_bytes -= self._lru.pop(key).nbytes
+            if entry.nbytes > self.mem_budget:
+                return entry
+            self._lru[key]   = entry
+            self._mem_bytes += entry.nbytes
+            while self._mem_bytes > self.mem_budget:
+                _, old = self._lru.popitem(last=False)
+                self._mem_bytes -= old.nbytes
+        return entry
+
+    def infer(self, data, model, model_id, sim=None, floor=FLOOR_CONF):
+        """
+        CachedInference for encoded image bytes. `sim` is None or a
+        (turbidity, marine_snow) tuple for apply_full_underwater_simulation.
+        Decoding, simulation and model.predict only run on a cache miss.
+        """
+        key   = (hashlib.sha1(data).hexdigest(), model_id, floor, sim)
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+
+        img  = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        proc = apply_full_underwater_simulation(img, *sim) if sim else img
+        res  = model.predict(proc, conf=floor, verbose=False)
+        return self.put(key, CachedInference(img, proc, as_boxes(res[0].boxes), model.names))
+
+    def __len__(self):
+        return len(self._lru)
+
+    @property
+    def memory_bytes(self):
+        return self._mem_bytes
@@ -0,0 +1,84 @@
+"""
+NautiCAI - Mission State
+Anomaly log that keeps per-class / per-severity counts, a time histogram and the top-K up to date as entries are appended
+"""
+
+import heapq
+
+from taxonomy import SEVERITIES, severity_of
+
+HISTOGRAM_BUCKET_SEC = 10    # width of a timeline bucket
+TOP_K                = 12    # highest-confidence entries kept
+
+
+class MissionState(list):
+    """
+    The session anomaly log. It is a plain list of entries for everything
+    that reads it (report, snapshot grid), but append() / extend() also
+    maintain the aggregates, so counters are O(1) reads instead of scans:
+        class_counts, severity_counts, histogram (bucket → severity counts), top()
+    The histogram buckets the video position `time_sec` of an entry; image
+    detections (wall-clock timestamps only) are not on the timeline.
+    Only append / extend / clear are tracked; don't mutate entries in place.
+    """
+
+    def __init__(self, entries=(), bucket_sec=HISTOGRAM_BUCKET_SEC, top_k=TOP_K):
+        super().__init__()
+        self.bucket_sec = bucket_sec
+        self.top_k      = top_k
+        self._reset()
+        self.extend(entries)
+
+    def _reset(self):
+        self.class_counts    = {}
+        self.severity_counts = dict.fromkeys(SEVERITIES, 0)
+        self.histogram       = {}
+        self._top            = []       # min-heap of (confidence, seq, entry)
+
+    def append(self, entry):
+        seq = len(self)
+        super().append(entry)
+        cn  = entry.get('class_name', 'unknown')
+        sev = severity_of(cn)
+        self.class_counts[cn]    = self.class_counts.get(cn, 0) + 1
+        self.severity_counts[sev] += 1
+
+        secs = entry.get('time_sec')
+        if secs is not None:
+            bucket = self.histogram.setdefault(int(secs // self.bucket_sec * self.bucket_sec),
+                                               dict.fromkeys(SEVERITIES, 0))
+            bucket[sev] += 1
+
+        item = (entry.get('confidence', 0.0), seq, entry)
+        if len(self._top) < self.top_k:
+            heapq.heappush(self._top, item)
+        elif item[0] > self._top[0][0]:
+            heapq.heapreplace(self._top, item)
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def __reduce__(self):
+        # Rebuild aggregates from the entries when pickled / deep-copied
+        return self.__class__, (list(self), self.bucket_sec, self.top_k)
+
+    def clear(self):
+        super().clear()
+        self._reset()
+
+    def top(self):
+        """Highest-confidence entries, best first"""
+        return [entry for _, _, entry in sorted(self._top, key=lambda x: (-x[0], x[1]))]
+
+    @property
+    def critical(self):
+        return self.severity_counts['CRITICAL']
+
+    @property
+    def warnings(self):
+        return self.severity_counts['WARNING']
+
+    @property
+    def normal(self):
+        return self.severity_counts['NORMAL']
@@ -0,0 +1,174 @@
+"""
+NautiCAI - Raw Prediction Store
+Columnar store of every box predicted at the floor threshold, so the anomaly log can be rebuilt for any threshold
+"""
+
+import hashlib
+
+import cv2
+import numpy as np
+
+from backends import Boxes, draw_boxes
+from detection_log import FLOOR_CONF, log_detection, best_per_class
+from tracker import IoUTracker, log_tracks
+from mission_state import MissionState
+from taxonomy import get_taxonomy
+
+SOURCE_MODES = ('box', 'class', 'track')
+
+
+class PendingFrame:
+    """
+    Annotated frame of a rebuilt log entry: the stored raw frame plus the
+    boxes to draw on it. Drawn only when the grid, preview or report first
+    needs it (see snapshot_store.resolve_frame_bytes). Small and picklable,
+    so report worker processes can draw it themselves.
+    """
+
+    def __init__(self, raw_ref, boxes, names):
+        self.raw_ref = raw_ref
+        self.boxes   = boxes
+        self.names   = names
+
+    @property
+    def key(self):
+        """Identity of the drawn frame (raw frame + boxes), e.g. for report caching"""
+        h = hashlib.sha1(self.boxes.xyxy.tobytes() + self.boxes.conf.tobytes() + self.boxes.cls.tobytes())
+        return f'{self.raw_ref}+{h.hexdigest()[:16]}'
+
+    def render(self, store):
+        """Annotated JPEG (RGB-order bytes, as the live path stores them), or None"""
+        data = store.get(self.raw_ref) if self.raw_ref else None
+        if not data:
+            return None
+        img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        ann = draw_boxes(img, self.boxes, self.names)
+        _, buf = cv2.imencode('.jpg', cv2.cvtColor(ann, cv2.COLOR_BGR2RGB))
+        return buf.tobytes()
+
+
+class PredictionStore:
+    """
+    Raw boxes (frame row, class id, confidence, xyxy) of every analysed
+    frame that had a detection at `floor`, in columnar NumPy arrays.
+
+    Frames are grouped into sources (one uploaded image or video each),
+    replayed on rebuild with the same policy as the live path:
+        box   → every box through the confidence-difference policy (image tab)
+        class → best box per class per frame through that policy
+        track → IoUTracker, one entry per track (video tab)
+    The un-annotated frame is kept in the SnapshotStore as `raw_ref`;
+    rebuilt entries carry a PendingFrame and are redrawn on first use.
+    """
+
+    def __init__(self, floor=FLOOR_CONF):
+        self.floor   = floor
+        self.sources = []          # (name, names dict, mode)
+        # Frame table
+        self.frame_source = []
+        self.frame_idx    = []
+        self.frame_ts     = []
+        self.frame_time   = []
+        self.frame_ref    = []
+        # Box columns, appended in chunks and concatenated lazily
+        self._chunks = {'row': [], 'cls': [], 'conf': [], 'xyxy': []}
+        self._cols   = None
+
+    def begin_source(self, name, names, mode='class'):
+        """Start a new image / video replayed with `mode` (one of SOURCE_MODES)"""
+        if mode not in SOURCE_MODES:
+            raise ValueError(f"mode must be one of {SOURCE_MODES}")
+        self.sources.append((name, dict(names), mode))
+        return len(self.sources) - 1
+
+    def add(self, source_id, frame_idx, ts, boxes, raw_ref, time_sec=None):
+        """
+        Record one frame's raw boxes (confidence >= floor) and its stored raw
+        frame. time_sec is the video position (None for still images).
+        """
+        keep = boxes.conf >= self.floor
+        if not keep.any():
+            return
+        row = len(self.frame_idx)
+        self.frame_source.append(source_id)
+        self.frame_idx.append(frame_idx)
+        self.frame_ts.append(ts)
+        self.frame_time.append(time_sec)
+        self.frame_ref.append(raw_ref)
+        n = int(keep.sum())
+        self._chunks['row'].append(np.full(n, row, dtype=np.int32))
+        self._chunks['cls'].append(boxes.cls[keep].astype(np.int16))
+        self._chunks['conf'].append(boxes.conf[keep].astype(np.float32))
+        self._chunks['xyxy'].append(boxes.xyxy[keep].astype(np.float32))
+        self._cols = None
+
+    def columns(self):
+        """{'row', 'cls', 'conf', 'xyxy'} arrays over all stored boxes"""
+        if self._cols is None:
+            if self._chunks['row']:
+                self._cols   = {k: np.concatenate(v) for k, v in self._chunks.items()}
+                self._chunks = {k: [v] for k, v in self._cols.items()}
+            else:
+                self._cols = {'row': np.zeros(0, np.int32), 'cls': np.zeros(0, np.int16),
+                              'conf': np.zeros(0, np.float32), 'xyxy': np.zeros((0, 4), np.float32)}
+        return self._cols
+
+    def __len__(self):
+        return len(self.frame_idx)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.columns().values())
+
+    def rebuild(self, conf, store):
+        """
+        Replay the logging policy over stored boxes with confidence >= conf.
+        Returns a fresh MissionState. Only box arrays are filtered here: each
+        entry gets a PendingFrame, so no frame is decoded or drawn until it
+        is displayed or reported.
+        """
+        log, counts = MissionState(), None
+        cols = self.columns()
+        sel  = np.flatnonzero(cols['conf'] >= conf)
+        if not len(sel):
+            return log
+        # Frame order, then confidence high → low within a frame (NMS order)
+        sel    = sel[np.lexsort((-cols['conf'][sel], cols['row'][sel]))]
+        bounds = np.flatnonzero(np.diff(cols['row'][sel])) + 1
+
+        trackers = {}                     # source id → dedup dict or IoUTracker
+        prev     = None
+        for rows in np.split(sel, bounds):
+            row = int(cols['row'][rows[0]])
+            sid = self.frame_source[row]
+            _, names, mode = self.sources[sid]
+            if prev is not None and prev != sid:
+                self._close(prev, trackers, log, counts, store)   # video finished
+            prev = sid
+
+            boxes = Boxes(cols['cls'][rows], cols['conf'][rows], cols['xyxy'][rows])
+            frame_bytes = PendingFrame(self.frame_ref[row], boxes, names)
+            if mode == 'track':
+                tracker = trackers.setdefault(sid, IoUTracker())
+                closed  = tracker.update(boxes, self.frame_time[row], self.frame_idx[row], frame_bytes)
+                log_tracks(log, counts, closed, names, store=store)
+                continue
+
+            tracker = trackers.setdefault(sid, {})
+            if mode == 'class':
+                hits = [(cn, cf) for cn, (cf, _) in best_per_class(boxes, names).items()]
+            else:
+                hits = list(zip(get_taxonomy(names).names_of(boxes.cls), boxes.conf.tolist()))
+            extra = {} if self.frame_time[row] is None else {'time_sec': self.frame_time[row]}
+            for cn, cf in hits:
+                log_detection(log, counts, cn, cf, self.frame_ts[row], frame_bytes, tracker,
+                              store=store, **extra)
+
+        if prev is not None:
+            self._close(prev, trackers, log, counts, store)
+        return log
+
+    def _close(self, sid, trackers, log, counts, store):
+        tracker = trackers.get(sid)
+        if isinstance(tracker, IoUTracker):
+            log_tracks(log, counts, tracker.flush(), self.sources[sid][1], store=store)
@@ -1,92 +1,286 @@
+"""
+NautiCAI - Label Remapping
+Rewrites source-dataset class ids to the unified taxonomy in parallel, per source, with an idempotent ledger
+"""
+
 import os
+import csv
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from taxonomy import class_ids, class_names
 
 # ── Remap rules ────────────────────────────────────────────────────────────────
+# Targets are unified class names; ids come from data.yaml via taxonomy.py
+CLASS_ID = class_ids()
+
 # UnderWater Bot original classes:
 # 0:Abrasion, 1:Algae, 2:Anode, 3:Crack, 4:Defects, 5:Pipe, 6:Turbine, 7:pipe
 UNDERWATER_BOT_MAP = {
-    0: 3,  # Abrasion  → damage
-    1: 1,  # Algae     → marine_growth
-    2: 6,  # Anode     → anode
-    3: 3,  # Crack     → damage
-    4: 3,  # Defects   → damage
-    5: 5,  # Pipe      → healthy
-    6: 4,  # Turbine   → free_span
-    7: 5,  # pipe      → healthy
+    0: CLASS_ID['damage'],         # Abrasion
+    1: CLASS_ID['marine_growth'],  # Algae
+    2: CLASS_ID['anode'],          # Anode
+    3: CLASS_ID['damage'],         # Crack
+    4: CLASS_ID['damage'],         # Defects
+    5: CLASS_ID['healthy'],        # Pipe
+    6: CLASS_ID['free_span'],      # Turbine
+    7: CLASS_ID['healthy'],        # pipe
 }
 
 # Corrosion Pipeline original classes:
 # 0:medium-corrosion, 1:mild-corrosion, 2:no-corrosion, 3:severe-corrosion
 PIPELINE_MAP = {
-    0: 0,  # medium-corrosion → corrosion
-    1: 0,  # mild-corrosion   → corrosion
-    2: 5,  # no-corrosion     → healthy
-    3: 0,  # severe-corrosion → corrosion
+    0: CLASS_ID['corrosion'],      # medium-corrosion
+    1: CLASS_ID['corrosion'],      # mild-corrosion
+    2: CLASS_ID['healthy'],        # no-corrosion
+    3: CLASS_ID['corrosion'],      # severe-corrosion
 }
 
 # Marine Debris original classes:
 # 0:can, 1:foam, 2:plastic, 3:plastic bottle, 4:unknow
 DEBRIS_MAP = {
-    0: 2,  # can           → debris
-    1: 2,  # foam          → debris
-    2: 2,  # plastic       → debris
-    3: 2,  # plastic bottle→ debris
-    4: 2,  # unknow        → debris
+    0: CLASS_ID['debris'],         # can
+    1: CLASS_ID['debris'],         # foam
+    2: CLASS_ID['debris'],         # plastic
+    3: CLASS_ID['debris'],         # plastic bottle
+    4: CLASS_ID['debris'],         # unknow
 }
 
 
-def remap_labels(labels_dir, class_map):
-    """Remap class IDs in all label files in a directory"""
-    files = [f for f in os.listdir(labels_dir) if f.endswith('.txt')]
-    print(f"Remapping {len(files)} files in {labels_dir}...")
+# Source dataset → its class map
+SOURCE_MAPS = {
+    'underwater_bot': UNDERWATER_BOT_MAP,
+    'pipeline':       PIPELINE_MAP,
+    'debris':         DEBRIS_MAP,
+}
+
+LEDGER_NAME  = '.remap_ledger.json'     # per labels dir: what was applied to each file
+JOURNAL_NAME = '.remap_ledger.jsonl'    # appended before each rewrite, folded into the ledger
+REMAP_CHUNK  = 512                      # files per journal flush / replace batch
+
+
+def map_version(source):
+    """Short hash of a source's map; changes whenever the map (or data.yaml ids) change"""
+    blob = json.dumps(sorted(SOURCE_MAPS[source].items()))
+    return hashlib.sha1(blob.encode()).hexdigest()[:12]
+
+
+# ── Source assignment ────────────────────────────────────────────────────────
+def load_manifest(path):
+    """
+    {label stem: source} from a JSON object or a two-column CSV (file, source).
+    Keys may be image or label file names; only the stem is used.
+    """
+    if path.lower().endswith('.json'):
+        with open(path, 'r') as f:
+            rows = json.load(f).items()
+    else:
+        with open(path, 'r', newline='') as f:
+            rows = [r for r in csv.reader(f) if len(r) >= 2 and r[0] != 'file']
+    return {os.path.splitext(os.path.basename(k.strip()))[0]: v.strip() for k, v, *_ in rows}
+
+
+def parse_rules(rules):
+    """['ub_=underwater_bot', ...] → [(prefix, source)], longest prefix first"""
+    pairs = [tuple(r.split('=', 1)) for r in rules]
+    return sorted(pairs, key=lambda p: -len(p[0]))
+
+
+def source_resolver(manifest=None, rules=(), default=None):
+    """fname → source (or None): manifest entry, else first matching prefix rule, else default"""
+    for src in list((manifest or {}).values()) + [s for _, s in rules] + [default]:
+        if src is not None and src not in SOURCE_MAPS:
+            raise ValueError(f"Unknown source '{src}' — expected one of {sorted(SOURCE_MAPS)}")
+
+    def resolve(fname):
+        stem = os.path.splitext(fname)[0]
+        if manifest and stem in manifest:
+            return manifest[stem]
+        for prefix, src in rules:
+            if fname.startswith(prefix):
+                return src
+        return default
+    return resolve
+
+
+# ── Ledger ───────────────────────────────────────────────────────────────────
+def _sha1(data):
+    return hashlib.sha1(data).hexdigest()
 
-    for fname in files:
-        fpath = os.path.join(labels_dir, fname)
-        new_lines = []
 
-        with open(fpath, 'r') as f:
-            lines = f.readlines()
+def load_ledger(labels_dir):
+    """{fname: entry} from the ledger plus any journal lines not yet folded in"""
+    ledger = {}
+    path   = os.path.join(labels_dir, LEDGER_NAME)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            ledger = json.load(f)
+    journal = os.path.join(labels_dir, JOURNAL_NAME)
+    if os.path.exists(journal):
+        with open(journal, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break                  # torn last line of an interrupted run
+                ledger[entry.pop('file')] = entry
+    return ledger
 
-        for line in lines:
-            line = line.strip()
-            if not line:
+
+def _save_ledger(labels_dir, ledger):
+    path = os.path.join(labels_dir, LEDGER_NAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(ledger, f)
+    os.replace(path + '.tmp', path)
+    journal = os.path.join(labels_dir, JOURNAL_NAME)
+    if os.path.exists(journal):
+        os.remove(journal)
+
+
+def _is_applied(entry, fpath, st):
+    """True if the file still holds exactly what the ledger entry wrote"""
+    if entry.get('size') == st.st_size and entry.get('mtime_ns') == st.st_mtime_ns:
+        return True
+    with open(fpath, 'rb') as f:
+        return _sha1(f.read()) == entry['sha1']
+
+
+# ── Worker ───────────────────────────────────────────────────────────────────
+def _remap_file(fpath, class_map, raw_ids=None):
+    """
+    Worker: write the remapped label to fpath + '.tmp' (the parent journals it,
+    then renames it into place). Source ids come from the file, or from
+    raw_ids when re-deriving a file that was already remapped with an older map.
+    Returns (fpath, raw ids, sha1 of new content, ids missing from the map).
+    """
+    with open(fpath, 'r') as f:
+        lines = [line.split() for line in f if line.strip()]
+    if raw_ids is None:
+        raw_ids = [int(parts[0]) for parts in lines]
+    elif len(raw_ids) != len(lines):
+        raise ValueError(f"{fpath}: {len(lines)} boxes but the ledger recorded {len(raw_ids)}")
+
+    unknown = sorted({c for c in raw_ids if c not in class_map})
+    for parts, old_class in zip(lines, raw_ids):
+        parts[0] = str(class_map.get(old_class, old_class))
+    data = '\n'.join(' '.join(parts) for parts in lines).encode()
+    with open(fpath + '.tmp', 'wb') as f:
+        f.write(data)
+    return fpath, raw_ids, _sha1(data), unknown
+
+
+# ── Engine ───────────────────────────────────────────────────────────────────
+def remap_labels(labels_dir, resolve, workers=None, dry_run=False):
+    """
+    Remap every label file in labels_dir with the map of its source
+    (resolve(fname) → source name or None to leave the file alone).
+
+    Idempotent: the ledger records source, map version, the original ids and
+    the written content hash per file, so files already remapped with the
+    current map are skipped. If a source's map (or the file's source) changed,
+    the file is re-derived from its recorded original ids, never remapped twice.
+    A file whose content no longer matches the ledger is treated as a newly
+    ingested source file. Rewrites are journaled first, then renamed into
+    place atomically, so an interrupted run can simply be re-run.
+    """
+    files  = sorted(f for f in os.listdir(labels_dir) if f.endswith('.txt'))
+    ledger = load_ledger(labels_dir)
+    print(f"Remapping {len(files)} files in {labels_dir}...")
+
+    tasks, skipped, unassigned = [], 0, 0
+    by_source = {}
+    for fname in files:
+        source = resolve(fname)
+        if source is None:
+            unassigned += 1
+            continue
+        fpath   = os.path.join(labels_dir, fname)
+        st      = os.stat(fpath)
+        entry   = ledger.get(fname)
+        version = map_version(source)
+        raw_ids = None
+        if entry and _is_applied(entry, fpath, st):
+            if entry['source'] == source and entry['version'] == version:
+                entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+                skipped += 1
                 continue
-            parts = line.split()
-            old_class = int(parts[0])
-            new_class = class_map.get(old_class, old_class)
-            parts[0] = str(new_class)
-            new_lines.append(' '.join(parts))
+            raw_ids = entry['raw']           # map or source changed: re-derive from originals
+        tasks.append((fname, fpath, source, version, raw_ids))
+        by_source[source] = by_source.get(source, 0) + 1
+
+    print(f"  to remap: {len(tasks)}  ·  already done: {skipped}  ·  no source: {unassigned}")
+    for source, n in sorted(by_source.items()):
+        print(f"    {source:<16} {n:>6} files  (map {map_version(source)})")
+    if dry_run or not tasks:
+        if not dry_run:
+            _save_ledger(labels_dir, ledger)
+        return len(tasks)
 
-        with open(fpath, 'w') as f:
-            f.write('\n'.join(new_lines))
+    unknown = {}
+    journal = open(os.path.join(labels_dir, JOURNAL_NAME), 'a')
+    with journal, ProcessPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(tasks), REMAP_CHUNK):
+            chunk   = tasks[start:start + REMAP_CHUNK]
+            results = pool.map(_remap_file, [t[1] for t in chunk],
+                               [SOURCE_MAPS[t[2]] for t in chunk], [t[4] for t in chunk],
+                               chunksize=32)
+            done = []
+            for (fname, fpath, source, version, _), (_, raw, sha1, missing) in zip(chunk, results):
+                entry = {'source': source, 'version': version, 'raw': raw, 'sha1': sha1}
+                journal.write(json.dumps(dict(entry, file=fname)) + '\n')
+                ledger[fname] = entry
+                done.append((fname, fpath, entry))
+                for c in missing:
+                    unknown.setdefault(source, set()).add(c)
+            # Journal is durable before any file changes, so a crash never loses track
+            journal.flush()
+            os.fsync(journal.fileno())
+            for fname, fpath, entry in done:
+                os.replace(fpath + '.tmp', fpath)
+                st = os.stat(fpath)
+                entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+            print(f"  [{start + len(chunk)}/{len(tasks)}] remapped")
 
-    print(f"✅ Done remapping {len(files)} files")
+    _save_ledger(labels_dir, ledger)
+    for source, ids in sorted(unknown.items()):
+        print(f"  ⚠️  {source}: ids {sorted(ids)} not in its map — left unchanged")
+    print(f"✅ Done remapping {len(tasks)} files")
+    return len(tasks)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='NautiCAI Label Remapping Tool')
+    parser.add_argument('labels_dirs', nargs='*',
+                        default=['dataset/labels/train', 'dataset/labels/val'])
+    parser.add_argument('--manifest', type=str, default=None,
+                        help='JSON {file: source} or CSV file,source assigning each file a source')
+    parser.add_argument('--rule', action='append', default=[], metavar='PREFIX=SOURCE',
+                        help='Filename prefix rule, e.g. --rule ub_=underwater_bot (repeatable)')
+    parser.add_argument('--default-source', type=str, default=None, choices=sorted(SOURCE_MAPS),
+                        help='Source for files matched by neither manifest nor rules (default: skip them)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Only report what would be remapped')
+
+    args = parser.parse_args()
+
     print("=" * 50)
     print("NautiCAI Label Remapping Tool")
     print("=" * 50)
 
-    # Since all 3 datasets are mixed together we need to
-    # remap based on which dataset each image came from.
-    # For now remap all labels using underwater bot map
-    # as it is the largest dataset (8521 images)
-
-    print("\nNote: Labels are mixed from 3 datasets.")
-    print("Remapping all to NautiCAI unified taxonomy...")
-
-    # Remap train labels
-    remap_labels("dataset/labels/train", UNDERWATER_BOT_MAP)
-
-    # Remap val labels
-    remap_labels("dataset/labels/val", UNDERWATER_BOT_MAP)
-
-    print("\n✅ All labels remapped successfully!")
-    print("Classes now unified to NautiCAI taxonomy:")
-    print("  0: corrosion")
-    print("  1: marine_growth")
-    print("  2: debris")
-    print("  3: damage")
-    print("  4: free_span")
-    print("  5: healthy")
-    print("  6: anode")
\ No newline at end of file
+    if not (args.manifest or args.rule or args.default_source):
+        parser.error("assign sources with --manifest, --rule and/or --default-source")
+    resolve = source_resolver(
+        manifest = load_manifest(args.manifest) if args.manifest else None,
+        rules    = parse_rules(args.rule),
+        default  = args.default_source,
+    )
+
+    for labels_dir in args.labels_dirs:
+        remap_labels(labels_dir, resolve, workers=args.workers, dry_run=args.dry_run)
+
+    print("\nClasses now unified to NautiCAI taxonomy:")
+    for cid, name in class_names().items():
+        print(f"  {cid}: {name}")
@@ -12,7 +12,11 @@ from reportlab.platypus import (SimpleDocTemplate, Paragraph, Spacer, Table,
 from reportlab.platypus import Image as RLImage
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from PIL import Image as PILImage
-import io, datetime
+import io, os, datetime, tempfile, itertools, functools, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from snapshot_store import SnapshotStore, resolve_frame_bytes
+from taxonomy import CLASS_SEVERITY, severity_of
 
 # ── Palette ──────────────────────────────────────────────────────────────────
 DARK_NAVY   = colors.HexColor('#0A1628')
@@ -29,41 +33,68 @@ GREY_BORDER = colors.HexColor('#DDE3EC')
 GREY_TEXT   = colors.HexColor('#5A6478')
 WHITE       = colors.white
 
-SEVERITY_MAP = {
-    'corrosion':     ('CRITICAL', RED,   RED_BG,   '#D62839'),
-    'damage':        ('CRITICAL', RED,   RED_BG,   '#D62839'),
-    'free_span':     ('CRITICAL', RED,   RED_BG,   '#D62839'),
-    'debris':        ('WARNING',  AMBER, AMBER_BG, '#E07B39'),
-    'marine_growth': ('WARNING',  AMBER, AMBER_BG, '#E07B39'),
-    'healthy':       ('NORMAL',   GREEN, GREEN_BG, '#1A8C6E'),
-    'anode':         ('NORMAL',   GREEN, GREEN_BG, '#1A8C6E'),
+SEVERITY_COLORS = {
+    'CRITICAL': (RED,   RED_BG,   '#D62839'),
+    'WARNING':  (AMBER, AMBER_BG, '#E07B39'),
+    'NORMAL':   (GREEN, GREEN_BG, '#1A8C6E'),
 }
+# class → (label, colour, background, hex); severities come from taxonomy.py
+SEVERITY_MAP = {cls: (sev,) + SEVERITY_COLORS[sev] for cls, sev in CLASS_SEVERITY.items()}
 
 PAGE_W = A4[0] - 3 * cm   # usable width
 
+# Snapshots are embedded at this print resolution (pixels per inch)
+REPORT_DPI          = 150
+REPORT_JPEG_QUALITY = 88
+
+# Parallel rendering: detections per PDF part rendered in a worker process
+PARALLEL_CHUNK = 250
+
 
 # ── Image helper ─────────────────────────────────────────────────────────────
-def get_rl_image(item, max_width=PAGE_W - 1 * cm, max_height=9 * cm):
+def get_rl_image(item, max_width=PAGE_W - 1 * cm, max_height=9 * cm, store=None, dpi=REPORT_DPI):
+    """
+    Snapshot as a ReportLab image fitted into max_width × max_height points.
+    A stored JPEG no larger than the printed size at `dpi` is embedded as-is
+    (no decode / re-encode); larger ones are downscaled once to that size,
+    using JPEG draft mode so only a reduced-scale decode is needed.
+    """
     try:
-        if item.get('frame_bytes'):
-            pil_img = PILImage.open(io.BytesIO(item['frame_bytes'])).convert('RGB')
+        frame_bytes = resolve_frame_bytes(item, store)
+        if frame_bytes:
+            pil_img = PILImage.open(io.BytesIO(frame_bytes))   # header only, no decode yet
         elif item.get('frame') is not None:
             pil_img = PILImage.fromarray(item['frame'][:, :, :3])
         else:
             return None
-        buf = io.BytesIO()
-        pil_img.save(buf, format='JPEG', quality=92)
-        buf.seek(0)
         w, h  = pil_img.size
         ratio = min(max_width / w, max_height / h)
-        return RLImage(buf, width=w * ratio, height=h * ratio)
+        disp_w, disp_h = w * ratio, h * ratio
+        px_w  = max(1, round(disp_w / 72 * dpi))
+        px_h  = max(1, round(disp_h / 72 * dpi))
+
+        if frame_bytes and pil_img.format == 'JPEG' and pil_img.mode in ('RGB', 'L') \
+                and w <= px_w and h <= px_h:
+            return RLImage(io.BytesIO(frame_bytes), width=disp_w, height=disp_h)
+
+        if pil_img.format == 'JPEG':
+            pil_img.draft('RGB', (px_w, px_h))
+        pil_img = pil_img.convert('RGB')
+        if pil_img.size[0] > px_w:
+            pil_img = pil_img.resize((px_w, px_h), PILImage.LANCZOS)
+        buf = io.BytesIO()
+        pil_img.save(buf, format='JPEG', quality=REPORT_JPEG_QUALITY)
+        buf.seek(0)
+        return RLImage(buf, width=disp_w, height=disp_h)
     except Exception:
         return None
 
 
 # ── Style factory ────────────────────────────────────────────────────────────
+@functools.lru_cache(maxsize=None)
 def make_styles():
-    return {
+    """Paragraph styles, built once per process and shared by every report (treat as read-only)"""
+    ST = {
         'hero': ParagraphStyle(
             'hero', fontSize=28, textColor=WHITE,
             alignment=TA_CENTER, fontName='Helvetica-Bold',
@@ -102,27 +133,164 @@ def make_styles():
             'det_hdr_right', fontSize=10, textColor=WHITE,
             fontName='Helvetica-Bold', alignment=TA_RIGHT,
             leading=14),
+        'bd_hdr': ParagraphStyle(
+            'bd_hdr', fontSize=9, fontName='Helvetica-Bold',
+            textColor=WHITE, leading=14),
+        'bd_hdr_c': ParagraphStyle(
+            'bd_hdr_c', fontSize=9, fontName='Helvetica-Bold',
+            textColor=WHITE, alignment=TA_CENTER, leading=14),
+        'cell_c': ParagraphStyle(
+            'cell_c', fontSize=9, fontName='Helvetica',
+            alignment=TA_CENTER, leading=14),
+        'cell_c_bold': ParagraphStyle(
+            'cell_c_bold', fontSize=9, fontName='Helvetica-Bold',
+            alignment=TA_CENTER, leading=14),
+    }
+    # Executive summary tiles: label / number per column colour
+    for i, col in enumerate((DARK_NAVY, RED, AMBER, GREEN)):
+        ST[f'sum_lbl{i}'] = ParagraphStyle(
+            f'sl{i}', fontSize=8, fontName='Helvetica-Bold',
+            textColor=col, alignment=TA_CENTER)
+        ST[f'sum_num{i}'] = ParagraphStyle(
+            f'sn{i}', fontSize=34, fontName='Helvetica-Bold',
+            textColor=col, alignment=TA_CENTER, leading=40)
+    return ST
+
+
+# ── Shared table styles ──────────────────────────────────────────────────────
+META_TABLE_STYLE = TableStyle([
+    ('BACKGROUND',    (0,0), (0,-1), GREY_BG),
+    ('BACKGROUND',    (2,0), (2,-1), GREY_BG),
+    ('ROWBACKGROUNDS',(0,0), (-1,-1), [WHITE, GREY_BG]),
+    ('GRID',          (0,0), (-1,-1), 0.5, GREY_BORDER),
+    ('TOPPADDING',    (0,0), (-1,-1), 9),
+    ('BOTTOMPADDING', (0,0), (-1,-1), 9),
+    ('LEFTPADDING',   (0,0), (-1,-1), 10),
+    ('RIGHTPADDING',  (0,0), (-1,-1), 8),
+    ('VALIGN',        (0,0), (-1,-1), 'MIDDLE'),
+    ('FONTSIZE',      (0,0), (-1,-1), 9),
+])
+META_COL_W = [3.2*cm, 6.3*cm, 3.2*cm, 5.3*cm]
+
+MISSION_TABLE_STYLE = TableStyle([
+    ('BACKGROUND',    (0,0), (0,-1), GREY_BG),
+    ('BACKGROUND',    (2,0), (2,-1), GREY_BG),
+    ('ROWBACKGROUNDS',(0,0), (-1,-1), [WHITE, GREY_BG, WHITE, GREY_BG]),
+    ('GRID',          (0,0), (-1,-1), 0.5, GREY_BORDER),
+    ('TOPPADDING',    (0,0), (-1,-1), 8),
+    ('BOTTOMPADDING', (0,0), (-1,-1), 8),
+    ('LEFTPADDING',   (0,0), (-1,-1), 10),
+    ('RIGHTPADDING',  (0,0), (-1,-1), 8),
+    ('FONTSIZE',      (0,0), (-1,-1), 9),
+    ('VALIGN',        (0,0), (-1,-1), 'MIDDLE'),
+])
+
+BANNER_STYLE = TableStyle([
+    ('BACKGROUND',    (0,0), (-1,-1), DARK_NAVY),
+    ('TOPPADDING',    (0,0), (-1, 0), 22),
+    ('BOTTOMPADDING', (0,0), (-1, 0), 4),
+    ('TOPPADDING',    (0,1), (-1, 1), 4),
+    ('BOTTOMPADDING', (0,1), (-1, 1), 6),
+    ('TOPPADDING',    (0,2), (-1, 2), 4),
+    ('BOTTOMPADDING', (0,2), (-1, 2), 18),
+    ('ALIGN',         (0,0), (-1,-1), 'CENTER'),
+    ('VALIGN',        (0,0), (-1,-1), 'MIDDLE'),
+    ('LINEBELOW',     (0,-1),(-1,-1), 4, TEAL),
+])
+
+SUMMARY_LABEL_STYLE = TableStyle([
+    ('BACKGROUND',    (0,0), (-1,-1), WHITE),
+    ('BACKGROUND',    (1,0), (1,-1),  RED_BG),
+    ('BACKGROUND',    (2,0), (2,-1),  AMBER_BG),
+    ('BACKGROUND',    (3,0), (3,-1),  GREEN_BG),
+    ('TOPPADDING',    (0,0), (-1,-1), 10),
+    ('BOTTOMPADDING', (0,0), (-1,-1), 4),
+    ('LINEABOVE',     (0,0), (-1,0),  3, TEAL),
+    ('INNERGRID',     (0,0), (-1,-1), 0.5, GREY_BORDER),
+    ('BOX',           (0,0), (-1,-1), 0.5, GREY_BORDER),
+    ('LINEBEFORE',    (1,0), (1,-1),  2, RED),
+    ('LINEBEFORE',    (2,0), (2,-1),  2, AMBER),
+    ('LINEBEFORE',    (3,0), (3,-1),  2, GREEN),
+])
+
+SUMMARY_NUMBER_STYLE = TableStyle([
+    ('BACKGROUND',    (0,0), (-1,-1), WHITE),
+    ('BACKGROUND',    (1,0), (1,-1),  RED_BG),
+    ('BACKGROUND',    (2,0), (2,-1),  AMBER_BG),
+    ('BACKGROUND',    (3,0), (3,-1),  GREEN_BG),
+    ('TOPPADDING',    (0,0), (-1,-1), 4),
+    ('BOTTOMPADDING', (0,0), (-1,-1), 14),
+    ('INNERGRID',     (0,0), (-1,-1), 0.5, GREY_BORDER),
+    ('BOX',           (0,0), (-1,-1), 0.5, GREY_BORDER),
+    ('LINEBELOW',     (0,-1),(-1,-1), 2, GREY_BORDER),
+    ('LINEBEFORE',    (1,0), (1,-1),  2, RED),
+    ('LINEBEFORE',    (2,0), (2,-1),  2, AMBER),
+    ('LINEBEFORE',    (3,0), (3,-1),  2, GREEN),
+])
+
+BREAKDOWN_BASE_STYLE = [
+    ('BACKGROUND',    (0,0), (-1,0), NAVY_MID),
+    ('TEXTCOLOR',     (0,0), (-1,0), WHITE),
+    ('GRID',          (0,0), (-1,-1), 0.5, GREY_BORDER),
+    ('TOPPADDING',    (0,0), (-1,-1), 9),
+    ('BOTTOMPADDING', (0,0), (-1,-1), 9),
+    ('LEFTPADDING',   (0,0), (-1,-1), 10),
+    ('RIGHTPADDING',  (0,0), (-1,-1), 8),
+    ('VALIGN',        (0,0), (-1,-1), 'MIDDLE'),
+]
+
+
+@functools.lru_cache(maxsize=None)
+def _class_template(cls):
+    """
+    Everything about a class that is identical across its detections:
+    display title, severity label / colours / markup and the header and
+    image-frame table styles. Built once per class, reused per detection.
+    """
+    sev_label = severity_of(cls)
+    sev_color, sev_bg, hex_col = SEVERITY_COLORS[sev_label]
+    return {
+        'title':     cls.replace('_', ' ').title(),
+        'sev_label': sev_label,
+        'sev_color': sev_color,
+        'sev_bg':    sev_bg,
+        'sev_html':  f'<font color="{hex_col}"><b>{sev_label}</b></font>',
+        'hdr_style': TableStyle([
+            ('BACKGROUND',    (0,0), (-1,-1), sev_color),
+            ('TOPPADDING',    (0,0), (-1,-1), 10),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 10),
+            ('LEFTPADDING',   (0,0), (0, 0),  14),
+            ('RIGHTPADDING',  (1,0), (1, 0),  14),
+            ('VALIGN',        (0,0), (-1,-1), 'MIDDLE'),
+        ]),
+        'img_style': TableStyle([
+            ('ALIGN',         (0,0), (-1,-1), 'CENTER'),
+            ('VALIGN',        (0,0), (0, 0),  'MIDDLE'),
+            ('BACKGROUND',    (0,0), (-1,-1), sev_bg),
+            ('TOPPADDING',    (0,0), (0, 0),  12),
+            ('BOTTOMPADDING', (0,0), (0, 0),  8),
+            ('TOPPADDING',    (0,1), (0, 1),  4),
+            ('BOTTOMPADDING', (0,1), (0, 1),  10),
+            ('BOX',           (0,0), (-1,-1), 0.5, GREY_BORDER),
+            ('LINEABOVE',     (0,0), (-1, 0), 3, sev_color),
+        ]),
     }
 
 
-# ── Main generator ───────────────────────────────────────────────────────────
-def generate_report(
-    anomaly_log,
-    mission_name  = "Subsea Inspection Mission",
-    operator_name = "NautiCAI Operator",
-    vessel_id     = "ROV-NautiCAI-01",
-    location      = "Offshore Location",
-    output_path   = "nauticai_report.pdf"
-):
-    buf = io.BytesIO()
-    doc = SimpleDocTemplate(
-        buf, pagesize=A4,
-        leftMargin=1.5*cm, rightMargin=1.5*cm,
-        topMargin=1.5*cm,  bottomMargin=1.5*cm
-    )
-    ST    = make_styles()
+# ── Report sections ──────────────────────────────────────────────────────────
+def count_classes(anomaly_log):
+    """{class_name: count} for a list of log entries"""
+    class_counts = {}
+    for item in anomaly_log:
+        cls = item.get('class_name', 'unknown')
+        class_counts[cls] = class_counts.get(cls, 0) + 1
+    return class_counts
+
+
+def _summary_story(ST, now, mission_name, operator_name, vessel_id, location, class_counts):
+    """Hero banner, mission details, executive summary and class breakdown"""
     story = []
-    now   = datetime.datetime.now()
+    total = sum(class_counts.values())
 
     # ── 1. HERO BANNER ───────────────────────────────────────────────────────
     banner_rows = [
@@ -134,18 +302,7 @@ def generate_report(
         )],
     ]
     banner = Table(banner_rows, colWidths=[PAGE_W])
-    banner.setStyle(TableStyle([
-        ('BACKGROUND',    (0,0), (-1,-1), DARK_NAVY),
-        ('TOPPADDING',    (0,0), (-1, 0), 22),
-        ('BOTTOMPADDING', (0,0), (-1, 0), 4),
-        ('TOPPADDING',    (0,1), (-1, 1), 4),
-        ('BOTTOMPADDING', (0,1), (-1, 1), 6),
-        ('TOPPADDING',    (0,2), (-1, 2), 4),
-        ('BOTTOMPADDING', (0,2), (-1, 2), 18),
-        ('ALIGN',         (0,0), (-1,-1), 'CENTER'),
-        ('VALIGN',        (0,0), (-1,-1), 'MIDDLE'),
-        ('LINEBELOW',     (0,-1),(-1,-1), 4, TEAL),
-    ]))
+    banner.setStyle(BANNER_STYLE)
     story.append(banner)
     story.append(Spacer(1, 0.6*cm))
 
@@ -166,20 +323,8 @@ def generate_report(
         kv_pair('AI Model',     'YOLOv8s')     + kv_pair('Framework', 'Ultralytics + Streamlit'),
     ]
 
-    col_w = [3.2*cm, 6.3*cm, 3.2*cm, 5.3*cm]
-    mission_t = Table(mission_rows, colWidths=col_w)
-    mission_t.setStyle(TableStyle([
-        ('BACKGROUND',    (0,0), (0,-1), GREY_BG),
-        ('BACKGROUND',    (2,0), (2,-1), GREY_BG),
-        ('ROWBACKGROUNDS',(0,0), (-1,-1), [WHITE, GREY_BG, WHITE, GREY_BG]),
-        ('GRID',          (0,0), (-1,-1), 0.5, GREY_BORDER),
-        ('TOPPADDING',    (0,0), (-1,-1), 8),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 8),
-        ('LEFTPADDING',   (0,0), (-1,-1), 10),
-        ('RIGHTPADDING',  (0,0), (-1,-1), 8),
-        ('FONTSIZE',      (0,0), (-1,-1), 9),
-        ('VALIGN',        (0,0), (-1,-1), 'MIDDLE'),
-    ]))
+    mission_t = Table(mission_rows, colWidths=META_COL_W)
+    mission_t.setStyle(MISSION_TABLE_STYLE)
     story.append(mission_t)
     story.append(Spacer(1, 0.6*cm))
 
@@ -188,70 +333,29 @@ def generate_report(
     story.append(HRFlowable(width='100%', thickness=2, color=TEAL, spaceAfter=8))
 
     # Count by severity
-    class_counts = {}
     crit = warn = norm = 0
-    for item in anomaly_log:
-        cls = item.get('class_name', 'unknown')
-        class_counts[cls] = class_counts.get(cls, 0) + 1
-        sev = SEVERITY_MAP.get(cls, ('WARNING',))[0]
-        if sev == 'CRITICAL':  crit += 1
-        elif sev == 'WARNING': warn += 1
-        else:                  norm += 1
-
-    def summary_cell(number, label, num_color, bg_color, border_color):
-        num_style = ParagraphStyle(
-            f'num_{label}', fontSize=30, fontName='Helvetica-Bold',
-            textColor=num_color, alignment=TA_CENTER, leading=36)
-        lbl_style = ParagraphStyle(
-            f'lbl_{label}', fontSize=8, fontName='Helvetica-Bold',
-            textColor=num_color, alignment=TA_CENTER, leading=12)
-        return [
-            Paragraph(label, lbl_style),
-            Paragraph(str(number), num_style),
-        ]
+    for cls, cnt in class_counts.items():
+        sev = severity_of(cls)
+        if sev == 'CRITICAL':  crit += cnt
+        elif sev == 'WARNING': warn += cnt
+        else:                  norm += cnt
 
     quarter = PAGE_W / 4
     sum_labels = Table([[
-        Paragraph('TOTAL DETECTIONS', ParagraphStyle('sl0', fontSize=8, fontName='Helvetica-Bold', textColor=DARK_NAVY, alignment=TA_CENTER)),
-        Paragraph('CRITICAL',         ParagraphStyle('sl1', fontSize=8, fontName='Helvetica-Bold', textColor=RED,       alignment=TA_CENTER)),
-        Paragraph('WARNINGS',         ParagraphStyle('sl2', fontSize=8, fontName='Helvetica-Bold', textColor=AMBER,     alignment=TA_CENTER)),
-        Paragraph('NORMAL',           ParagraphStyle('sl3', fontSize=8, fontName='Helvetica-Bold', textColor=GREEN,     alignment=TA_CENTER)),
+        Paragraph('TOTAL DETECTIONS', ST['sum_lbl0']),
+        Paragraph('CRITICAL',         ST['sum_lbl1']),
+        Paragraph('WARNINGS',         ST['sum_lbl2']),
+        Paragraph('NORMAL',           ST['sum_lbl3']),
     ]], colWidths=[quarter]*4)
-    sum_labels.setStyle(TableStyle([
-        ('BACKGROUND',    (0,0), (-1,-1), WHITE),
-        ('BACKGROUND',    (1,0), (1,-1),  RED_BG),
-        ('BACKGROUND',    (2,0), (2,-1),  AMBER_BG),
-        ('BACKGROUND',    (3,0), (3,-1),  GREEN_BG),
-        ('TOPPADDING',    (0,0), (-1,-1), 10),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 4),
-        ('LINEABOVE',     (0,0), (-1,0),  3, TEAL),
-        ('INNERGRID',     (0,0), (-1,-1), 0.5, GREY_BORDER),
-        ('BOX',           (0,0), (-1,-1), 0.5, GREY_BORDER),
-        ('LINEBEFORE',    (1,0), (1,-1),  2, RED),
-        ('LINEBEFORE',    (2,0), (2,-1),  2, AMBER),
-        ('LINEBEFORE',    (3,0), (3,-1),  2, GREEN),
-    ]))
+    sum_labels.setStyle(SUMMARY_LABEL_STYLE)
 
     sum_nums = Table([[
-        Paragraph(str(len(anomaly_log)), ParagraphStyle('sn0', fontSize=34, fontName='Helvetica-Bold', textColor=DARK_NAVY, alignment=TA_CENTER, leading=40)),
-        Paragraph(str(crit),            ParagraphStyle('sn1', fontSize=34, fontName='Helvetica-Bold', textColor=RED,       alignment=TA_CENTER, leading=40)),
-        Paragraph(str(warn),            ParagraphStyle('sn2', fontSize=34, fontName='Helvetica-Bold', textColor=AMBER,     alignment=TA_CENTER, leading=40)),
-        Paragraph(str(norm),            ParagraphStyle('sn3', fontSize=34, fontName='Helvetica-Bold', textColor=GREEN,     alignment=TA_CENTER, leading=40)),
+        Paragraph(str(total), ST['sum_num0']),
+        Paragraph(str(crit),  ST['sum_num1']),
+        Paragraph(str(warn),  ST['sum_num2']),
+        Paragraph(str(norm),  ST['sum_num3']),
     ]], colWidths=[quarter]*4)
-    sum_nums.setStyle(TableStyle([
-        ('BACKGROUND',    (0,0), (-1,-1), WHITE),
-        ('BACKGROUND',    (1,0), (1,-1),  RED_BG),
-        ('BACKGROUND',    (2,0), (2,-1),  AMBER_BG),
-        ('BACKGROUND',    (3,0), (3,-1),  GREEN_BG),
-        ('TOPPADDING',    (0,0), (-1,-1), 4),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 14),
-        ('INNERGRID',     (0,0), (-1,-1), 0.5, GREY_BORDER),
-        ('BOX',           (0,0), (-1,-1), 0.5, GREY_BORDER),
-        ('LINEBELOW',     (0,-1),(-1,-1), 2, GREY_BORDER),
-        ('LINEBEFORE',    (1,0), (1,-1),  2, RED),
-        ('LINEBEFORE',    (2,0), (2,-1),  2, AMBER),
-        ('LINEBEFORE',    (3,0), (3,-1),  2, GREEN),
-    ]))
+    sum_nums.setStyle(SUMMARY_NUMBER_STYLE)
 
     story.append(sum_labels)
     story.append(sum_nums)
@@ -262,147 +366,335 @@ def generate_report(
         story.append(Paragraph('Detection Breakdown by Class', ST['section']))
         story.append(HRFlowable(width='100%', thickness=1, color=GREY_BORDER, spaceAfter=6))
 
-        total_det = max(len(anomaly_log), 1)
+        total_det = max(total, 1)
 
         # Header row
         hdr_row = [
-            Paragraph('<b>Anomaly Class</b>', ParagraphStyle('bh0', fontSize=9, fontName='Helvetica-Bold', textColor=WHITE, leading=14)),
-            Paragraph('<b>Count</b>',         ParagraphStyle('bh1', fontSize=9, fontName='Helvetica-Bold', textColor=WHITE, alignment=TA_CENTER, leading=14)),
-            Paragraph('<b>Severity</b>',      ParagraphStyle('bh2', fontSize=9, fontName='Helvetica-Bold', textColor=WHITE, alignment=TA_CENTER, leading=14)),
-            Paragraph('<b>Share %</b>',       ParagraphStyle('bh3', fontSize=9, fontName='Helvetica-Bold', textColor=WHITE, alignment=TA_CENTER, leading=14)),
+            Paragraph('<b>Anomaly Class</b>', ST['bd_hdr']),
+            Paragraph('<b>Count</b>',         ST['bd_hdr_c']),
+            Paragraph('<b>Severity</b>',      ST['bd_hdr_c']),
+            Paragraph('<b>Share %</b>',       ST['bd_hdr_c']),
         ]
         bd_rows = [hdr_row]
 
         for cls, cnt in sorted(class_counts.items(), key=lambda x: -x[1]):
-            sev_label, _, _, hex_col = SEVERITY_MAP.get(cls, ('WARNING', None, None, '#E07B39'))
+            tpl = _class_template(cls)
             bd_rows.append([
-                Paragraph(cls.replace('_', ' ').title(), ST['body']),
-                Paragraph(str(cnt),          ParagraphStyle(f'bc1{cls}', fontSize=9, fontName='Helvetica', alignment=TA_CENTER, leading=14)),
-                Paragraph(f'<font color="{hex_col}"><b>{sev_label}</b></font>',
-                          ParagraphStyle(f'bc2{cls}', fontSize=9, fontName='Helvetica-Bold', alignment=TA_CENTER, leading=14)),
-                Paragraph(f'{cnt/total_det*100:.1f}%',
-                          ParagraphStyle(f'bc3{cls}', fontSize=9, fontName='Helvetica', alignment=TA_CENTER, leading=14)),
+                Paragraph(tpl['title'],                  ST['body']),
+                Paragraph(str(cnt),                      ST['cell_c']),
+                Paragraph(tpl['sev_html'],               ST['cell_c_bold']),
+                Paragraph(f'{cnt/total_det*100:.1f}%',   ST['cell_c']),
             ])
 
         bd_col_w = [7.5*cm, 2.5*cm, 4*cm, 4*cm]
         bd_t = Table(bd_rows, colWidths=bd_col_w)
-        bd_style = [
-            ('BACKGROUND',    (0,0), (-1,0), NAVY_MID),
-            ('TEXTCOLOR',     (0,0), (-1,0), WHITE),
-            ('GRID',          (0,0), (-1,-1), 0.5, GREY_BORDER),
-            ('TOPPADDING',    (0,0), (-1,-1), 9),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 9),
-            ('LEFTPADDING',   (0,0), (-1,-1), 10),
-            ('RIGHTPADDING',  (0,0), (-1,-1), 8),
-            ('VALIGN',        (0,0), (-1,-1), 'MIDDLE'),
-        ]
+        bd_style = list(BREAKDOWN_BASE_STYLE)
         for i in range(1, len(bd_rows)):
             bg = WHITE if i % 2 == 1 else GREY_BG
             bd_style.append(('BACKGROUND', (0,i), (-1,i), bg))
         bd_t.setStyle(TableStyle(bd_style))
         story.append(bd_t)
 
+    return story
+
+
+def _detection_block(i, item, ST, store=None):
+    """Header bar, meta table and annotated frame for detection #i+1 (kept on one page)"""
+    cls       = item.get('class_name', 'unknown')
+    conf      = item.get('confidence', 0.0)
+    timestamp = item.get('timestamp', 'N/A')
+    tpl       = _class_template(cls)
+    title     = tpl['title']
+
+    # -- Detection header bar (no overlap: two fixed columns)
+    det_hdr = Table([[
+        Paragraph(f'Detection #{i+1:02d}  —  {title}', ST['det_hdr_left']),
+        Paragraph(tpl['sev_label'], ST['det_hdr_right']),
+    ]], colWidths=[PAGE_W * 0.75, PAGE_W * 0.25])
+    det_hdr.setStyle(tpl['hdr_style'])
+
+    # -- Meta table (4 labeled columns, no overlap)
+    meta_rows = [
+        [
+            Paragraph('<b>Timestamp</b>', ST['body']),
+            Paragraph(str(timestamp),     ST['body']),
+            Paragraph('<b>Class</b>',     ST['body']),
+            Paragraph(title,              ST['body']),
+        ],
+        [
+            Paragraph('<b>Confidence</b>', ST['body']),
+            Paragraph(f'{conf*100:.1f}%',  ST['body']),
+            Paragraph('<b>Severity</b>',   ST['body']),
+            Paragraph(tpl['sev_html'],     ST['body']),
+        ],
+    ]
+    meta_t = Table(meta_rows, colWidths=META_COL_W)
+    meta_t.setStyle(META_TABLE_STYLE)
+
+    elements = [det_hdr, meta_t]
+
+    # -- Annotated image
+    rl_img = get_rl_image(item, store=store)
+    if rl_img:
+        img_caption = (
+            f'AI-Annotated Frame  ·  {title}'
+            f'  ·  Confidence {conf*100:.1f}%  ·  Detected at {timestamp}'
+        )
+        img_t = Table([
+            [rl_img],
+            [Paragraph(img_caption, ST['caption'])],
+        ], colWidths=[PAGE_W])
+        img_t.setStyle(tpl['img_style'])
+        elements.append(img_t)
+
+    elements.append(Spacer(1, 0.6*cm))
+    return KeepTogether(elements)
+
+
+def _footer_story(ST, now):
+    return [
+        Spacer(1, 0.3*cm),
+        HRFlowable(width='100%', thickness=1, color=GREY_BORDER, spaceAfter=6),
+        Paragraph(
+            f'Generated by NautiCAI  ·  {now.strftime("%Y-%m-%d %H:%M:%S")}'
+            f'  ·  Confidential Inspection Report  ·  www.nauticai-ai.com',
+            ST['footer']
+        ),
+    ]
+
+
+def _report_flowables(items, ST, now, summary, store=None, progress=None, total=None):
+    """
+    Yield the whole story lazily; detection blocks are built as they are laid
+    out and progress(done, total) is called as each one is consumed.
+    """
+    yield from summary
+
     # ── 5. DETAILED ANOMALY LOG ───────────────────────────────────────────────
-    if anomaly_log:
-        story.append(PageBreak())
-        story.append(Paragraph('Detailed Anomaly Log', ST['section']))
-        story.append(HRFlowable(width='100%', thickness=2, color=TEAL, spaceAfter=12))
-
-        for i, item in enumerate(anomaly_log):
-            cls       = item.get('class_name', 'unknown')
-            conf      = item.get('confidence', 0.0)
-            timestamp = item.get('timestamp', 'N/A')
-            sev_label, sev_color, sev_bg, hex_col = SEVERITY_MAP.get(
-                cls, ('WARNING', AMBER, AMBER_BG, '#E07B39'))
-
-            # -- Detection header bar (no overlap: two fixed columns)
-            det_hdr = Table([[
-                Paragraph(
-                    f'Detection #{i+1:02d}  —  {cls.replace("_"," ").title()}',
-                    ST['det_hdr_left']),
-                Paragraph(sev_label, ST['det_hdr_right']),
-            ]], colWidths=[PAGE_W * 0.75, PAGE_W * 0.25])
-            det_hdr.setStyle(TableStyle([
-                ('BACKGROUND',    (0,0), (-1,-1), sev_color),
-                ('TOPPADDING',    (0,0), (-1,-1), 10),
-                ('BOTTOMPADDING', (0,0), (-1,-1), 10),
-                ('LEFTPADDING',   (0,0), (0, 0),  14),
-                ('RIGHTPADDING',  (1,0), (1, 0),  14),
-                ('VALIGN',        (0,0), (-1,-1), 'MIDDLE'),
-            ]))
-
-            # -- Meta table (4 labeled columns, no overlap)
-            meta_rows = [
-                [
-                    Paragraph('<b>Timestamp</b>', ST['body']),
-                    Paragraph(str(timestamp),     ST['body']),
-                    Paragraph('<b>Class</b>',     ST['body']),
-                    Paragraph(cls.replace('_',' ').title(), ST['body']),
-                ],
-                [
-                    Paragraph('<b>Confidence</b>', ST['body']),
-                    Paragraph(f'{conf*100:.1f}%',  ST['body']),
-                    Paragraph('<b>Severity</b>',   ST['body']),
-                    Paragraph(
-                        f'<font color="{hex_col}"><b>{sev_label}</b></font>',
-                        ST['body']),
-                ],
-            ]
-            meta_t = Table(meta_rows, colWidths=[3.2*cm, 6.3*cm, 3.2*cm, 5.3*cm])
-            meta_t.setStyle(TableStyle([
-                ('BACKGROUND',    (0,0), (0,-1), GREY_BG),
-                ('BACKGROUND',    (2,0), (2,-1), GREY_BG),
-                ('ROWBACKGROUNDS',(0,0), (-1,-1), [WHITE, GREY_BG]),
-                ('GRID',          (0,0), (-1,-1), 0.5, GREY_BORDER),
-                ('TOPPADDING',    (0,0), (-1,-1), 9),
-                ('BOTTOMPADDING', (0,0), (-1,-1), 9),
-                ('LEFTPADDING',   (0,0), (-1,-1), 10),
-                ('RIGHTPADDING',  (0,0), (-1,-1), 8),
-                ('VALIGN',        (0,0), (-1,-1), 'MIDDLE'),
-                ('FONTSIZE',      (0,0), (-1,-1), 9),
-            ]))
-
-            elements = [det_hdr, meta_t]
-
-            # -- Annotated image
-            rl_img = get_rl_image(item)
-            if rl_img:
-                img_caption = (
-                    f'AI-Annotated Frame  ·  {cls.replace("_"," ").title()}'
-                    f'  ·  Confidence {conf*100:.1f}%  ·  Detected at {timestamp}'
-                )
-                img_t = Table([
-                    [rl_img],
-                    [Paragraph(img_caption, ST['caption'])],
-                ], colWidths=[PAGE_W])
-                img_t.setStyle(TableStyle([
-                    ('ALIGN',         (0,0), (-1,-1), 'CENTER'),
-                    ('VALIGN',        (0,0), (0, 0),  'MIDDLE'),
-                    ('BACKGROUND',    (0,0), (-1,-1), sev_bg),
-                    ('TOPPADDING',    (0,0), (0, 0),  12),
-                    ('BOTTOMPADDING', (0,0), (0, 0),  8),
-                    ('TOPPADDING',    (0,1), (0, 1),  4),
-                    ('BOTTOMPADDING', (0,1), (0, 1),  10),
-                    ('BOX',           (0,0), (-1,-1), 0.5, GREY_BORDER),
-                    ('LINEABOVE',     (0,0), (-1, 0), 3, sev_color),
-                ]))
-                elements.append(img_t)
-
-            elements.append(Spacer(1, 0.6*cm))
-            story.append(KeepTogether(elements))
+    for i, item in enumerate(items):
+        if i == 0:
+            yield PageBreak()
+            yield Paragraph('Detailed Anomaly Log', ST['section'])
+            yield HRFlowable(width='100%', thickness=2, color=TEAL, spaceAfter=12)
+        yield _detection_block(i, item, ST, store)
+        if progress:
+            progress(i + 1, total)
 
     # ── 6. FOOTER ────────────────────────────────────────────────────────────
-    story.append(Spacer(1, 0.3*cm))
-    story.append(HRFlowable(width='100%', thickness=1, color=GREY_BORDER, spaceAfter=6))
-    story.append(Paragraph(
-        f'Generated by NautiCAI  ·  {now.strftime("%Y-%m-%d %H:%M:%S")}'
-        f'  ·  Confidential Inspection Report  ·  www.nauticai-ai.com',
-        ST['footer']
-    ))
-
-    doc.build(story)
-    result = buf.getvalue()
-    buf.close()
+    yield from _footer_story(ST, now)
+
+
+class _LazyStory(list):
+    """
+    Story list for doc.build() that pulls flowables from an iterator on demand.
+    Platypus removes each flowable once it is drawn, so only `lookahead`
+    un-drawn flowables exist at a time instead of the whole report.
+    """
+
+    def __init__(self, source, lookahead=8):
+        super().__init__()
+        self._source    = iter(source)
+        self._lookahead = lookahead
+        self._fill()
+
+    def _fill(self):
+        while self._source is not None and list.__len__(self) < self._lookahead:
+            try:
+                list.append(self, next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def __len__(self):
+        self._fill()
+        return list.__len__(self)
+
+    def __getitem__(self, idx):
+        self._fill()
+        return list.__getitem__(self, idx)
+
+
+# ── Page numbers ─────────────────────────────────────────────────────────────
+def _draw_page_number(canvas, page_no):
+    canvas.saveState()
+    canvas.setFont('Helvetica', 7)
+    canvas.setFillColor(GREY_TEXT)
+    canvas.drawRightString(A4[0] - 1.5*cm, 0.8*cm, f'Page {page_no}')
+    canvas.restoreState()
+
+
+def _on_page(canvas, doc):
+    _draw_page_number(canvas, canvas.getPageNumber())
+
+
+def _new_doc(sink):
+    return SimpleDocTemplate(
+        sink, pagesize=A4,
+        leftMargin=1.5*cm, rightMargin=1.5*cm,
+        topMargin=1.5*cm,  bottomMargin=1.5*cm
+    )
+
+
+# ── Parallel rendering ───────────────────────────────────────────────────────
+def _render_chunk(path, items, offset, last, now, store_root):
+    """
+    Worker: render detections #offset+1 … as a standalone PDF part at `path`.
+    The first part carries the section header, the last one the footer.
+    """
+    ST    = make_styles()
+    store = SnapshotStore(store_root) if store_root else None
+
+    def flowables():
+        if offset == 0:
+            yield Paragraph('Detailed Anomaly Log', ST['section'])
+            yield HRFlowable(width='100%', thickness=2, color=TEAL, spaceAfter=12)
+        for i, item in enumerate(items, offset):
+            yield _detection_block(i, item, ST, store)
+        if last:
+            yield from _footer_story(ST, now)
+
+    _new_doc(path).build(_LazyStory(flowables()))
+    return path
+
+
+def _merge_parts(parts, sink):
+    """Concatenate PDF parts and stamp continuous 'Page N' numbers on every page"""
+    from pypdf import PdfReader, PdfWriter
+    from reportlab.pdfgen import canvas as rl_canvas
+
+    writer = PdfWriter()
+    for part in parts:
+        writer.append(part)
+
+    overlay_buf = io.BytesIO()
+    overlay     = rl_canvas.Canvas(overlay_buf, pagesize=A4)
+    for n in range(1, len(writer.pages) + 1):
+        _draw_page_number(overlay, n)
+        overlay.showPage()
+    overlay.save()
+    overlay_buf.seek(0)
+    for page, stamp in zip(writer.pages, PdfReader(overlay_buf).pages):
+        page.merge_page(stamp)
+
+    writer.write(sink)
+
+
+def _generate_parallel(first, rest, ST, now, summary, snapshot_store, sink, workers, chunk_size,
+                       progress=None, total=None):
+    """
+    Render the summary here and the detail log in chunks of `chunk_size`
+    detections across `workers` processes, then merge the parts in order.
+    progress(done, total) is reported per finished chunk. Each chunk starts on a new page. At most 2 × workers chunks are in
+    flight, so an iterator log is never fully materialised.
+    """
+    store_root = snapshot_store.root if snapshot_store is not None else None
+    tmp_dir    = tempfile.mkdtemp(prefix='nauticai_report_')
+    parts      = [os.path.join(tmp_dir, 'summary.pdf')]
+    _new_doc(parts[0]).build(list(summary))
+
+    try:
+        # Spawned workers: this runs on a Streamlit script thread, and forking a
+        # multithreaded process can deadlock the child on a lock held elsewhere
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            pending, done = [], 0
+            chunk, offset, n = first, 0, 1
+            while chunk:
+                nxt  = list(itertools.islice(rest, chunk_size))
+                path = os.path.join(tmp_dir, f'part_{n:05d}.pdf')
+                fut  = pool.submit(_render_chunk, path, chunk, offset, not nxt, now, store_root)
+                pending.append((fut, len(chunk)))
+                parts.append(path)
+                offset += len(chunk)
+                chunk, n = nxt, n + 1
+                while pending and (len(pending) >= 2 * workers or not chunk):
+                    fut, size = pending.pop(0)
+                    try:
+                        fut.result()
+                        done += size
+                        if progress:
+                            progress(done, total)
+                    except BaseException:
+                        for other, _ in pending:
+                            other.cancel()
+                        raise
+        _merge_parts(parts, sink)
+    finally:
+        for path in parts:
+            if os.path.exists(path):
+                os.remove(path)
+        os.rmdir(tmp_dir)
+
+
+# ── Main generator ───────────────────────────────────────────────────────────
+def generate_report(
+    anomaly_log,
+    mission_name  = "Subsea Inspection Mission",
+    operator_name = "NautiCAI Operator",
+    vessel_id     = "ROV-NautiCAI-01",
+    location      = "Offshore Location",
+    output_path   = None,
+    snapshot_store = None,
+    class_counts  = None,
+    workers       = None,
+    chunk_size    = PARALLEL_CHUNK,
+    progress      = None
+):
+    """
+    Build the PDF inspection report.
+
+    anomaly_log may be a list or any iterable of log entries. Entries are
+    pulled lazily while pages are laid out, so with an iterator only a few
+    detections (and their images) are held at a time; pass class_counts
+    for the summary pages in that case. A MissionState log supplies its own.
+
+    With workers > 1 and more than chunk_size detections, the detail log is
+    rendered in parallel as separate parts and merged (requires pypdf);
+    otherwise a single serial build is used.
+
+    progress(done, total) is called as detections are rendered; an exception
+    raised from it aborts the build (used for cancellation).
+
+    With output_path (file path or writable binary file-like object) the PDF
+    is written there and output_path is returned; otherwise returns bytes.
+    """
+    if class_counts is None and hasattr(anomaly_log, 'class_counts'):
+        class_counts = anomaly_log.class_counts     # MissionState keeps them up to date
+    if class_counts is None:
+        if iter(anomaly_log) is anomaly_log:
+            raise ValueError("class_counts is required when anomaly_log is an iterator")
+        class_counts = count_classes(anomaly_log)
+
+    sink    = output_path if output_path is not None else io.BytesIO()
+    ST      = make_styles()
+    now     = datetime.datetime.now()
+    summary = _summary_story(ST, now, mission_name, operator_name, vessel_id, location, class_counts)
+    total   = sum(class_counts.values())
+
+    items    = iter(anomaly_log)
+    parallel = False
+    if workers and workers > 1:
+        first    = list(itertools.islice(items, chunk_size))
+        parallel = len(first) == chunk_size
+        if parallel:
+            try:
+                import pypdf  # noqa: F401
+            except ImportError:
+                print("⚠️  pypdf not installed — rendering the report serially")
+                parallel = False
+        if not parallel:
+            items = itertools.chain(first, items)
+
+    if parallel:
+        _generate_parallel(first, items, ST, now, summary, snapshot_store, sink, workers, chunk_size,
+                           progress, total)
+    else:
+        _new_doc(sink).build(
+            _LazyStory(_report_flowables(items, ST, now, summary, snapshot_store, progress, total)),
+            onFirstPage=_on_page, onLaterPages=_on_page)
+    if output_path is not None:
+        return output_path
+    result = sink.getvalue()
+    sink.close()
     return result
 
 
@@ -417,7 +709,7 @@ if __name__ == '__main__':
             'frame_bytes': None,
         },
     ]
-    pdf_bytes = generate_report(
+    generate_report(
         anomaly_log   = sample_log,
         mission_name  = "Subsea Inspection Mission",
         operator_name = "NautiCAI Operator",
@@ -425,6 +717,4 @@ if __name__ == '__main__':
         location      = "Offshore Location",
         output_path   = "nauticai_report.pdf",
     )
-    with open('/mnt/user-data/outputs/nauticai_report_fixed.pdf', 'wb') as f:
-        f.write(pdf_bytes)
     print("PDF saved!")
\ No newline at end of file
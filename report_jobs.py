@@ -0,0 +1,168 @@
+"""
+NautiCAI - Background Report Jobs
+Runs generate_report off the Streamlit script thread with progress, cancellation and a result cache
+"""
+
+import os
+import uuid
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from report_gen import generate_report
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'nauticai_reports')
+DEFAULT_CACHE_MAX = 16      # finished PDFs kept on disk
+JOB_HISTORY_MAX   = 64      # job records remembered for polling
+
+
+class ReportCancelled(Exception):
+    """Raised from the progress callback to abort a running build"""
+
+
+def report_key(anomaly_log, meta):
+    """
+    SHA-1 over the log contents and mission metadata. Stored frames are
+    identified by their content key, rebuilt entries by their PendingFrame
+    key whether or not they have been displayed yet; inline frames are hashed.
+    """
+    h = hashlib.sha1()
+    for k in sorted(meta):
+        h.update(f'{k}={meta[k]}\n'.encode())
+    for item in anomaly_log:
+        if item.get('frame_pending') is not None:
+            frame = item['frame_pending'].key        # same key before and after display
+        else:
+            frame = item.get('frame_ref')
+        if frame is None and item.get('frame_bytes'):
+            frame = hashlib.sha1(item['frame_bytes']).hexdigest()
+        h.update(f"{item.get('class_name')}|{item.get('confidence')}|"
+                 f"{item.get('timestamp')}|{frame}\n".encode())
+    return h.hexdigest()
+
+
+class ReportJob:
+    """State of one report build; read by the UI while the worker updates it"""
+
+    def __init__(self, key, total):
+        self.id     = uuid.uuid4().hex[:12]
+        self.key    = key
+        self.total  = total
+        self.done   = 0
+        self.status = 'queued'      # queued → running → done | failed | cancelled
+        self.path   = None
+        self.error  = None
+        self._cancel = threading.Event()
+
+    @property
+    def active(self):
+        return self.status in ('queued', 'running')
+
+    @property
+    def fraction(self):
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _progress(self, done, total):
+        if self._cancel.is_set():
+            raise ReportCancelled()
+        self.done = done
+
+
+class ReportJobRunner:
+    """
+    Thread-pool runner for PDF reports. submit() returns immediately with a
+    ReportJob; an identical request (same log contents + metadata) returns
+    the cached PDF or joins the build already in progress.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, cache_max=DEFAULT_CACHE_MAX, max_workers=1):
+        self.cache_dir = cache_dir
+        self.cache_max = cache_max
+        self._pool     = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report')
+        self._lock     = threading.Lock()
+        self._jobs     = OrderedDict()   # job id → ReportJob
+        self._by_key   = {}              # key → latest ReportJob
+        self._cache    = OrderedDict()   # key → finished PDF path (LRU)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _track(self, job):
+        self._jobs[job.id] = job
+        self._by_key[job.key] = job
+        while len(self._jobs) > JOB_HISTORY_MAX:
+            _, old = self._jobs.popitem(last=False)
+            if self._by_key.get(old.key) is old:
+                del self._by_key[old.key]
+
+    def submit(self, anomaly_log, meta, class_counts=None, snapshot_store=None, workers=None):
+        """
+        Queue a report for `anomaly_log` (copied, so the caller may keep
+        appending) with mission `meta` keyword arguments for generate_report.
+        """
+        log          = list(anomaly_log)
+        class_counts = dict(class_counts) if class_counts else None
+        key          = report_key(log, meta)
+        with self._lock:
+            path = self._cache.get(key)
+            if path and os.path.exists(path):
+                self._cache.move_to_end(key)
+                job = ReportJob(key, len(log))
+                job.status, job.done, job.path = 'done', len(log), path
+                self._track(job)
+                return job
+            running = self._by_key.get(key)
+            if running is not None and running.active:
+                return running
+            job = ReportJob(key, len(log))
+            self._track(job)
+
+        self._pool.submit(self._run, job, log, meta, class_counts, snapshot_store, workers)
+        return job
+
+    def _run(self, job, log, meta, class_counts, snapshot_store, workers):
+        path = os.path.join(self.cache_dir, job.key + '.pdf')
+        tmp  = f'{path}.{job.id}.tmp'
+        job.status = 'running'
+        try:
+            job._progress(0, job.total)
+            generate_report(
+                anomaly_log    = log,
+                output_path    = tmp,
+                snapshot_store = snapshot_store,
+                class_counts   = class_counts,
+                workers        = workers,
+                progress       = job._progress,
+                **meta,
+            )
+            os.replace(tmp, path)
+        except ReportCancelled:
+            job.status = 'cancelled'
+        except Exception as e:
+            job.error  = str(e)
+            job.status = 'failed'
+        else:
+            job.path   = path
+            job.done   = job.total
+            self._store(job.key, path)
+            job.status = 'done'
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _store(self, key, path):
+        with self._lock:
+            self._cache[key] = path
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_max:
+                _, old = self._cache.popitem(last=False)
+                if os.path.exists(old):
+                    os.remove(old)
+
+    def get(self, job_id):
+        """ReportJob by id (None if unknown or expired)"""
+        with self._lock:
+            return self._jobs.get(job_id)
@@ -10,6 +10,8 @@ import io
 import datetime
 import numpy as np
 
+from taxonomy import CLASS_SEVERITY
+
 DARK_NAVY   = colors.HexColor('#0A1628')
 TEAL        = colors.HexColor('#00B4B4')
 RED_ALERT   = colors.HexColor('#E63946')
@@ -18,15 +20,8 @@ GREEN_OK    = colors.HexColor('#2A9D8F')
 LIGHT_GREY  = colors.HexColor('#F8F9FA')
 MID_GREY    = colors.HexColor('#6C757D')
 
-SEVERITY_MAP = {
-    'corrosion':     ('CRITICAL', RED_ALERT),
-    'damage':        ('CRITICAL', RED_ALERT),
-    'free_span':     ('CRITICAL', RED_ALERT),
-    'debris':        ('WARNING',  YELLOW_WARN),
-    'marine_growth': ('WARNING',  YELLOW_WARN),
-    'healthy':       ('NORMAL',   GREEN_OK),
-    'anode':         ('NORMAL',   GREEN_OK),
-}
+SEVERITY_COLORS = {'CRITICAL': RED_ALERT, 'WARNING': YELLOW_WARN, 'NORMAL': GREEN_OK}
+SEVERITY_MAP    = {cls: (sev, SEVERITY_COLORS[sev]) for cls, sev in CLASS_SEVERITY.items()}
 
 
 def numpy_to_reportlab_image(np_image, max_width=4*inch, max_height=3*inch):
@@ -0,0 +1,219 @@
+"""
+NautiCAI - Snapshot Store
+Content-addressed on-disk cache for annotated detection frames with a byte-bounded in-memory LRU tier
+"""
+
+import os
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+DEFAULT_ROOT       = os.path.join(tempfile.gettempdir(), 'nauticai_snapshots')
+DEFAULT_MEM_BUDGET  = 64 * 1024 * 1024         # bytes of JPEG data kept in RAM
+DEFAULT_DISK_BUDGET = 2 * 1024 * 1024 * 1024   # bytes kept under root before the oldest are deleted
+
+# Downscaled renditions generated once at log time: name → max width in px
+PYRAMID_SIZES     = {'thumb': 320, 'preview': 960}
+PYRAMID_QUALITY   = 85
+PYRAMID_INDEX_MAX = 4096                 # frame key → rendition keys remembered in RAM
+
+
+class SnapshotStore:
+    """
+    Stores JPEG bytes on disk under their SHA-1 (root/ab/abcdef….jpg) and
+    keeps the most recently used ones in memory up to `mem_budget` bytes.
+    The anomaly log only holds the returned key (`frame_ref`); identical
+    frames are stored once. Safe to share between Streamlit sessions.
+    Files beyond `disk_budget` bytes are deleted least recently stored first
+    (by mtime, refreshed when the same frame is stored again, so the order
+    survives restarts); an evicted frame resolves to None like any other
+    missing frame.
+    """
+
+    def __init__(self, root=DEFAULT_ROOT, mem_budget=DEFAULT_MEM_BUDGET,
+                 disk_budget=DEFAULT_DISK_BUDGET):
+        self.root        = root
+        self.mem_budget  = mem_budget
+        self.disk_budget = disk_budget
+        self._lru        = OrderedDict()
+        self._mem_bytes  = 0
+        self._lock       = threading.Lock()
+        self._pyramids   = OrderedDict()
+        self._disk       = None     # key → file size, oldest first; scanned on the first put
+        self._disk_bytes = 0
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key + '.jpg')
+
+    def _scan_disk(self):
+        # Read-only users (report worker processes) never pay for this walk
+        files = []
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith('.jpg'):
+                    try:
+                        st = os.stat(os.path.join(dirpath, name))
+                    except OSError:
+                        continue
+                    files.append((st.st_mtime_ns, name[:-4], st.st_size))
+        self._disk       = OrderedDict((key, size) for _, key, size in sorted(files))
+        self._disk_bytes = sum(self._disk.values())
+
+    def _track(self, key, size):
+        """Record a written / reused file as most recent and evict over disk_budget"""
+        evicted = []
+        with self._lock:
+            if self._disk is None:
+                self._scan_disk()
+            if key in self._disk:
+                self._disk.move_to_end(key)
+            else:
+                self._disk[key]   = size
+                self._disk_bytes += size
+            while self._disk_bytes > self.disk_budget and len(self._disk) > 1:
+                old, old_size = self._disk.popitem(last=False)
+                self._disk_bytes -= old_size
+                self._pyramids.pop(old, None)
+                evicted.append(old)
+        for old in evicted:
+            try:
+                os.remove(self._path(old))
+            except OSError:
+                pass
+
+    def _remember(self, key, data):
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                return
+            if len(data) > self.mem_budget:
+                return
+            self._lru[key]   = data
+            self._mem_bytes += len(data)
+            while self._mem_bytes > self.mem_budget:
+                _, old = self._lru.popitem(last=False)
+                self._mem_bytes -= len(old)
+
+    def put(self, data):
+        """Store JPEG bytes and return their key"""
+        key  = hashlib.sha1(data).hexdigest()
+        path = self._path(key)
+        if os.path.exists(path):
+            try:
+                os.utime(path)              # refresh its place in the disk LRU
+            except OSError:
+                pass
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        self._track(key, len(data))
+        self._remember(key, data)
+        return key
+
+    def get(self, key):
+        """JPEG bytes for a key, from memory if hot, else from disk (None if missing)"""
+        with self._lock:
+            data = self._lru.get(key)
+            if data is not None:
+                self._lru.move_to_end(key)
+                return data
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        self._remember(key, data)
+        return data
+
+    def put_pyramid(self, key, sizes=PYRAMID_SIZES):
+        """
+        Store downscaled renditions of an already stored frame and return
+        {name: key}. Each frame is decoded and resized only once.
+        """
+        with self._lock:
+            refs = self._pyramids.get(key)
+            if refs is not None:
+                self._pyramids.move_to_end(key)
+                return refs
+
+        data = self.get(key)
+        img  = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR) if data else None
+        refs = {}
+        if img is not None:
+            h, w = img.shape[:2]
+            for name, max_w in sorted(sizes.items(), key=lambda x: -x[1]):
+                if w <= max_w:
+                    refs[name] = key
+                    continue
+                # Resize from the previous (larger) rendition when possible
+                small = cv2.resize(img, (max_w, max(1, round(h * max_w / w))),
+                                   interpolation=cv2.INTER_AREA)
+                _, buf = cv2.imencode('.jpg', small, [cv2.IMWRITE_JPEG_QUALITY, PYRAMID_QUALITY])
+                refs[name] = self.put(buf.tobytes())
+                img, h, w = small, small.shape[0], max_w
+
+        with self._lock:
+            self._pyramids[key] = refs
+            while len(self._pyramids) > PYRAMID_INDEX_MAX:
+                self._pyramids.popitem(last=False)
+        return refs
+
+    def __contains__(self, key):
+        return key in self._lru or os.path.exists(self._path(key))
+
+    @property
+    def memory_bytes(self):
+        return self._mem_bytes
+
+    @property
+    def disk_bytes(self):
+        return self._disk_bytes
+
+
+def _draw_pending(item, store):
+    """
+    Draw and store a log entry's PendingFrame (prediction_store.py) on first
+    display. The PendingFrame stays on the entry, so its identity (e.g. the
+    report cache key) does not depend on what has been displayed.
+    """
+    pending = item.get('frame_pending')
+    if pending is None or store is None or item.get('frame_ref'):
+        return
+    data = pending.render(store)
+    if data:
+        item['frame_ref'] = store.put(data)
+
+
+def resolve_rendition(item, name, store=None):
+    """Bytes of a pyramid rendition ('thumb' / 'preview'), falling back to the full frame"""
+    _draw_pending(item, store)
+    if store is not None and item.get('frame_ref') and name + '_ref' not in item:
+        item.update({n + '_ref': ref for n, ref in store.put_pyramid(item['frame_ref']).items()})
+    if store is not None and item.get(name + '_ref'):
+        data = store.get(item[name + '_ref'])
+        if data:
+            return data
+    return resolve_frame_bytes(item, store)
+
+
+def resolve_frame_bytes(item, store=None):
+    """
+    Frame JPEG for a log entry holding inline `frame_bytes`, a `frame_ref`
+    or a PendingFrame. A pending frame is drawn but neither stored nor
+    written back, so report workers only read from the store.
+    """
+    if item.get('frame_bytes'):
+        return item['frame_bytes']
+    if store is not None and item.get('frame_ref'):
+        return store.get(item['frame_ref'])
+    if store is not None and item.get('frame_pending') is not None:
+        return item['frame_pending'].render(store)
+    return None
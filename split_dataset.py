@@ -1,42 +1,237 @@
+"""
+NautiCAI - Dataset Splitting
+Seeded, class-stratified train/val and k-fold splits written as image lists or links; no files are moved
+"""
+
 import os
+import json
 import shutil
-import random
-
-# Paths
-train_img = "dataset/images/train"
-val_img   = "dataset/images/val"
-train_lbl = "dataset/labels/train"
-val_lbl   = "dataset/labels/val"
-
-# Get all images
-images = [f for f in os.listdir(train_img) 
-          if f.endswith(('.jpg', '.jpeg', '.png'))]
-
-# Shuffle randomly
-random.shuffle(images)
-
-# 80/20 split
-split_point = int(len(images) * 0.8)
-val_images  = images[split_point:]  # last 20%
-
-print(f"Total images: {len(images)}")
-print(f"Moving {len(val_images)} images to val...")
-
-# Move val images and their labels
-for img_file in val_images:
-    # Move image
-    shutil.move(
-        os.path.join(train_img, img_file),
-        os.path.join(val_img, img_file)
+import argparse
+from collections import Counter
+
+import numpy as np
+import yaml
+
+from augment_cache import aug_variants
+from dataset_index import build_index
+from dedup import DEFAULT_RADIUS, connected_groups, hash_images
+from taxonomy import class_names
+
+POOL_SPLITS = ('train', 'val')     # physical directories whose images are (re)split
+SPLIT_MODES = ('list', 'symlink', 'hardlink')
+
+
+def strata(presence):
+    """
+    Stratum per image: its rarest class (by images containing it), so rare
+    classes like free_span / anode are spread over every fold first.
+    Images without boxes form their own stratum.
+    """
+    freq = presence.sum(axis=0).astype(float)
+    key  = np.where(presence, freq, np.inf).argmin(axis=1)
+    key[~presence.any(axis=1)] = presence.shape[1]
+    return key
+
+
+def assign_folds(presence, k, seed=0):
+    """Fold id (0..k-1) per image, stratified by rarest class and reproducible for a seed"""
+    rng    = np.random.default_rng(seed)
+    key    = strata(presence)
+    folds  = np.empty(len(key), dtype=np.int32)
+    offset = 0
+    for s in np.unique(key):
+        members = rng.permutation(np.flatnonzero(key == s))
+        # Continue the round-robin across strata so fold sizes stay balanced
+        folds[members] = (np.arange(len(members)) + offset) % k
+        offset += len(members)
+    return folds
+
+
+def assign_holdout(presence, val_frac, seed=0):
+    """Bool val mask with ~val_frac of each stratum (at least one image of strata with 2+)"""
+    rng  = np.random.default_rng(seed)
+    key  = strata(presence)
+    val  = np.zeros(len(key), dtype=bool)
+    for s in np.unique(key):
+        members = rng.permutation(np.flatnonzero(key == s))
+        n_val   = int(np.floor(len(members) * val_frac + rng.random()))   # unbiased rounding
+        if len(members) >= 2:
+            n_val = min(max(n_val, 1), len(members) - 1)
+        val[members[:n_val]] = True
+    return val
+
+
+def near_duplicate_units(index, rows, radius=DEFAULT_RADIUS, workers=None):
+    """
+    Unit id (0..n_units-1) per image row: images connected by perceptual-hash
+    distances within radius (see dedup.py) share one, so a near-duplicate
+    group is assigned as a whole and never straddles train and val.
+    """
+    hashes, valid = hash_images(index.root, index.paths[rows].tolist(), workers)
+    unit   = np.arange(len(rows))
+    hashed = np.flatnonzero(valid)
+    for members in connected_groups(hashes[valid], radius):
+        unit[hashed[members]] = hashed[members[0]]
+    return np.unique(unit, return_inverse=True)[1]
+
+
+def _aug_sources(index):
+    """
+    {source image path: [augmented image rows]} for images/train_aug, from the
+    augment_cache.py manifest. Keyed by the source's path relative to the
+    dataset root, so same-named images in different splits are not confused.
+    """
+    rows = {p: i for i, p in enumerate(index.paths.tolist())}
+    return {src: [rows[v] for v in variants if v in rows]
+            for src, variants in aug_variants(index.root).items()}
+
+
+def _link(src, dst, mode):
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.lexists(dst):
+        os.remove(dst)
+    if mode == 'hardlink':
+        os.link(src, dst)
+    else:
+        os.symlink(src, dst)
+
+
+def write_split(index, out_dir, parts, mode='list'):
+    """
+    Write {part name: image rows} under out_dir plus a data.yaml pointing at it.
+    list: <part>.txt image lists (YOLO reads labels next to the original images).
+    symlink / hardlink: images/<part>/ and labels/<part>/ link trees.
+    Returns the data.yaml path.
+    """
+    if mode not in SPLIT_MODES:
+        raise ValueError(f"mode must be one of {SPLIT_MODES}")
+    os.makedirs(out_dir, exist_ok=True)
+    root    = os.path.abspath(index.root)
+    entries = {}
+    for part, rows in parts.items():
+        images = [os.path.join(root, index.paths[r]) for r in rows]
+        if mode == 'list':
+            entries[part] = os.path.join(out_dir, part + '.txt')
+            with open(entries[part], 'w') as f:
+                f.write('\n'.join(images) + '\n')
+            continue
+        names = [os.path.basename(src) for src in images]
+        clash = sorted(n for n, c in Counter(names).items() if c > 1)
+        if clash:
+            # Link trees are flat, so these would overwrite each other
+            raise ValueError(f"{part}: images from different folders share a file name "
+                             f"({', '.join(clash[:5])}); use mode='list'")
+        img_dir = os.path.join(out_dir, 'images', part)
+        for old in (img_dir, os.path.join(out_dir, 'labels', part)):
+            shutil.rmtree(old, ignore_errors=True)    # only links: the originals are untouched
+        for src, fname in zip(images, names):
+            _link(src, os.path.join(img_dir, fname), mode)
+            # Ultralytics finds labels by swapping /images/ for /labels/ in the image path
+            lbl = os.path.splitext(src.replace(os.sep + 'images' + os.sep,
+                                               os.sep + 'labels' + os.sep))[0] + '.txt'
+            if os.path.exists(lbl):
+                _link(lbl, os.path.join(out_dir, 'labels', part, os.path.basename(lbl)), mode)
+        entries[part] = img_dir
+
+    data_yaml = os.path.join(out_dir, 'data.yaml')
+    with open(data_yaml, 'w') as f:
+        yaml.safe_dump({'path': os.path.abspath(out_dir), 'train': entries['train'],
+                        'val': entries['val'], 'nc': len(class_names()),
+                        'names': class_names()}, f, sort_keys=False)
+    return data_yaml
+
+
+def _print_balance(presence, parts):
+    names = class_names()
+    print(f"\n  {'class':<16}" + ''.join(f'{p:>10}' for p in parts))
+    for cid, name in names.items():
+        print(f"  {name:<16}" + ''.join(f'{int(presence[rows, cid].sum()):>10}'
+                                        for rows in parts.values()))
+    print(f"  {'images':<16}" + ''.join(f'{len(rows):>10}' for rows in parts.values()))
+
+
+def split_dataset(data_yaml='data.yaml', val_frac=0.2, kfold=None, seed=0, mode='list',
+                  out_dir=None, with_aug=True, group_radius=DEFAULT_RADIUS, workers=None):
+    """
+    Split every image currently in images/train and images/val. Holdout
+    (val_frac) or k-fold (kfold) splits are stratified by each image's rarest
+    class and fully determined by the seed, so re-running reproduces the same
+    split. Near-duplicates within group_radius (None: no grouping) are split
+    as one unit. Augmented copies (images/train_aug) follow their source
+    image into train and never reach val. Returns the data.yaml path(s) to
+    train with.
+    """
+    index    = build_index(data_yaml)
+    pool     = np.flatnonzero(np.isin(index.split, [index.splits.index(s)
+                                                    for s in POOL_SPLITS if s in index.splits]))
+    presence = index.presence()[pool]
+    aug      = _aug_sources(index) if with_aug else {}
+    name     = f'kfold{kfold}_seed{seed}' if kfold else f'val{int(val_frac * 100)}_seed{seed}'
+    out_dir  = out_dir or os.path.join(index.root, 'splits', name)
+
+    # Stratify units (near-duplicate groups) rather than images; a unit has
+    # every class of its members. Without groups units are the images.
+    if group_radius is not None:
+        unit = near_duplicate_units(index, pool, group_radius, workers)
+    else:
+        unit = np.arange(len(pool))
+    unit_presence = np.zeros((int(unit.max(initial=-1)) + 1, presence.shape[1]), dtype=bool)
+    np.logical_or.at(unit_presence, unit, presence)
+    if len(unit_presence) < len(pool):
+        print(f"{len(pool) - len(unit_presence)} near-duplicate images kept on the side of their group")
+
+    if kfold:
+        folds  = assign_folds(unit_presence, kfold, seed)[unit]
+        layout = {f'fold{i}': folds == i for i in range(kfold)}
+    else:
+        layout = {'': assign_holdout(unit_presence, val_frac, seed)[unit]}
+
+    outputs = []
+    for sub, is_val in layout.items():
+        train_rows = pool[~is_val].tolist()
+        for src in sorted(set(index.paths[train_rows].tolist()) & set(aug)):
+            train_rows += aug[src]
+        parts = {'train': train_rows, 'val': pool[is_val].tolist()}
+        outputs.append(write_split(index, os.path.join(out_dir, sub), parts, mode))
+        print(f"\n{sub or 'holdout'}: {len(parts['train'])} train · {len(parts['val'])} val → {outputs[-1]}")
+        _print_balance(presence, {'train': np.flatnonzero(~is_val), 'val': np.flatnonzero(is_val)})
+
+    with open(os.path.join(out_dir, 'split.json'), 'w') as f:
+        json.dump({'seed': seed, 'val_frac': None if kfold else val_frac, 'kfold': kfold,
+                   'group_radius': group_radius, 'mode': mode, 'images': int(len(pool)), 'data': outputs}, f, indent=2)
+    print(f"\n✅ Split written to {out_dir} (nothing moved; delete the folder to undo)")
+    return outputs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='NautiCAI Dataset Splitting')
+    parser.add_argument('--data', type=str, default='data.yaml')
+    parser.add_argument('--val', type=float, default=0.2, help='Validation fraction (holdout)')
+    parser.add_argument('--kfold', type=int, default=None, help='Write K folds instead of one holdout')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--mode', type=str, default='list', choices=SPLIT_MODES,
+                        help='list: YOLO image list files · symlink / hardlink: link trees')
+    parser.add_argument('--out', type=str, default=None,
+                        help='Output folder (default: <dataset>/splits/<name>)')
+    parser.add_argument('--group-radius', type=int, default=DEFAULT_RADIUS,
+                        help='Keep images within this perceptual-hash distance on one side (see dedup.py)')
+    parser.add_argument('--no-group', action='store_true',
+                        help='Split images independently, even near-duplicates')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4,
+                        help='Processes hashing images for --group-radius')
+    parser.add_argument('--no-aug', action='store_true',
+                        help='Do not add images/train_aug variants to the train lists')
+
+    args = parser.parse_args()
+
+    split_dataset(
+        data_yaml    = args.data,
+        val_frac     = args.val,
+        kfold        = args.kfold,
+        seed         = args.seed,
+        mode         = args.mode,
+        out_dir      = args.out,
+        with_aug     = not args.no_aug,
+        group_radius = None if args.no_group else args.group_radius,
+        workers      = args.workers,
     )
-    
-    # Move corresponding label if exists
-    label_file = os.path.splitext(img_file)[0] + ".txt"
-    label_src  = os.path.join(train_lbl, label_file)
-    
-    if os.path.exists(label_src):
-        shutil.move(label_src, os.path.join(val_lbl, label_file))
-
-print(f"✅ Done!")
-print(f"Train images: {len(os.listdir(train_img))}")
-print(f"Val images:   {len(os.listdir(val_img))}")
\ No newline at end of file
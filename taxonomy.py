@@ -0,0 +1,103 @@
+"""
+NautiCAI - Class Taxonomy
+Single source of truth for class names (data.yaml) and severities, with NumPy id → severity lookup arrays
+"""
+
+import os
+import functools
+
+import numpy as np
+import yaml
+
+BASE_DIR  = os.path.dirname(os.path.abspath(__file__))
+DATA_YAML = os.path.join(BASE_DIR, 'data.yaml')
+
+# Severity ids index into SEVERITIES
+SEVERITIES = ('CRITICAL', 'WARNING', 'NORMAL')
+CRITICAL, WARNING, NORMAL = range(len(SEVERITIES))
+DEFAULT_SEVERITY = 'WARNING'     # classes not listed below (e.g. a baseline COCO model)
+
+CLASS_SEVERITY = {
+    'corrosion':     'CRITICAL',
+    'damage':        'CRITICAL',
+    'free_span':     'CRITICAL',
+    'marine_growth': 'WARNING',
+    'debris':        'WARNING',
+    'healthy':       'NORMAL',
+    'anode':         'NORMAL',
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _load_names(data_yaml):
+    with open(data_yaml, 'r') as f:
+        names = yaml.safe_load(f)['names']
+    if isinstance(names, list):
+        names = dict(enumerate(names))
+    return tuple(sorted((int(k), v) for k, v in names.items()))
+
+
+def class_names(data_yaml=DATA_YAML):
+    """{class id: name} from data.yaml (read once per process)"""
+    return dict(_load_names(data_yaml))
+
+
+def class_ids(data_yaml=DATA_YAML):
+    """{name: class id} from data.yaml"""
+    return {v: k for k, v in _load_names(data_yaml)}
+
+
+def severity_of(name):
+    """Severity label of a class name"""
+    return CLASS_SEVERITY.get(name, DEFAULT_SEVERITY)
+
+
+def classes_with(severity):
+    """Class names with the given severity label, e.g. classes_with('CRITICAL')"""
+    return [name for name, sev in CLASS_SEVERITY.items() if sev == severity]
+
+
+class Taxonomy:
+    """
+    Lookups for one model's `names` ({id: name}). Severity is resolved by
+    class name, so a model whose ids or names differ from data.yaml still
+    maps correctly (unknown names fall back to DEFAULT_SEVERITY).
+    Per-box work is a single gather on the cls array:
+        tax.severity_ids(boxes.cls) → int8 severity ids
+        tax.names_of(boxes.cls)     → class names
+    """
+
+    def __init__(self, names):
+        self.names = dict(names)
+        size       = max(self.names, default=-1) + 1
+        self.name_array     = np.array([self.names.get(i, str(i)) for i in range(size)], dtype=object)
+        self.severity_array = np.array([SEVERITIES.index(severity_of(n)) for n in self.name_array],
+                                       dtype=np.int8)
+        self.matches_dataset = self.names == class_names()
+
+    @staticmethod
+    def _ids(cls):
+        if hasattr(cls, 'cpu'):
+            cls = cls.cpu().numpy()
+        return np.asarray(cls).astype(np.int64).reshape(-1)
+
+    def severity_ids(self, cls):
+        return self.severity_array[self._ids(cls)]
+
+    def names_of(self, cls):
+        return self.name_array[self._ids(cls)]
+
+    def severity_counts(self, cls):
+        """Boxes per severity, in SEVERITIES order"""
+        return np.bincount(self.severity_ids(cls), minlength=len(SEVERITIES))
+
+
+@functools.lru_cache(maxsize=16)
+def _taxonomy(items):
+    return Taxonomy(dict(items))
+
+
+def get_taxonomy(names=None):
+    """Shared Taxonomy for a model's names (data.yaml names by default)"""
+    names = class_names() if names is None else names
+    return _taxonomy(tuple(sorted(names.items())))
@@ -0,0 +1,131 @@
+"""
+NautiCAI - Anomaly Tracker
+SORT-style IoU + constant-velocity association so each physical anomaly in a video is logged once, with its best frame
+"""
+
+import numpy as np
+
+from detection_log import log_detection, format_timestamp
+
+TRACK_IOU      = 0.2    # min IoU between a predicted track box and a detection to associate
+TRACK_MAX_AGE  = 2.0    # seconds a track may go unseen before it is closed
+TRACK_MIN_HITS = 1      # frames a track needs before it is logged
+VELOCITY_ALPHA = 0.5    # smoothing of the per-second box velocity
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU of (N, 4) and (M, 4) xyxy boxes → (N, M)"""
+    if not len(a) or not len(b):
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    lt    = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb    = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+class Track:
+    """One physical anomaly followed across frames, remembering its best detection"""
+
+    __slots__ = ('id', 'cls', 'box', 'vel', 'first_t', 'last_t', 'hits',
+                 'best_conf', 'best_t', 'best_frame_idx', 'best_box', 'best_payload')
+
+    def __init__(self, track_id, cls, box, conf, t, frame_idx, payload):
+        self.id      = track_id
+        self.cls     = cls
+        self.box     = box
+        self.vel     = np.zeros(4, dtype=np.float32)
+        self.first_t = t
+        self.last_t  = t
+        self.hits    = 1
+        self.best_conf, self.best_t, self.best_frame_idx = conf, t, frame_idx
+        self.best_box, self.best_payload = box, payload
+
+    def predict(self, t):
+        """Box extrapolated to time t with the constant-velocity model"""
+        return self.box + self.vel * (t - self.last_t)
+
+    def update(self, box, conf, t, frame_idx, payload):
+        dt = t - self.last_t
+        if dt > 0:
+            self.vel = VELOCITY_ALPHA * (box - self.box) / dt + (1 - VELOCITY_ALPHA) * self.vel
+        self.box, self.last_t = box, t
+        self.hits += 1
+        if conf > self.best_conf:
+            self.best_conf, self.best_t, self.best_frame_idx = conf, t, frame_idx
+            self.best_box, self.best_payload = box, payload
+
+
+class IoUTracker:
+    """
+    Class-aware greedy IoU tracker. update() costs O(active tracks × boxes)
+    per frame, independent of how many detections were logged before.
+    Tracks unseen for `max_age` seconds are closed and returned once.
+    """
+
+    def __init__(self, iou_thresh=TRACK_IOU, max_age=TRACK_MAX_AGE, min_hits=TRACK_MIN_HITS):
+        self.iou_thresh = iou_thresh
+        self.max_age    = max_age
+        self.min_hits   = min_hits
+        self.tracks     = []
+        self._next_id   = 1
+        self._confirmed = {}        # class id → tracks that reached min_hits
+
+    def _confirm(self, tr):
+        if tr.hits == self.min_hits:
+            self._confirmed[tr.cls] = self._confirmed.get(tr.cls, 0) + 1
+
+    def update(self, boxes, t, frame_idx=None, payload=None):
+        """
+        Associate one frame's boxes (backends.Boxes) seen at time t (seconds).
+        payload (e.g. the annotated JPEG, or a callable producing it) is kept
+        for the track's best detection. Returns the tracks closed by this frame.
+        """
+        closed      = [tr for tr in self.tracks if t - tr.last_t > self.max_age]
+        self.tracks = [tr for tr in self.tracks if t - tr.last_t <= self.max_age]
+
+        cls  = boxes.cls.astype(np.int64)
+        xyxy = boxes.xyxy
+        used = np.zeros(len(cls), dtype=bool)
+        if self.tracks and len(cls):
+            pred = np.stack([tr.predict(t) for tr in self.tracks])
+            iou  = iou_matrix(pred, xyxy)
+            iou[np.array([tr.cls for tr in self.tracks])[:, None] != cls[None, :]] = 0
+            # Greedy: best remaining pair first
+            while True:
+                ti, di = np.unravel_index(np.argmax(iou), iou.shape)
+                if iou[ti, di] < self.iou_thresh:
+                    break
+                self.tracks[ti].update(xyxy[di], float(boxes.conf[di]), t, frame_idx, payload)
+                self._confirm(self.tracks[ti])
+                used[di]   = True
+                iou[ti, :] = 0
+                iou[:, di] = 0
+
+        for di in np.flatnonzero(~used):
+            tr = Track(self._next_id, int(cls[di]), xyxy[di], float(boxes.conf[di]), t, frame_idx, payload)
+            self._next_id += 1
+            self._confirm(tr)
+            self.tracks.append(tr)
+
+        return [tr for tr in closed if tr.hits >= self.min_hits]
+
+    def flush(self):
+        """Close and return every remaining track (end of video)"""
+        closed, self.tracks = self.tracks, []
+        return [tr for tr in closed if tr.hits >= self.min_hits]
+
+    def class_counts(self):
+        """{class id: confirmed tracks so far}, including ones still open"""
+        return dict(self._confirmed)
+
+
+def log_tracks(log, counts, tracks, names, store=None, **extra):
+    """Log each closed track once with its best confidence, frame and box"""
+    for tr in sorted(tracks, key=lambda tr: tr.first_t):
+        log_detection(log, counts, names[tr.cls], tr.best_conf, format_timestamp(tr.best_t),
+                      tr.best_payload, None, store=store, track_id=tr.id, time_sec=float(tr.best_t),
+                      frame_idx=tr.best_frame_idx, xyxy=[float(v) for v in tr.best_box],
+                      first_seen=format_timestamp(tr.first_t), last_seen=format_timestamp(tr.last_t),
+                      hits=tr.hits, **extra)
@@ -5,9 +5,29 @@ Trains underwater anomaly detection model on composite dataset
 """
 
 from ultralytics import YOLO
+from ultralytics.data import YOLODataset
+from ultralytics.models.yolo.detect import DetectionTrainer
+from ultralytics.utils import colorstr
+from ultralytics.utils.torch_utils import de_parallel
 import os
-import yaml
+import sys
+import time
+import random
 import argparse
+import yaml
+
+from taxonomy import classes_with
+from dataset_index import build_index
+from augment_cache import dataset_root
+from image_cache import (ImageCache, build_image_cache, train_image_dirs, default_cache_dir,
+                         available_memory, decode_resize, list_images)
+
+# Cache directory handed to CachedDetectionTrainer (an env var so DDP subprocesses see it too)
+IMAGE_CACHE_ENV = 'NAUTICAI_IMAGE_CACHE'
+
+# Rough YOLOv8 training memory (activations + gradients) per input pixel, for the CPU batch size
+CPU_TRAIN_BYTES_PER_PIXEL = 600
+MAX_AUTO_BATCH            = 16
 
 
 def verify_dataset(data_yaml_path):
@@ -15,20 +35,26 @@ def verify_dataset(data_yaml_path):
     with open(data_yaml_path, 'r') as f:
         data = yaml.safe_load(f)
 
-    dataset_path = data['path']
-    train_path = os.path.join(dataset_path, data['train'])
-    val_path = os.path.join(dataset_path, data['val'])
+    dataset_path = dataset_root(data)
+    train_paths = train_image_dirs(data_yaml_path, 'train')
+    val_paths = train_image_dirs(data_yaml_path, 'val')
 
     print(f"Dataset root: {dataset_path}")
-    print(f"Train images: {train_path}")
-    print(f"Val images:   {val_path}")
+    print(f"Train images: {', '.join(train_paths)}")
+    print(f"Val images:   {', '.join(val_paths)}")
 
-    # Count images
-    train_imgs = len(os.listdir(train_path)) if os.path.exists(train_path) else 0
-    val_imgs = len(os.listdir(val_path)) if os.path.exists(val_path) else 0
+    # Image directories or split_dataset.py image lists; label checks come from the
+    # label index (only changed label files are re-read) when the root has images/
+    train_imgs = len(list_images(train_paths))
+    val_imgs = len(list_images(val_paths))
+    has_index = os.path.isdir(os.path.join(dataset_path, 'images'))
+    stats = build_index(data_yaml_path).split_stats() if has_index else {}
 
     print(f"\nTrain images found: {train_imgs}")
     print(f"Val images found:   {val_imgs}")
+    for split, st in stats.items():
+        if st['empty'] or st['missing']:
+            print(f"⚠️  {split}: {st['missing']} images without a label file, {st['empty']} with empty labels")
 
     if train_imgs == 0:
         print("\n⚠️  WARNING: No training images found!")
@@ -42,13 +68,141 @@ def verify_dataset(data_yaml_path):
     return True
 
 
+# ── Cached-dataset training ──────────────────────────────────────────────────
+class CachedYOLODataset(YOLODataset):
+    """YOLODataset whose load_image reads pre-decoded images from an ImageCache"""
+
+    def __init__(self, *args, image_cache_dir=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        cache = ImageCache.open(image_cache_dir) if image_cache_dir else None
+        if cache is not None and cache.imgsz != self.imgsz:
+            print(f"⚠️  Image cache was built at {cache.imgsz}px, training at {self.imgsz}px — not used")
+            cache = None
+        self.image_cache = cache
+        self.cache_rows  = [cache.row(f) if cache else None for f in self.im_files]
+        hits = sum(r is not None for r in self.cache_rows)
+        if cache is not None:
+            print(f"Image cache: {hits}/{len(self.im_files)} images "
+                  f"({'RAM' if cache.in_ram else 'memmap'}, {cache.nbytes / 1e9:.2f} GB)")
+
+    def load_image(self, i, rect_mode=True):
+        row = self.cache_rows[i] if rect_mode else None
+        if row is None:
+            return super().load_image(i, rect_mode)
+        im, hw0 = self.image_cache.image(row)
+        if self.augment:
+            # Mosaic / MixUp draw their partner images from this buffer
+            self.buffer.append(i)
+            if len(self.buffer) >= self.max_buffer_length:
+                self.buffer.pop(0)
+        return im.copy(), hw0, im.shape[:2]
+
+
+class CachedDetectionTrainer(DetectionTrainer):
+    """DetectionTrainer that builds the train split as a CachedYOLODataset"""
+
+    def build_dataset(self, img_path, mode='train', batch=None):
+        cache_dir = os.environ.get(IMAGE_CACHE_ENV)
+        if mode != 'train' or not cache_dir:
+            return super().build_dataset(img_path, mode, batch)
+        # Same arguments as ultralytics.data.build_yolo_dataset for the train split
+        cfg = self.args
+        gs  = max(int(de_parallel(self.model).stride.max() if self.model else 0), 32)
+        return CachedYOLODataset(
+            img_path=img_path, imgsz=cfg.imgsz, batch_size=batch, augment=True, hyp=cfg,
+            rect=cfg.rect, cache=cfg.cache or None, single_cls=cfg.single_cls or False,
+            stride=gs, pad=0.0, prefix=colorstr('train: '), task=cfg.task,
+            classes=cfg.classes, data=self.data, fraction=cfg.fraction,
+            image_cache_dir=cache_dir,
+        )
+
+
+def select_device(device=None):
+    """The requested device, else CUDA device 0 when available, else 'cpu'"""
+    if device not in (None, ''):
+        return device
+    import torch
+    if torch.cuda.is_available():
+        return 0
+    print("⚠️  No CUDA device found — training on CPU")
+    return 'cpu'
+
+
+def autotune_batch(batch, device, imgsz):
+    """
+    batch > 0 is kept. Otherwise: on CUDA -1 (Ultralytics AutoBatch measures
+    free GPU memory), on CPU the largest power of two up to MAX_AUTO_BATCH
+    whose estimated training memory fits in a quarter of free RAM.
+    """
+    if batch > 0:
+        return batch
+    if device != 'cpu':
+        return -1
+    per_image = CPU_TRAIN_BYTES_PER_PIXEL * imgsz * imgsz
+    auto = 1
+    while auto * 2 <= MAX_AUTO_BATCH and auto * 2 * per_image <= available_memory() / 4:
+        auto *= 2
+    print(f"Auto batch size (CPU, {available_memory() / 1e9:.1f} GB free): {auto}")
+    return auto
+
+
+class _LoadProbe:
+    """Dataset that only reads images (from the cache when possible), for timing the loader"""
+
+    def __init__(self, files, imgsz, cache_dir=None):
+        self.files = files
+        self.imgsz = imgsz
+        self.cache = ImageCache.open(cache_dir, in_ram=False) if cache_dir else None
+
+    def __len__(self):
+        return len(self.files)
+
+    def __getitem__(self, i):
+        hit = self.cache.lookup(self.files[i]) if self.cache is not None else None
+        im  = hit[0].copy() if hit is not None else decode_resize(self.files[i], self.imgsz)[0]
+        return 0 if im is None else im.nbytes
+
+
+def autotune_workers(files, imgsz, batch, cache_dir=None, max_workers=None, batches=6):
+    """
+    Dataloader workers from measured throughput: time `batches` batches of
+    image reads for 0, 1, 2, 4, ... workers and keep the smallest count within
+    10% of the best rate (more workers only cost RAM and CPU for training).
+    """
+    from torch.utils.data import DataLoader
+
+    max_workers = max_workers or os.cpu_count() or 1
+    batch       = max(batch, 1)
+    sample      = random.Random(0).sample(files, min(len(files), batch * (batches + 1)))
+    probe       = _LoadProbe(sample, imgsz, cache_dir)
+
+    rates, workers = {}, 0
+    while workers <= max_workers:
+        loader = DataLoader(probe, batch_size=batch, num_workers=workers, shuffle=False)
+        it     = iter(loader)
+        next(it, None)                       # worker start-up is not throughput
+        t0     = time.perf_counter()
+        n      = sum(len(b) for b in it)
+        rates[workers] = n / max(time.perf_counter() - t0, 1e-6)
+        print(f"  workers={workers:<2}  {rates[workers]:8.1f} img/s")
+        if workers and rates[workers] < 1.1 * max(r for w, r in rates.items() if w < workers):
+            break                            # no longer scaling
+        workers = workers * 2 if workers else 1
+
+    best = max(rates.values())
+    return min(w for w, r in rates.items() if r >= 0.9 * best)
+
+
 def train_model(
     model_size='n',
     epochs=100,
     imgsz=640,
     batch=16,
     data_yaml='data.yaml',
-    resume=False
+    resume=False,
+    cache_images=False,
+    workers=None,
+    device=None,
 ):
     """
     Train YOLOv8 model
@@ -57,9 +211,12 @@ def train_model(
         model_size: 'n' (nano), 's' (small), 'm' (medium)
         epochs: number of training epochs
         imgsz: input image size
-        batch: batch size
+        batch: batch size (<= 0 = pick from GPU / RAM memory)
         data_yaml: path to data config
         resume: resume from last checkpoint
+        cache_images: pre-decode the train split into a memory-mapped image cache
+        workers: dataloader workers (None = pick from measured throughput)
+        device: CUDA device / 'cpu' (None = CUDA 0 if available, else CPU)
     """
 
     print("=" * 60)
@@ -71,6 +228,20 @@ def train_model(
         print("\nPlease add dataset images before training.")
         return None
 
+    device  = select_device(device)
+    batch   = autotune_batch(batch, device, imgsz)
+    trainer = None
+    cache_dir = None
+    if cache_images:
+        cache_dir = default_cache_dir(data_yaml, 'train', imgsz)
+        build_image_cache(train_image_dirs(data_yaml, 'train'), cache_dir, imgsz)
+        os.environ[IMAGE_CACHE_ENV] = cache_dir
+        trainer = CachedDetectionTrainer
+    if workers is None:
+        print("\nMeasuring dataloader throughput...")
+        workers = autotune_workers(list_images(train_image_dirs(data_yaml, 'train')), imgsz,
+                                   batch if batch > 0 else MAX_AUTO_BATCH, cache_dir)
+
     # Load pretrained YOLOv8 model
     model_name = f'yolov8{model_size}.pt'
     print(f"\nLoading model: {model_name}")
@@ -79,11 +250,15 @@ def train_model(
     print(f"\nStarting training...")
     print(f"  Epochs:     {epochs}")
     print(f"  Image size: {imgsz}")
-    print(f"  Batch size: {batch}")
+    print(f"  Batch size: {batch if batch > 0 else 'auto (GPU memory)'}")
+    print(f"  Device:     {device}")
+    print(f"  Workers:    {workers}")
+    print(f"  Img cache:  {cache_dir or 'off'}")
     print(f"  Data:       {data_yaml}")
 
     # Train
     results = model.train(
+        trainer=trainer,
         data=data_yaml,
         epochs=epochs,
         imgsz=imgsz,
@@ -96,9 +271,9 @@ def train_model(
         patience=20,           # Early stopping
         save=True,
         save_period=10,        # Save checkpoint every 10 epochs
-        cache=False,
-        device=0,              # GPU if available, else CPU
-        workers=4,
+        cache=False,           # decoded images come from the image cache instead
+        device=device,
+        workers=workers,
         exist_ok=True,
         plots=True,            # Generate training plots
         rect=True,             # Rectangular training for pipeline images
@@ -140,30 +315,197 @@ def evaluate_model(weights_path='weights/best.pt', data_yaml='data.yaml'):
     return metrics
 
 
-def export_model(weights_path='weights/best.pt'):
-    """Export model to ONNX for edge deployment"""
+def export_model(weights_path='weights/best.pt', openvino=False):
+    """Export model to ONNX (and optionally OpenVINO IR) for edge / CPU deployment"""
     print("\nExporting model to ONNX for Jetson deployment...")
     model = YOLO(weights_path)
 
     # Export to ONNX
     model.export(format='onnx', imgsz=640, simplify=True)
     print("✅ ONNX export complete: weights/best.onnx")
+
+    # OpenVINO IR for CPU-only review stations (app.py / detect.py --backend openvino)
+    if openvino:
+        model.export(format='openvino', imgsz=640)
+        print("✅ OpenVINO export complete: weights/best_openvino_model/")
+
     print("\nFor TensorRT on Jetson, run:")
     print("  /usr/src/tensorrt/bin/trtexec --onnx=best.onnx --saveEngine=best.engine --fp16")
 
 
+# Classes whose accuracy must not regress before an INT8 model is rolled out
+CRITICAL_CLASSES = classes_with('CRITICAL')
+
+
+class _CalibrationReader:
+    """Feeds letterboxed val images to onnxruntime.quantization one at a time"""
+
+    def __init__(self, image_paths, input_name, imgsz=640):
+        self.image_paths = image_paths
+        self.input_name  = input_name
+        self.imgsz       = imgsz
+        self._it         = iter(image_paths)
+
+    def get_next(self):
+        import cv2
+        from backends import letterbox, to_blob
+        for path in self._it:
+            img = cv2.imread(path)
+            if img is not None:
+                return {self.input_name: to_blob(letterbox(img, self.imgsz)[0])}
+        return None
+
+    def rewind(self):
+        self._it = iter(self.image_paths)
+
+
+def _per_class_map(metrics, names):
+    """{class_name: (mAP@50, mAP@50-95)} from an Ultralytics val() result"""
+    out = {}
+    for i, c in enumerate(metrics.box.ap_class_index):
+        out[names[int(c)]] = (float(metrics.box.ap50[i]), float(metrics.box.ap[i]))
+    return out
+
+
+def quantize_model(
+    weights_path='weights/best.pt',
+    data_yaml='data.yaml',
+    calib_images=300,
+    imgsz=640,
+    tolerance=0.01,
+    report_dir='runs/quantize'
+):
+    """
+    INT8 post-training static quantization of the ONNX export, followed by an
+    FP32 vs INT8 accuracy comparison on the val split.
+
+    Writes weights/best_int8.onnx and a per-class comparison table
+    (comparison.md / comparison.csv) to report_dir. Returns False when any
+    CRITICAL_CLASSES mAP@50 drops by more than `tolerance`.
+    """
+    import onnx
+    from onnxruntime.quantization import (quantize_static, QuantFormat, QuantType,
+                                          CalibrationMethod)
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    print("=" * 60)
+    print("  NautiCAI - INT8 Post-Training Quantization")
+    print("=" * 60)
+
+    fp32_path = os.path.splitext(weights_path)[0] + '.onnx'
+    if not os.path.exists(fp32_path):
+        export_model(weights_path)
+    pre_path  = os.path.splitext(fp32_path)[0] + '_pre.onnx'
+    int8_path = os.path.splitext(fp32_path)[0] + '_int8.onnx'
+
+    # Calibration subset of the val split (seeded so re-runs are comparable)
+    val_dirs = train_image_dirs(data_yaml, 'val')
+    images   = list_images(val_dirs)
+    random.Random(0).shuffle(images)
+    images = images[:calib_images]
+    print(f"\nCalibrating on {len(images)} images from {', '.join(val_dirs)}")
+
+    quant_pre_process(fp32_path, pre_path)
+    fp32_model = onnx.load(fp32_path)
+    reader     = _CalibrationReader(images, fp32_model.graph.input[0].name, imgsz)
+    quantize_static(
+        pre_path, int8_path, reader,
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        calibrate_method=CalibrationMethod.MinMax,
+    )
+    os.remove(pre_path)
+
+    # Keep the Ultralytics metadata (names, imgsz, stride) so both models load the same way
+    int8_model = onnx.load(int8_path)
+    del int8_model.metadata_props[:]
+    int8_model.metadata_props.extend(fp32_model.metadata_props)
+    onnx.save(int8_model, int8_path)
+    print(f"✅ INT8 model written: {int8_path}")
+
+    # Evaluate both models on the same split
+    results = {}
+    for tag, path in (('FP32', fp32_path), ('INT8', int8_path)):
+        print(f"\nEvaluating {tag}: {path}")
+        model   = YOLO(path, task='detect')
+        metrics = model.val(data=data_yaml, imgsz=imgsz, batch=1, device='cpu',
+                            plots=False, verbose=False)
+        results[tag] = (metrics, _per_class_map(metrics, metrics.names))
+
+    fp32_m, fp32_cls = results['FP32']
+    int8_m, int8_cls = results['INT8']
+
+    rows = [('ALL', fp32_m.box.map50, int8_m.box.map50, fp32_m.box.map, int8_m.box.map)]
+    for name in fp32_m.names.values():
+        f50, f95 = fp32_cls.get(name, (0.0, 0.0))
+        i50, i95 = int8_cls.get(name, (0.0, 0.0))
+        rows.append((name, f50, i50, f95, i95))
+
+    os.makedirs(report_dir, exist_ok=True)
+    md_lines = [
+        '| Class | mAP@50 FP32 | mAP@50 INT8 | Δ | mAP@50-95 FP32 | mAP@50-95 INT8 | Δ |',
+        '|-------|-------------|-------------|---|----------------|----------------|---|',
+    ]
+    csv_lines = ['class,map50_fp32,map50_int8,map50_delta,map_fp32,map_int8,map_delta']
+    regressions = []
+    for name, f50, i50, f95, i95 in rows:
+        md_lines.append(f'| {name} | {f50:.4f} | {i50:.4f} | {i50 - f50:+.4f} '
+                        f'| {f95:.4f} | {i95:.4f} | {i95 - f95:+.4f} |')
+        csv_lines.append(f'{name},{f50:.4f},{i50:.4f},{i50 - f50:.4f},{f95:.4f},{i95:.4f},{i95 - f95:.4f}')
+        if name in CRITICAL_CLASSES and f50 - i50 > tolerance:
+            regressions.append(name)
+
+    speed = (f"\nInference latency (ms/img, CPU): FP32 {fp32_m.speed['inference']:.1f}"
+             f" · INT8 {int8_m.speed['inference']:.1f}"
+             f" · speed-up {fp32_m.speed['inference'] / max(int8_m.speed['inference'], 1e-6):.2f}x\n")
+    with open(os.path.join(report_dir, 'comparison.md'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(md_lines) + '\n' + speed)
+    with open(os.path.join(report_dir, 'comparison.csv'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(csv_lines) + '\n')
+
+    print("\n" + "\n".join(md_lines))
+    print(speed)
+    print(f"Comparison table saved to {report_dir}/comparison.md")
+
+    if regressions:
+        print(f"\n⚠️  Critical class regression > {tolerance:.3f} mAP@50: {', '.join(regressions)}")
+        print("Do not roll out the INT8 model.")
+        return False
+    print("\n✅ No critical class regressed beyond tolerance")
+    return True
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='NautiCAI Training Script')
     parser.add_argument('--mode', type=str, default='train',
                         choices=['train', 'eval', 'export'],
                         help='train, eval, or export')
+    parser.add_argument('--data', type=str, default='data.yaml',
+                        help='Dataset config, e.g. a splits/<name>/data.yaml from split_dataset.py')
     parser.add_argument('--model', type=str, default='n',
                         choices=['n', 's', 'm'],
                         help='Model size: n=nano, s=small, m=medium')
     parser.add_argument('--epochs', type=int, default=100)
-    parser.add_argument('--batch', type=int, default=16)
+    parser.add_argument('--batch', type=int, default=16,
+                        help='Batch size (-1 = pick from GPU / RAM memory)')
     parser.add_argument('--imgsz', type=int, default=640)
     parser.add_argument('--weights', type=str, default='weights/best.pt')
+    parser.add_argument('--openvino', action='store_true',
+                        help='Export: also write an OpenVINO IR for CPU inference')
+    parser.add_argument('--int8', action='store_true',
+                        help='Export: INT8 static quantization + FP32/INT8 accuracy report')
+    parser.add_argument('--calib-images', type=int, default=300,
+                        help='Export --int8: number of val images used for calibration')
+    parser.add_argument('--tolerance', type=float, default=0.01,
+                        help='Export --int8: max allowed mAP@50 drop for critical classes')
+    parser.add_argument('--cache-images', action='store_true',
+                        help='Train: pre-decode train images into a memory-mapped cache')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Train: dataloader workers (default: measured)')
+    parser.add_argument('--device', type=str, default=None,
+                        help='Train: CUDA device or cpu (default: CUDA 0 if available)')
 
     args = parser.parse_args()
 
@@ -172,9 +514,19 @@ if __name__ == "__main__":
             model_size=args.model,
             epochs=args.epochs,
             batch=args.batch,
-            imgsz=args.imgsz
+            imgsz=args.imgsz,
+            data_yaml=args.data,
+            cache_images=args.cache_images,
+            workers=args.workers,
+            device=args.device,
         )
     elif args.mode == 'eval':
-        evaluate_model(weights_path=args.weights)
+        evaluate_model(weights_path=args.weights, data_yaml=args.data)
     elif args.mode == 'export':
-        export_model(weights_path=args.weights)
\ No newline at end of file
+        export_model(weights_path=args.weights, openvino=args.openvino)
+        if args.int8:
+            passed = quantize_model(weights_path=args.weights, data_yaml=args.data,
+                                    calib_images=args.calib_images, imgsz=args.imgsz,
+                                    tolerance=args.tolerance)
+            if not passed:
+                sys.exit(1)     # critical-class accuracy regressed: fail CI / scripts
\ No newline at end of file
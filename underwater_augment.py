@@ -15,7 +15,7 @@ def simulate_green_water(image):
     return (final * 255).astype(np.uint8)
 
 
-def simulate_turbidity(image, intensity='medium'):
+def simulate_turbidity(image, intensity='medium', rng=None):
     result = image.copy()
     if intensity == 'low':
         kernel_size = 3
@@ -27,7 +27,8 @@ def simulate_turbidity(image, intensity='medium'):
         kernel_size = 15
         noise_factor = 0.2
     result = cv2.GaussianBlur(result, (kernel_size, kernel_size), 0)
-    noise = np.random.randn(*result.shape) * noise_factor * 255
+    gauss = rng.standard_normal(result.shape) if rng is not None else np.random.randn(*result.shape)
+    noise = gauss * noise_factor * 255
     result = np.clip(result.astype(np.float32) + noise, 0, 255).astype(np.uint8)
     return result
 
@@ -43,21 +44,177 @@ def simulate_marine_snow(image, num_particles=150):
     return result
 
 
-def apply_full_underwater_simulation(image, turbidity_level='medium', add_marine_snow=True):
-    result = simulate_green_water(image)
-    result = simulate_turbidity(result, intensity=turbidity_level)
+# ── Fast path: uint8 lookup tables and cached noise, no float round-trips ────
+# intensity → (blur kernel, noise factor); anything unknown behaves like 'high'
+TURBIDITY_PARAMS = {
+    'low':    (3, 0.05),
+    'medium': (7, 0.1),
+    'high':   (15, 0.2),
+}
+NOISE_TILE      = 512  # noise is added in blocks of this side, cropped from a 2x tile at random offsets
+NOISE_CACHE_MAX = 8    # distinct (channels, intensity) tiles before the cache resets
+
+
+def _build_green_water_lut():
+    # Same maths as simulate_green_water, evaluated once for all 256 levels per channel
+    v = np.arange(256, dtype=np.float32) / 255.0
+    b = np.clip(v * 0.9, 0, 1) * 0.7
+    g = np.clip(v * 1.1, 0, 1) * 0.7 + 0.4 * 0.3
+    r = np.clip(v * 0.6, 0, 1) * 0.7
+    return (np.stack([b, g, r], axis=1) * 255).astype(np.uint8).reshape(1, 256, 3)
+
+
+GREEN_WATER_LUT = _build_green_water_lut()
+_NOISE_CACHE = {}
+
+
+def _noise_tile(channels, noise_factor):
+    # Signed Gaussian noise split into positive / negative uint8 parts so it can be
+    # applied with saturating cv2.add / cv2.subtract (equivalent to clip(img + noise)).
+    # One 2*NOISE_TILE square per key (~6 MB for 3 channels) serves every resolution.
+    key  = (channels, noise_factor)
+    tile = _NOISE_CACHE.get(key)
+    if tile is None:
+        if len(_NOISE_CACHE) >= NOISE_CACHE_MAX:
+            _NOISE_CACHE.clear()
+        shape = (2 * NOISE_TILE, 2 * NOISE_TILE) + ((channels,) if channels else ())
+        noise = np.random.standard_normal(shape).astype(np.float32)
+        noise = np.clip(np.rint(noise * (noise_factor * 255)), -255, 255)
+        tile  = (np.maximum(noise, 0).astype(np.uint8), np.maximum(-noise, 0).astype(np.uint8))
+        _NOISE_CACHE[key] = tile
+    return tile
+
+
+def _add_noise(out, noise_factor):
+    """In-place saturating out + noise, one NOISE_TILE block at a time"""
+    pos, neg = _noise_tile(out.shape[2] if out.ndim == 3 else 0, noise_factor)
+    h, w = out.shape[:2]
+    for y in range(0, h, NOISE_TILE):
+        for x in range(0, w, NOISE_TILE):
+            block  = out[y:y + NOISE_TILE, x:x + NOISE_TILE]
+            bh, bw = block.shape[:2]
+            oy, ox = random.randrange(NOISE_TILE), random.randrange(NOISE_TILE)
+            cv2.add(block, pos[oy:oy + bh, ox:ox + bw], dst=block)
+            cv2.subtract(block, neg[oy:oy + bh, ox:ox + bw], dst=block)
+    return out
+
+
+def simulate_green_water_fast(image, out=None):
+    return cv2.LUT(image, GREEN_WATER_LUT, dst=out)
+
+
+def simulate_turbidity_fast(image, intensity='medium', out=None):
+    kernel_size, noise_factor = TURBIDITY_PARAMS.get(intensity, TURBIDITY_PARAMS['high'])
+    out = cv2.GaussianBlur(image, (kernel_size, kernel_size), 0, dst=out)
+    return _add_noise(out, noise_factor)
+
+
+# ── Vectorized marine snow ───────────────────────────────────────────────────
+def _disk_offsets(radius):
+    ys, xs = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+    mask = xs * xs + ys * ys <= radius * radius
+    return ys[mask], xs[mask]
+
+
+# Pre-computed filled-disk stamps for the particle radii simulate_marine_snow draws (1-3 px)
+SNOW_SPRITES = {r: _disk_offsets(r) for r in (1, 2, 3)}
+
+
+def render_marine_snow(image, xs, ys, radii, brightness, out=None):
+    # Splat every particle at once: one fancy-indexed write per sprite radius
+    out = image.copy() if out is None else out
+    h, w = out.shape[:2]
+    for r, (dy, dx) in SNOW_SPRITES.items():
+        sel = radii == r
+        if not sel.any():
+            continue
+        py  = (ys[sel, None] + dy[None, :]).ravel()
+        px  = (xs[sel, None] + dx[None, :]).ravel()
+        val = np.repeat(brightness[sel], len(dy)).astype(out.dtype)
+        ok  = (py >= 0) & (py < h) & (px >= 0) & (px < w)
+        out[py[ok], px[ok]] = val[ok, None] if out.ndim == 3 else val[ok]
+    return out
+
+
+def simulate_marine_snow_fast(image, num_particles=150, rng=None, out=None):
+    rng = rng if rng is not None else np.random.default_rng()
+    h, w = image.shape[:2]
+    xs = rng.integers(0, w, num_particles)
+    ys = rng.integers(0, h, num_particles)
+    radii = rng.integers(1, 4, num_particles)
+    brightness = rng.integers(180, 256, num_particles)
+    return render_marine_snow(image, xs, ys, radii, brightness, out=out)
+
+
+class MarineSnowField:
+    # Persistent particles that sink and drift between consecutive video frames,
+    # so the snow moves coherently instead of being regenerated every frame.
+    # drift = (lateral current, sinking speed) in pixels per rendered frame.
+
+    def __init__(self, num_particles=150, drift=(0.3, 1.5), jitter=0.4, rng=None):
+        self.num_particles = num_particles
+        self.drift = drift
+        self.jitter = jitter
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.shape = None
+
+    def _spawn(self, shape):
+        n, rng = self.num_particles, self.rng
+        self.shape = shape[:2]
+        h, w = self.shape
+        self.x = rng.uniform(0, w, n)
+        self.y = rng.uniform(0, h, n)
+        self.radii = rng.integers(1, 4, n)
+        self.brightness = rng.integers(180, 256, n)
+        # Larger flakes sink faster; each flake keeps its own lateral velocity
+        self.vx = rng.normal(self.drift[0], self.jitter, n)
+        self.vy = self.drift[1] * self.radii / 2 + rng.normal(0, self.jitter, n)
+
+    def step(self):
+        h, w = self.shape
+        self.x = (self.x + self.vx + self.rng.normal(0, self.jitter * 0.5, self.num_particles)) % w
+        self.y = (self.y + self.vy) % h
+
+    def render(self, image, out=None):
+        if self.shape != image.shape[:2]:
+            self._spawn(image.shape)
+        return render_marine_snow(image, self.x.astype(np.int64), self.y.astype(np.int64),
+                                  self.radii, self.brightness, out=out)
+
+    def __call__(self, image, out=None):
+        if self.shape == image.shape[:2]:
+            self.step()
+        return self.render(image, out=out)
+
+
+def apply_full_underwater_simulation(image, turbidity_level='medium', add_marine_snow=True, fast=True,
+                                     snow_field=None, rng=None):
+    if not fast:
+        result = simulate_green_water(image)
+        result = simulate_turbidity(result, intensity=turbidity_level)
+        if add_marine_snow:
+            result = simulate_marine_snow(result)
+        return result
+
+    result = simulate_green_water_fast(image)
+    simulate_turbidity_fast(result, intensity=turbidity_level, out=result)
     if add_marine_snow:
-        result = simulate_marine_snow(result)
+        if snow_field is not None:
+            snow_field(result, out=result)
+        else:
+            simulate_marine_snow_fast(result, rng=rng, out=result)
     return result
 
 
-def apply_augmentation_for_training(image):
-    if random.random() > 0.5:
+def apply_augmentation_for_training(image, rng=None):
+    # Pass a seeded numpy.random.Generator for reproducible augmentation
+    rng = rng if rng is not None else np.random.default_rng()
+    if rng.random() > 0.5:
         image = simulate_green_water(image)
-    if random.random() > 0.5:
-        intensity = random.choice(['low', 'medium', 'high'])
-        image = simulate_turbidity(image, intensity=intensity)
-    if random.random() > 0.5:
-        particles = random.randint(50, 300)
-        image = simulate_marine_snow(image, num_particles=particles)
+    if rng.random() > 0.5:
+        intensity = ['low', 'medium', 'high'][rng.integers(3)]
+        image = simulate_turbidity(image, intensity=intensity, rng=rng)
+    if rng.random() > 0.5:
+        particles = int(rng.integers(50, 301))
+        image = simulate_marine_snow_fast(image, num_particles=particles, rng=rng)
     return image
\ No newline at end of file
@@ -0,0 +1,249 @@
+"""
+NautiCAI - Pipelined Video Inference Engine
+Overlaps frame decoding, batched YOLO inference and annotation for long ROV recordings
+"""
+
+import queue
+import threading
+import cv2
+
+from backends import as_boxes, draw_boxes
+
+_DONE = object()
+
+# Seek instead of grab() when consecutive samples are at least this many seconds apart
+SEEK_MIN_GAP_SEC = 2.0
+
+
+def sample_targets(fps, stride=1, checks_per_sec=None, frame_count=None):
+    """
+    Yield the 1-based indices of the frames to analyse.
+    Frame stride → every `stride`-th frame; time stride → `checks_per_sec` frames per second.
+    """
+    k    = 1
+    prev = 0
+    while True:
+        if checks_per_sec:
+            target = max(prev + 1, int(round(k * fps / checks_per_sec)))
+        else:
+            target = k * max(1, int(stride))
+        if frame_count and target > frame_count:
+            return
+        yield target
+        prev = target
+        k   += 1
+
+
+def iter_sampled_frames(cap, stride=1, checks_per_sec=None, max_frames=None, method='auto'):
+    """
+    Yield (frame_idx, frame) for the sampled frames only.
+
+    method:
+        'grab' → cap.grab() skipped frames (demux only) and retrieve() the sampled ones
+        'seek' → jump with CAP_PROP_POS_FRAMES; the backend decodes from the previous keyframe
+        'auto' → seek when samples are SEEK_MIN_GAP_SEC or more apart, grab otherwise
+    """
+    fps         = max(cap.get(cv2.CAP_PROP_FPS), 1)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or None
+    gap         = (1.0 / checks_per_sec) if checks_per_sec else max(1, int(stride)) / fps
+    if method == 'auto':
+        method = 'seek' if gap >= SEEK_MIN_GAP_SEC else 'grab'
+
+    pos = 0   # frames consumed so far
+    pc  = 0
+    for target in sample_targets(fps, stride, checks_per_sec, frame_count):
+        if max_frames is not None and pc >= max_frames:
+            return
+        if method == 'seek' and target - pos > 1:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, target - 1)
+        else:
+            while pos < target - 1:
+                if not cap.grab():
+                    return
+                pos += 1
+        if not cap.grab():
+            return
+        ret, frame = cap.retrieve()
+        if not ret:
+            return
+        pos  = target
+        pc  += 1
+        yield target, frame
+
+
+class _StageError:
+    """Carries an exception raised inside a worker stage to the consumer"""
+
+    def __init__(self, exc):
+        self.exc = exc
+
+
+class VideoInferenceEngine:
+    """
+    Three-stage video pipeline joined by bounded queues:
+
+        decode   → reads (and optionally pre-processes) the frames to analyse
+        predict  → runs model.predict on batches of `batch_size` frames
+        annotate → plots boxes, converts to RGB and JPEG-encodes hit frames
+
+    Each stage runs on its own thread, so decoding frame N+1 overlaps
+    inference on frame N and annotation of frame N-1. Results are yielded
+    on the caller's thread, which is where Streamlit widgets must be updated.
+    """
+
+    def __init__(self, model, conf=0.25, batch_size=4, queue_size=8, preprocess=None,
+                 display_conf=None, keep_raw=False):
+        self.model        = model
+        self.conf         = conf
+        self.display_conf = display_conf
+        self.keep_raw     = keep_raw
+        self.batch_size   = max(1, int(batch_size))
+        self.queue_size   = max(self.batch_size, int(queue_size))
+        self.preprocess   = preprocess
+        self._stop        = threading.Event()
+
+    # ── Queue helpers ────────────────────────────────────────────────────────
+    def _put(self, q, item):
+        """Blocking put that gives up once the pipeline is stopped"""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while True:
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return _DONE
+
+    # ── Stages ───────────────────────────────────────────────────────────────
+    def _decode(self, frames, q_out):
+        try:
+            for fc, frame in frames:
+                if self.preprocess is not None:
+                    frame = self.preprocess(frame)
+                if not self._put(q_out, (fc, frame)):
+                    return
+        except Exception as e:
+            self._put(q_out, _StageError(e))
+        self._put(q_out, _DONE)
+
+    def _predict(self, q_in, q_out):
+        try:
+            done = False
+            while not done:
+                batch = []
+                while len(batch) < self.batch_size:
+                    item = self._get(q_in)
+                    if item is _DONE or isinstance(item, _StageError):
+                        if isinstance(item, _StageError):
+                            self._put(q_out, item)
+                        done = True
+                        break
+                    batch.append(item)
+                if not batch:
+                    break
+                results = self.model.predict([f for _, f in batch], conf=self.conf, verbose=False)
+                for (fc, _), res in zip(batch, results):
+                    if not self._put(q_out, (fc, res)):
+                        return
+        except Exception as e:
+            self._put(q_out, _StageError(e))
+        self._put(q_out, _DONE)
+
+    def _annotate(self, q_in, q_out, fps):
+        try:
+            while True:
+                item = self._get(q_in)
+                if item is _DONE or isinstance(item, _StageError):
+                    if isinstance(item, _StageError):
+                        self._put(q_out, item)
+                    break
+                fc, res = item
+                boxes = as_boxes(res.boxes)
+                if self.display_conf is not None:
+                    # Predicted at a floor threshold: draw only what the user asked to see
+                    shown = boxes[boxes.conf >= self.display_conf]
+                    ann   = draw_boxes(res.orig_img, shown, self.model.names)
+                else:
+                    shown = boxes
+                    ann   = res.plot()
+                ann_rgb     = cv2.cvtColor(ann, cv2.COLOR_BGR2RGB)
+                frame_bytes = None
+                raw_bytes   = None
+                if len(shown) > 0:
+                    _, buf      = cv2.imencode('.jpg', ann_rgb)
+                    frame_bytes = buf.tobytes()
+                if self.keep_raw and len(boxes) > 0:
+                    _, buf      = cv2.imencode('.jpg', res.orig_img)
+                    raw_bytes   = buf.tobytes()
+                out = {
+                    'frame_idx':     fc,
+                    'time_sec':      fc / fps,
+                    'result':        res,
+                    'boxes':         shown,
+                    'raw_boxes':     boxes,
+                    'annotated_rgb': ann_rgb,
+                    'frame_bytes':   frame_bytes,
+                    'raw_bytes':     raw_bytes,
+                }
+                if not self._put(q_out, out):
+                    return
+        except Exception as e:
+            self._put(q_out, _StageError(e))
+        self._put(q_out, _DONE)
+
+    # ── Public API ───────────────────────────────────────────────────────────
+    def run(self, video_path, skip=1, max_frames=None, checks_per_sec=None, method='auto'):
+        """
+        Analyse a video file and yield one dict per processed frame, in order:
+            frame_idx, time_sec, result (Ultralytics Results),
+            boxes (NumPy Boxes at display_conf), raw_boxes (at conf),
+            annotated_rgb, frame_bytes (JPEG, only when boxes were found),
+            raw_bytes (un-annotated JPEG when keep_raw and raw_boxes exist)
+        With display_conf, the model runs at `conf` (a low floor) and only
+        boxes >= display_conf are drawn, so raw predictions can be kept.
+        Frames are sampled every `skip` frames, or `checks_per_sec` times per
+        second when given, using iter_sampled_frames(method=...).
+        Breaking out of the loop stops and joins all stages.
+        """
+        self._stop.clear()
+        cap    = cv2.VideoCapture(video_path)
+        fps    = max(cap.get(cv2.CAP_PROP_FPS), 1)
+        frames = iter_sampled_frames(cap, stride=skip, checks_per_sec=checks_per_sec,
+                                     max_frames=max_frames, method=method)
+
+        q_frames  = queue.Queue(maxsize=self.queue_size)
+        q_results = queue.Queue(maxsize=self.queue_size)
+        q_out     = queue.Queue(maxsize=self.queue_size)
+
+        threads = [
+            threading.Thread(target=self._decode,   args=(frames, q_frames), daemon=True),
+            threading.Thread(target=self._predict,  args=(q_frames, q_results), daemon=True),
+            threading.Thread(target=self._annotate, args=(q_results, q_out, fps), daemon=True),
+        ]
+        for t in threads:
+            t.start()
+
+        try:
+            while True:
+                item = q_out.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _StageError):
+                    raise item.exc
+                yield item
+        finally:
+            self._stop.set()
+            for t in threads:
+                t.join()
+            cap.release()
+
+    def stop(self):
+        """Request all stages to finish early"""
+        self._stop.set()